@@ -0,0 +1,250 @@
+"""
+Benchmark de débit concurrent, serveur ASGI (vues async) contre serveur WSGI (vues synchrones).
+
+Une base fichier temporaire est remplie par la commande generer_donnees,
+puis chaque serveur est lancé dans son propre processus sur cette base :
+- WSGI : gunicorn, un worker gthread avec --fils fils, vues de views.py ;
+- ASGI : uvicorn, un worker, vues de vues_async.py (VUES_ASYNC=1).
+
+Pour chaque serveur et chaque niveau de concurrence, des clients connectés
+(un fil et une connexion HTTP persistante chacun) enchaînent pendant
+--duree secondes l'accueil, la liste, le détail d'un événement et le
+tableau de bord. Résultats : requêtes par seconde, latences p50/p95/p99 et
+erreurs, écrits en JSON.
+
+Usage : python benchmarks/bench_asgi.py [--concurrences 1,8,32] [--duree 10]
+        [--fils 4] [--utilisateurs 2000] [--evenements 1000] [--sortie bench_asgi.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RACINE))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_evenements.settings')
+# Base temporaire partagée avec les serveurs, jamais celle de SQLITE_CHEMIN ;
+# profil de production (WAL) pour que les lectures concurrentes ne se bloquent pas
+if __name__ == '__main__':
+    os.environ['SQLITE_CHEMIN'] = os.path.join(tempfile.mkdtemp(prefix='bench_asgi_'), 'base.sqlite3')
+    os.environ['SQLITE_PRODUCTION'] = '1'
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from evenements.models import Evenement, Utilisateur  # noqa: E402
+
+PREFIXE = 'asgi'
+HOTE = '127.0.0.1'
+
+
+def serveurs(port, fils):
+    """Commandes et VUES_ASYNC de chaque serveur"""
+    return {
+        'wsgi': ([
+            sys.executable, '-m', 'gunicorn', 'gestion_evenements.wsgi:application',
+            '--bind', f'{HOTE}:{port}', '--workers', '1', '--worker-class', 'gthread', '--threads', str(fils),
+            '--log-level', 'warning',
+        ], '0'),
+        'asgi': ([
+            sys.executable, '-m', 'uvicorn', 'gestion_evenements.asgi:application',
+            '--host', HOTE, '--port', str(port), '--workers', '1', '--log-level', 'warning', '--no-access-log',
+        ], '1'),
+    }
+
+
+def port_libre():
+    with socket.socket() as s:
+        s.bind((HOTE, 0))
+        return s.getsockname()[1]
+
+
+def attendre_serveur(processus, port, delai=30):
+    fin = time.monotonic() + delai
+    while time.monotonic() < fin:
+        if processus.poll() is not None:
+            raise RuntimeError(f"Le serveur s'est arrêté (code {processus.returncode}).")
+        try:
+            with socket.create_connection((HOTE, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Le serveur n'écoute pas sur le port {port} après {delai} s.")
+
+
+def centile(valeurs, rang):
+    if len(valeurs) < 2:
+        return valeurs[0] if valeurs else None
+    return round(statistics.quantiles(valeurs, n=100, method='inclusive')[rang - 1], 2)
+
+
+def commit_courant():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RACINE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def urls(evenements, aleatoire):
+    """URL tirée parmi les pages servies par les vues async"""
+    return aleatoire.choice([
+        reverse('accueil'),
+        reverse('liste_evenements'),
+        reverse('detail_evenement', args=[aleatoire.choice(evenements)]),
+        reverse('tableau_bord'),
+    ])
+
+
+def mesurer(port, cookies, evenements, concurrence, duree, graine):
+    """concurrence clients en parallèle pendant duree secondes"""
+    latences, erreurs = [], []
+    verrou = threading.Lock()
+    depart = threading.Barrier(concurrence + 1)
+
+    def client(indice):
+        aleatoire = random.Random(graine * 1000 + indice)
+        entetes = {'Cookie': cookies[indice % len(cookies)], 'Host': HOTE}
+        connexion = http.client.HTTPConnection(HOTE, port, timeout=60)
+        locales, echecs = [], []
+        depart.wait()
+        fin = time.perf_counter() + duree
+        while time.perf_counter() < fin:
+            debut = time.perf_counter()
+            try:
+                connexion.request('GET', urls(evenements, aleatoire), headers=entetes)
+                reponse = connexion.getresponse()
+                reponse.read()
+                statut = reponse.status
+            except (OSError, http.client.HTTPException) as exc:
+                connexion.close()
+                statut = repr(exc)
+            if not isinstance(statut, int) or statut >= 400:
+                echecs.append(statut)
+            else:
+                locales.append((time.perf_counter() - debut) * 1000)
+        connexion.close()
+        with verrou:
+            latences.extend(locales)
+            erreurs.extend(echecs)
+
+    fils = [threading.Thread(target=client, args=(indice,)) for indice in range(concurrence)]
+    for f in fils:
+        f.start()
+    depart.wait()
+    debut = time.perf_counter()
+    for f in fils:
+        f.join()
+    ecoule = time.perf_counter() - debut
+
+    return {
+        'requetes': len(latences),
+        'erreurs': len(erreurs),
+        'req_par_s': round(len(latences) / ecoule, 1),
+        'p50_ms': centile(latences, 50),
+        'p95_ms': centile(latences, 95),
+        'p99_ms': centile(latences, 99),
+    }
+
+
+def preparer(args):
+    """Crée la base et retourne (cookies de session des étudiants, événements à venir)"""
+    call_command('migrate', verbosity=0)
+    call_command(
+        'generer_donnees', utilisateurs=args.utilisateurs, evenements=args.evenements,
+        graine=args.graine, prefixe=PREFIXE, stdout=open(os.devnull, 'w')
+    )
+    etudiants = Utilisateur.objects.filter(username__startswith=f'{PREFIXE}_', role='etudiant')
+    cookies = []
+    for etudiant in etudiants[:max(args.concurrences)]:
+        client = Client()
+        client.force_login(etudiant)
+        cookies.append(f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}')
+    evenements = list(
+        Evenement.objects.filter(statut='valide', date_debut__gte=timezone.now()).values_list('pk', flat=True)
+    )
+    return cookies, evenements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--concurrences', type=lambda valeur: [int(n) for n in valeur.split(',')], default=[1, 8, 32],
+        help="Nombres de clients simultanés, séparés par des virgules",
+    )
+    parser.add_argument('--duree', type=float, default=10, help="Durée de chaque mesure (s)")
+    parser.add_argument('--fils', type=int, default=4, help="Fils du worker WSGI (gunicorn --threads)")
+    parser.add_argument('--utilisateurs', type=int, default=2000, help="Utilisateurs générés")
+    parser.add_argument('--evenements', type=int, default=1000, help="Événements générés")
+    parser.add_argument('--graine', type=int, default=42, help="Graine des données et des tirages")
+    parser.add_argument('--sortie', default='bench_asgi.json', help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    dossier = os.path.dirname(os.environ['SQLITE_CHEMIN'])
+    try:
+        debut = time.perf_counter()
+        cookies, evenements = preparer(args)
+        connections.close_all()
+        print(f"Base générée en {time.perf_counter() - debut:.1f} s "
+              f"({args.utilisateurs} utilisateurs, {args.evenements} événements)\n")
+
+        resultats = {}
+        print(f"{'serveur':<8} {'clients':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erreurs':>8}")
+        for nom in ('wsgi', 'asgi'):
+            port = port_libre()
+            commande, vues_async = serveurs(port, args.fils)[nom]
+            processus = subprocess.Popen(commande, cwd=RACINE, env={**os.environ, 'VUES_ASYNC': vues_async})
+            try:
+                attendre_serveur(processus, port)
+                resultats[nom] = {}
+                for concurrence in args.concurrences:
+                    mesure = mesurer(port, cookies, evenements, concurrence, args.duree, args.graine)
+                    resultats[nom][concurrence] = mesure
+                    print(f"{nom:<8} {concurrence:>8} {mesure['req_par_s']:>8} {mesure['p50_ms']!s:>9} "
+                          f"{mesure['p95_ms']!s:>9} {mesure['p99_ms']!s:>9} {mesure['erreurs']:>8}")
+            finally:
+                processus.terminate()
+                processus.wait(timeout=30)
+
+        rapport = {
+            'commit': commit_courant(),
+            'date': timezone.now().isoformat(),
+            'environnement': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'plateforme': platform.platform(),
+                'processeurs': os.cpu_count(),
+            },
+            'parametres': vars(args),
+            'resultats': resultats,
+        }
+        Path(args.sortie).write_text(json.dumps(rapport, indent=2, ensure_ascii=False))
+        print(f"\nRésultats écrits dans {args.sortie}")
+    finally:
+        connections.close_all()
+        shutil.rmtree(dossier, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Benchmark de charge HTTP des pages principales, dans le processus.
+
+Une base de test temporaire (fichier SQLite) est remplie par la commande
+generer_donnees, puis un pool de threads de clients de test connectés
+interroge chaque URL tour à tour. Pour chaque URL : latences p50/p95/p99,
+requêtes HTTP par seconde et requêtes SQL par requête HTTP. Les résultats
+sont écrits en JSON pour comparer les exécutions d'un commit à l'autre.
+
+Usage : python benchmarks/bench_charge.py [--clients 8] [--requetes 200]
+        [--utilisateurs 2000] [--evenements 1000] [--sortie bench_charge.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RACINE))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_evenements.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from evenements.models import Evenement, Utilisateur  # noqa: E402
+
+PREFIXE = 'charge'
+
+
+class Scenario:
+    """Une URL à interroger : construit la requête pour un client et un tirage aléatoire"""
+
+    def __init__(self, nom, methode, url, utilisateur='etudiant'):
+        self.nom = nom
+        self.methode = methode
+        self.url = url
+        self.utilisateur = utilisateur
+
+
+def scenarios(evenements_a_venir):
+    def detail(aleatoire):
+        return reverse('detail_evenement', args=[aleatoire.choice(evenements_a_venir)])
+
+    def inscrire(aleatoire):
+        return reverse('inscrire_evenement', args=[aleatoire.choice(evenements_a_venir)])
+
+    return [
+        Scenario('accueil', 'get', lambda aleatoire: reverse('accueil')),
+        Scenario('liste_evenements', 'get', lambda aleatoire: reverse('liste_evenements')),
+        Scenario('detail_evenement', 'get', detail),
+        Scenario('tableau_bord', 'get', lambda aleatoire: reverse('tableau_bord')),
+        Scenario('inscrire_evenement', 'post', inscrire),
+        Scenario('gestion_utilisateurs', 'get', lambda aleatoire: reverse('gestion_utilisateurs'), 'admin'),
+    ]
+
+
+def centile(valeurs, rang):
+    return statistics.quantiles(valeurs, n=100, method='inclusive')[rang - 1]
+
+
+def mesurer(scenario, clients, nb_requetes, graine):
+    """Lance nb_requetes requêtes du scénario réparties sur les clients (un thread par client)"""
+    latences, nb_sql, erreurs = [], [], []
+    verrou = threading.Lock()
+    restantes = iter(range(nb_requetes))
+
+    def travailleur(indice, client):
+        aleatoire = random.Random(graine * 1000 + indice)
+        base = connections['default']
+        while True:
+            with verrou:
+                if next(restantes, None) is None:
+                    break
+            url = scenario.url(aleatoire)
+            with CaptureQueriesContext(base) as requetes:
+                debut = time.perf_counter()
+                try:
+                    response = getattr(client, scenario.methode)(url)
+                    statut = response.status_code
+                except Exception as exc:  # noqa: BLE001 - toute erreur est comptée
+                    statut = repr(exc)
+                duree = time.perf_counter() - debut
+            with verrou:
+                latences.append(duree * 1000)
+                nb_sql.append(len(requetes))
+                if not isinstance(statut, int) or statut >= 400:
+                    erreurs.append(statut)
+        connections.close_all()
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        list(pool.map(travailleur, range(len(clients)), clients))
+    duree = time.perf_counter() - debut
+
+    return {
+        'requetes': len(latences),
+        'erreurs': len(erreurs),
+        'req_par_s': round(len(latences) / duree, 1),
+        'p50_ms': round(centile(latences, 50), 2),
+        'p95_ms': round(centile(latences, 95), 2),
+        'p99_ms': round(centile(latences, 99), 2),
+        'sql_par_requete': round(statistics.mean(nb_sql), 2),
+        'sql_max': max(nb_sql),
+    }
+
+
+def commit_courant():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RACINE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def connecter(utilisateurs):
+    clients = []
+    for utilisateur in utilisateurs:
+        client = Client()
+        client.force_login(utilisateur)
+        clients.append(client)
+    return clients
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8, help="Nombre de clients simultanés (threads)")
+    parser.add_argument('--requetes', type=int, default=200, help="Nombre de requêtes par URL")
+    parser.add_argument('--utilisateurs', type=int, default=2000, help="Utilisateurs générés")
+    parser.add_argument('--evenements', type=int, default=1000, help="Événements générés")
+    parser.add_argument('--graine', type=int, default=42, help="Graine des données et des tirages")
+    parser.add_argument('--sortie', default='bench_charge.json', help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    dossier = tempfile.mkdtemp(prefix='bench_charge_')
+    # Base fichier plutôt que mémoire : chaque thread ouvre sa propre connexion
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(dossier, 'charge.sqlite3')
+    ancien_nom = connection.creation.create_test_db(verbosity=0)
+    try:
+        debut = time.perf_counter()
+        call_command(
+            'generer_donnees', utilisateurs=args.utilisateurs, evenements=args.evenements,
+            graine=args.graine, prefixe=PREFIXE, stdout=open(os.devnull, 'w')
+        )
+        print(f"Base générée en {time.perf_counter() - debut:.1f} s "
+              f"({args.utilisateurs} utilisateurs, {args.evenements} événements)\n")
+
+        aleatoire = random.Random(args.graine)
+        etudiants = list(Utilisateur.objects.filter(username__startswith=f'{PREFIXE}_', role='etudiant')[:500])
+        admin = Utilisateur.objects.filter(username__startswith=f'{PREFIXE}_', role='admin').first()
+        evenements_a_venir = list(
+            Evenement.objects.filter(statut='valide', date_debut__gte=timezone.now()).values_list('pk', flat=True)
+        )
+        clients = {
+            'etudiant': connecter(aleatoire.sample(etudiants, args.clients)),
+            'admin': connecter([admin] * args.clients),
+        }
+
+        resultats = {}
+        print(f"{'URL':<22} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'SQL/req':>8} {'erreurs':>8}")
+        for scenario in scenarios(evenements_a_venir):
+            mesure = mesurer(scenario, clients[scenario.utilisateur], args.requetes, args.graine)
+            resultats[scenario.nom] = mesure
+            print(f"{scenario.nom:<22} {mesure['req_par_s']:>8} {mesure['p50_ms']:>9} {mesure['p95_ms']:>9} "
+                  f"{mesure['p99_ms']:>9} {mesure['sql_par_requete']:>8} {mesure['erreurs']:>8}")
+
+        rapport = {
+            'commit': commit_courant(),
+            'date': timezone.now().isoformat(),
+            'environnement': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'plateforme': platform.platform(),
+                'processeurs': os.cpu_count(),
+            },
+            'parametres': vars(args),
+            'resultats': resultats,
+        }
+        Path(args.sortie).write_text(json.dumps(rapport, indent=2, ensure_ascii=False))
+        print(f"\nRésultats écrits dans {args.sortie}")
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Benchmark de contention en écriture sur SQLite, profil par défaut contre profil de production.
+
+Une base fichier temporaire reçoit des événements et des étudiants, puis,
+pour chaque profil (sur sa propre copie de la base), des processus
+écrivains inscrivent des étudiants tirés au hasard comme inscrire_evenement
+(lecture de l'événement, puis reserver_place dans une transaction) pendant
+que des processus lecteurs affichent des événements. Pour chaque profil :
+inscriptions par seconde, taux d'erreur (« database is locked »), latences
+p50/p95/p99 des écritures et des lectures.
+
+Le profil de production est celui de SQLITE_PRODUCTION=1 : journal WAL,
+busy_timeout, caches et BEGIN IMMEDIATE (gestion_evenements/sqlite_production).
+
+Usage : python benchmarks/bench_ecritures.py [--ecrivains 8] [--lecteurs 4]
+        [--duree 10] [--evenements 20] [--capacite 200] [--utilisateurs 5000]
+        [--sortie bench_ecritures.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RACINE))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_evenements.settings')
+# Base temporaire du processus principal, jamais celle de SQLITE_CHEMIN ; les
+# processus de mesure (spawn, __mp_main__) reçoivent la copie de leur profil
+# par l'environnement
+if __name__ == '__main__':
+    os.environ['SQLITE_CHEMIN'] = os.path.join(tempfile.mkdtemp(prefix='bench_ecritures_'), 'base.sqlite3')
+    os.environ['SQLITE_PRODUCTION'] = '0'
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import OperationalError, connection, connections, transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from evenements.models import Evenement, Inscription, Utilisateur  # noqa: E402
+
+PROFILS = {'defaut': '0', 'production': '1'}
+
+
+def centile(valeurs, rang):
+    if len(valeurs) < 2:
+        return valeurs[0] if valeurs else None
+    return round(statistics.quantiles(valeurs, n=100, method='inclusive')[rang - 1], 2)
+
+
+def commit_courant():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RACINE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ecrire(evenements, utilisateurs, aleatoire):
+    evenement = Evenement.objects.get(pk=aleatoire.choice(evenements))
+    with transaction.atomic():
+        evenement.reserver_place(Utilisateur(pk=aleatoire.choice(utilisateurs)))
+
+
+def lire(evenements, utilisateurs, aleatoire):
+    evenement = Evenement.objects.select_related('organisateur').get(pk=aleatoire.choice(evenements))
+    evenement.inscriptions.filter(statut='confirmee').count()
+
+
+def travailler(role, indice, duree, graine, evenements, utilisateurs, barriere, resultats):
+    """Processus de mesure : attend les autres, puis écrit ou lit pendant `duree` secondes"""
+    operation = ecrire if role == 'ecrivain' else lire
+    aleatoire = random.Random(graine * 1000 + indice)
+    latences, erreurs = [], 0
+    # Connexion (et PRAGMA du profil) ouverte avant le départ
+    connection.ensure_connection()
+    barriere.wait()
+    fin = time.perf_counter() + duree
+    while time.perf_counter() < fin:
+        debut = time.perf_counter()
+        try:
+            operation(evenements, utilisateurs, aleatoire)
+        except OperationalError:
+            erreurs += 1
+            continue
+        latences.append((time.perf_counter() - debut) * 1000)
+    connections.close_all()
+    resultats.put((role, latences, erreurs))
+
+
+def synthese(latences, erreurs, duree):
+    total = len(latences) + erreurs
+    return {
+        'operations': len(latences),
+        'par_s': round(len(latences) / duree, 1),
+        'erreurs': erreurs,
+        'taux_erreur': round(100 * erreurs / total, 2) if total else 0.0,
+        'p50_ms': centile(latences, 50),
+        'p95_ms': centile(latences, 95),
+        'p99_ms': centile(latences, 99),
+    }
+
+
+def mesurer(profil, chemin, args, evenements, utilisateurs):
+    """Lance écrivains et lecteurs sur la base `chemin` avec le profil donné"""
+    os.environ['SQLITE_CHEMIN'] = chemin
+    os.environ['SQLITE_PRODUCTION'] = PROFILS[profil]
+    contexte = multiprocessing.get_context('spawn')
+    roles = ['ecrivain'] * args.ecrivains + ['lecteur'] * args.lecteurs
+    barriere = contexte.Barrier(len(roles) + 1)
+    resultats = contexte.Queue()
+    processus = [
+        contexte.Process(
+            target=travailler,
+            args=(role, indice, args.duree, args.graine, evenements, utilisateurs, barriere, resultats),
+        )
+        for indice, role in enumerate(roles)
+    ]
+    for p in processus:
+        p.start()
+    barriere.wait()
+    mesures = [resultats.get() for _ in processus]
+    for p in processus:
+        p.join()
+
+    latences = {'ecrivain': [], 'lecteur': []}
+    erreurs = dict.fromkeys(latences, 0)
+    for role, latences_processus, erreurs_processus in mesures:
+        latences[role].extend(latences_processus)
+        erreurs[role] += erreurs_processus
+    return {
+        'ecritures': synthese(latences['ecrivain'], erreurs['ecrivain'], args.duree),
+        'lectures': synthese(latences['lecteur'], erreurs['lecteur'], args.duree),
+    }
+
+
+def preparer(args):
+    """Crée la base : migrations, événements à venir et étudiants (mot de passe inutilisable)"""
+    call_command('migrate', verbosity=0)
+    aleatoire = random.Random(args.graine)
+    utilisateurs = Utilisateur.objects.bulk_create([
+        Utilisateur(username=f'ecriture_{i}', password='!') for i in range(args.utilisateurs)
+    ])
+    maintenant = timezone.now()
+    evenements = Evenement.objects.bulk_create([
+        Evenement(
+            titre=f'Événement {i}', description='Description',
+            date_debut=maintenant + timedelta(days=aleatoire.randint(1, 60)),
+            date_fin=maintenant + timedelta(days=61), lieu='Amphi A', categorie='conference',
+            capacite_max=args.capacite, organisateur=aleatoire.choice(utilisateurs), statut='valide',
+        )
+        for i in range(args.evenements)
+    ])
+    return [e.pk for e in evenements], [u.pk for u in utilisateurs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ecrivains', type=int, default=8, help="Processus qui inscrivent")
+    parser.add_argument('--lecteurs', type=int, default=4, help="Processus qui affichent des événements")
+    parser.add_argument('--duree', type=float, default=10, help="Durée de la mesure de chaque profil (s)")
+    parser.add_argument('--evenements', type=int, default=20, help="Événements ouverts aux inscriptions")
+    parser.add_argument('--capacite', type=int, default=200, help="Capacité de chaque événement")
+    parser.add_argument('--utilisateurs', type=int, default=5000, help="Étudiants qui s'inscrivent")
+    parser.add_argument('--graine', type=int, default=42, help="Graine des données et des tirages")
+    parser.add_argument('--sortie', default='bench_ecritures.json', help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    base = os.environ['SQLITE_CHEMIN']
+    dossier = os.path.dirname(base)
+    try:
+        evenements, utilisateurs = preparer(args)
+        connections.close_all()
+        print(f"Base préparée : {args.evenements} événements, {args.utilisateurs} étudiants, "
+              f"{args.ecrivains} écrivains et {args.lecteurs} lecteurs pendant {args.duree:g} s par profil\n")
+
+        resultats = {}
+        print(f"{'profil':<11} {'':<10} {'op/s':>8} {'erreurs':>8} {'% err':>7} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for profil in PROFILS:
+            # Copie neuve par profil : le mode WAL reste inscrit dans le fichier
+            chemin = os.path.join(dossier, f'{profil}.sqlite3')
+            shutil.copyfile(base, chemin)
+            resultats[profil] = mesurer(profil, chemin, args, evenements, utilisateurs)
+            with sqlite3.connect(chemin) as base_profil:
+                resultats[profil]['inscriptions_en_base'] = base_profil.execute(
+                    f'SELECT COUNT(*) FROM {Inscription._meta.db_table}'
+                ).fetchone()[0]
+            for role in ('ecritures', 'lectures'):
+                mesure = resultats[profil][role]
+                print(f"{profil:<11} {role:<10} {mesure['par_s']:>8} {mesure['erreurs']:>8} "
+                      f"{mesure['taux_erreur']:>7} {mesure['p50_ms']!s:>9} {mesure['p95_ms']!s:>9} "
+                      f"{mesure['p99_ms']!s:>9}")
+
+        rapport = {
+            'commit': commit_courant(),
+            'date': timezone.now().isoformat(),
+            'environnement': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'plateforme': platform.platform(),
+                'processeurs': os.cpu_count(),
+            },
+            'parametres': vars(args),
+            'resultats': resultats,
+        }
+        Path(args.sortie).write_text(json.dumps(rapport, indent=2, ensure_ascii=False))
+        print(f"\nRésultats écrits dans {args.sortie}")
+    finally:
+        connections.close_all()
+        shutil.rmtree(dossier, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark de la recherche d'événements.
+
+Crée une base de test avec 100 000 événements puis compare, pour quelques
+termes, l'ancienne recherche (icontains sur titre, description et lieu) et
+la recherche plein texte (FTS5 classée par pertinence).
+
+Usage : python benchmarks/bench_recherche.py [--nombre 100000] [--repetitions 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_evenements.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.db.models import Q  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from evenements.models import Evenement, Utilisateur  # noqa: E402
+from evenements.recherche import fts_disponible, reconstruire_index, rechercher_evenements  # noqa: E402
+
+SUJETS = [
+    'Conférence', 'Atelier', 'Séminaire', 'Tournoi', 'Soirée', 'Exposition',
+    'Forum', 'Rencontre', 'Concert', 'Hackathon', 'Débat', 'Projection',
+]
+THEMES = [
+    'intelligence artificielle', 'développement durable', 'économie sociale',
+    'photographie', 'robotique', 'littérature française', 'santé mentale',
+    'sécurité informatique', 'astronomie', 'théâtre', 'football', 'entrepreneuriat',
+]
+LIEUX = ['Amphi A', 'Amphi B', 'Bibliothèque', 'Gymnase', 'Salle des fêtes', 'Cafétéria']
+TERMES = ['conference', 'robotique', 'securite', 'amphi', 'théâtre bibliothèque']
+
+
+def peupler(nombre):
+    organisateur = Utilisateur.objects.create_user(username='orga', password='x')
+    maintenant = timezone.now()
+    aleatoire = random.Random(42)
+    evenements = []
+    for i in range(nombre):
+        sujet, theme = aleatoire.choice(SUJETS), aleatoire.choice(THEMES)
+        debut = maintenant + timedelta(hours=aleatoire.randint(-5000, 5000))
+        evenements.append(Evenement(
+            titre=f'{sujet} {theme} #{i}',
+            description=f"{sujet} autour de : {aleatoire.choice(THEMES)}. " * 5,
+            date_debut=debut,
+            date_fin=debut + timedelta(hours=2),
+            lieu=aleatoire.choice(LIEUX),
+            categorie='conference',
+            capacite_max=50,
+            organisateur=organisateur,
+            statut='valide',
+        ))
+    Evenement.objects.bulk_create(evenements, batch_size=2000)
+
+
+def recherche_icontains(texte):
+    return Evenement.objects.filter(statut='valide').filter(
+        Q(titre__icontains=texte) |
+        Q(description__icontains=texte) |
+        Q(lieu__icontains=texte)
+    ).order_by('date_debut')
+
+
+def recherche_fts(texte):
+    evenements = rechercher_evenements(Evenement.objects.filter(statut='valide'), texte)
+    return evenements.order_by('-pertinence', 'date_debut')
+
+
+def mesurer(fonction, texte, repetitions):
+    """Durée moyenne (ms) pour obtenir la première page de 50 résultats, et nombre de résultats"""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        list(fonction(texte)[:50])
+    duree = (time.perf_counter() - debut) / repetitions * 1000
+    return duree, fonction(texte).count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nombre', type=int, default=100000, help="Nombre d'événements à créer")
+    parser.add_argument('--repetitions', type=int, default=20, help="Répétitions par recherche")
+    args = parser.parse_args()
+
+    ancien_nom = connection.creation.create_test_db(verbosity=0)
+    try:
+        if not fts_disponible():
+            print("FTS5 indisponible sur cette base : rien à comparer.")
+            return
+
+        debut = time.perf_counter()
+        peupler(args.nombre)
+        print(f"{args.nombre} événements créés en {time.perf_counter() - debut:.1f} s")
+
+        debut = time.perf_counter()
+        reconstruire_index()
+        print(f"Index FTS5 reconstruit en {time.perf_counter() - debut:.1f} s\n")
+
+        print(f"{'Terme':<22} {'icontains':>12} {'résultats':>10} {'FTS5':>12} {'résultats':>10}")
+        for texte in TERMES:
+            avant, nb_avant = mesurer(recherche_icontains, texte, args.repetitions)
+            apres, nb_apres = mesurer(recherche_fts, texte, args.repetitions)
+            print(f"{texte:<22} {avant:9.1f} ms {nb_avant:>10} {apres:9.1f} ms {nb_apres:>10}")
+
+        print("\nicontains ne trouve ni « conference » dans « Conférence » ni « securite »"
+              " dans « sécurité » ; FTS5 ignore les accents.")
+    finally:
+        connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
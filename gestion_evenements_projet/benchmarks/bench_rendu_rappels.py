@@ -0,0 +1,118 @@
+"""
+Benchmark du rendu des emails de rappel.
+
+Compare, pour 10 000 rappels d'un même événement, l'ancienne construction
+(f-string HTML + strip_tags pour chaque message) et la nouvelle (templates
+compilés, partie commune rendue une fois par événement).
+
+Usage : python benchmarks/bench_rendu_rappels.py [--nombre 10000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_evenements.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.mail import EmailMultiAlternatives  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from django.utils.html import strip_tags  # noqa: E402
+from evenements.emails import construire_email_rappel, preparer_rappel  # noqa: E402
+from evenements.models import Evenement, Inscription, Utilisateur  # noqa: E402
+
+
+def ancien_rappel(inscription):
+    """Construction d'origine : f-string HTML puis strip_tags pour chaque participant"""
+    evenement = inscription.evenement
+    participant = inscription.participant
+    sujet = f"⏰ Rappel - {evenement.titre} demain"
+    message_html = f"""
+        <html>
+            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+                <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
+                    <h2 style="color: #f59e0b;">⏰ Rappel : Événement demain !</h2>
+                    
+                    <p>Bonjour <strong>{participant.get_full_name()}</strong>,</p>
+                    
+                    <p>Nous vous rappelons que l'événement suivant aura lieu <strong>demain</strong> :</p>
+                    
+                    <div style="background: #fffbeb; padding: 15px; border-radius: 8px; margin: 20px 0;">
+                        <h3 style="margin-top: 0; color: #f59e0b;">{evenement.titre}</h3>
+                        <p><strong>📅 Date :</strong> {evenement.date_debut.strftime('%d/%m/%Y à %H:%M')}</p>
+                        <p><strong>📍 Lieu :</strong> {evenement.lieu}</p>
+                        <p><strong>👤 Organisateur :</strong> {evenement.organisateur.get_full_name()}</p>
+                    </div>
+                    
+                    <p><strong>⚠️ N'oubliez pas :</strong></p>
+                    <ul>
+                        <li>Arrivez à l'heure</li>
+                        <li>Préparez vos questions si nécessaire</li>
+                        <li>En cas d'empêchement, annulez votre inscription</li>
+                    </ul>
+                    
+                    <p style="margin-top: 30px;">À demain !</p>
+                </div>
+            </body>
+        </html>
+        """
+    message_texte = strip_tags(message_html)
+    email = EmailMultiAlternatives(sujet, message_texte, settings.DEFAULT_FROM_EMAIL, [participant.email])
+    email.attach_alternative(message_html, 'text/html')
+    return email
+
+
+def mesurer(nom, fonction, nombre):
+    debut = time.perf_counter()
+    fonction()
+    duree = time.perf_counter() - debut
+    print(f"{nom:<45} {duree:8.3f} s   {duree / nombre * 1e6:8.1f} µs/message")
+    return duree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nombre', type=int, default=10000, help="Nombre de rappels à rendre")
+    args = parser.parse_args()
+
+    organisateur = Utilisateur(username='orga', first_name='Marie', last_name='Curie')
+    evenement = Evenement(
+        pk=1,
+        titre='Conférence : intelligence artificielle & société',
+        description='Une description assez longue. ' * 20,
+        date_debut=timezone.now() + timedelta(hours=20),
+        date_fin=timezone.now() + timedelta(hours=22),
+        lieu='Amphi A',
+        categorie='conference',
+        organisateur=organisateur,
+    )
+    inscriptions = [
+        Inscription(
+            evenement=evenement,
+            participant=Utilisateur(
+                username=f'etudiant{i}', first_name=f'Prénom{i}', last_name='Nom', email=f'e{i}@exemple.com'
+            ),
+        )
+        for i in range(args.nombre)
+    ]
+
+    def nouveau():
+        rappel = preparer_rappel(evenement)
+        for inscription in inscriptions:
+            construire_email_rappel(inscription, rappel)
+
+    print(f"Rendu de {args.nombre} rappels pour un même événement\n")
+    avant = mesurer("Avant : f-string + strip_tags par message", lambda: [ancien_rappel(i) for i in inscriptions], args.nombre)
+    apres = mesurer("Après : template rendu une fois par événement", nouveau, args.nombre)
+    print(f"\nGain : x{avant / apres:.1f}")
+
+
+if __name__ == '__main__':
+    main()
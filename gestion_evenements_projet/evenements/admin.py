@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Utilisateur, Evenement, Inscription
+from django.utils import timezone
+from .caches import invalider_accueil, invalider_facettes_utilisateurs
+from .exports import CHAMPS_INSCRIPTION, COLONNES_INSCRIPTIONS, reponse_export
+from .models import Utilisateur, Evenement, Inscription, EmailSortant
 
 
 @admin.register(Utilisateur)
@@ -28,12 +31,15 @@ class UtilisateurAdmin(UserAdmin):
     def promouvoir_admin(self, request, queryset):
         """Action pour promouvoir des utilisateurs en administrateurs"""
         count = queryset.update(role='admin', is_staff=True)
+        # update() ne déclenche pas les signaux qui tiennent les facettes à jour
+        invalider_facettes_utilisateurs()
         self.message_user(request, f'{count} utilisateur(s) promu(s) administrateur.')
     promouvoir_admin.short_description = "🔼 Promouvoir en Administrateur"
     
     def retirer_admin(self, request, queryset):
         """Action pour retirer le rôle admin"""
         count = queryset.update(role='etudiant', is_staff=False)
+        invalider_facettes_utilisateurs()
         self.message_user(request, f'{count} utilisateur(s) rétrogradé(s) en Étudiant.')
     retirer_admin.short_description = "🔽 Rétrograder en Étudiant"
 
@@ -69,12 +75,16 @@ class EvenementAdmin(admin.ModelAdmin):
     actions = ['valider_evenements', 'refuser_evenements']
     
     def valider_evenements(self, request, queryset):
-        count = queryset.update(statut='valide')
+        # update() ne touche pas date_modification (auto_now) et ne déclenche
+        # pas les signaux qui invalident l'accueil
+        count = queryset.update(statut='valide', date_modification=timezone.now())
+        invalider_accueil()
         self.message_user(request, f'{count} événement(s) validé(s).')
     valider_evenements.short_description = "Valider les événements sélectionnés"
     
     def refuser_evenements(self, request, queryset):
-        count = queryset.update(statut='refuse')
+        count = queryset.update(statut='refuse', date_modification=timezone.now())
+        invalider_accueil()
         self.message_user(request, f'{count} événement(s) refusé(s).')
     refuser_evenements.short_description = "Refuser les événements sélectionnés"
 
@@ -96,4 +106,43 @@ class InscriptionAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ['date_inscription']
\ No newline at end of file
+    readonly_fields = ['date_inscription']
+    
+    # Avec « Sélectionner tous les résultats », l'export porte sur toute la liste filtrée
+    actions = ['exporter_csv', 'exporter_xlsx']
+    
+    def exporter(self, queryset, format_):
+        inscriptions = queryset.select_related('participant', 'evenement').only(*CHAMPS_INSCRIPTION).order_by(
+            'evenement__date_debut', 'evenement', 'date_inscription', 'id'
+        )
+        return reponse_export(inscriptions, COLONNES_INSCRIPTIONS, format_, f'inscriptions {timezone.localdate()}')
+    
+    def exporter_csv(self, request, queryset):
+        """Action pour exporter les inscriptions sélectionnées en CSV"""
+        return self.exporter(queryset, 'csv')
+    exporter_csv.short_description = "📥 Exporter en CSV"
+    
+    def exporter_xlsx(self, request, queryset):
+        """Action pour exporter les inscriptions sélectionnées en XLSX"""
+        return self.exporter(queryset, 'xlsx')
+    exporter_xlsx.short_description = "📥 Exporter en XLSX"
+
+
+@admin.register(EmailSortant)
+class EmailSortantAdmin(admin.ModelAdmin):
+    """Configuration de l'admin pour la file d'envoi des emails"""
+    list_display = ['sujet', 'destinataire', 'statut', 'tentatives', 'prochaine_tentative', 'date_creation', 'date_envoi']
+    list_filter = ['statut', 'date_creation']
+    search_fields = ['sujet', 'destinataire']
+    date_hierarchy = 'date_creation'
+    readonly_fields = ['date_creation', 'date_envoi', 'derniere_erreur']
+    
+    actions = ['remettre_en_file']
+    
+    def remettre_en_file(self, request, queryset):
+        """Action pour renvoyer des emails en échec"""
+        count = queryset.exclude(statut='envoye').update(
+            statut='en_attente', tentatives=0, prochaine_tentative=timezone.now(), verrou=''
+        )
+        self.message_user(request, f'{count} email(s) remis en file.')
+    remettre_en_file.short_description = "🔁 Remettre en file d'envoi"
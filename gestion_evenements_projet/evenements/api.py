@@ -0,0 +1,217 @@
+"""
+API JSON en lecture seule pour l'application mobile et l'affichage dynamique.
+
+- GET api/evenements/ : événements validés à venir, ou passés avec
+  ?periode=passes, filtrables par ?categorie=, paginés par curseur sur
+  date_debut (?curseur=, ?taille= jusqu'à 100).
+- GET api/evenements/<pk>/ : un événement validé.
+- GET api/mes-inscriptions/ : inscriptions (confirmées ou en liste
+  d'attente) de l'utilisateur connecté, par date d'événement.
+
+?champs=titre,date_debut,... limite les champs des événements renvoyés.
+Chaque réponse porte un ETag fort calculé sur les versions des lignes :
+une requête If-None-Match avec la même valeur reçoit 304, sans sérialisation.
+"""
+from functools import wraps
+from django.db.models import F
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import require_safe
+from .conditionnel import ajouter_validateurs, etag_fort, reponse_non_modifiee, version_evenement
+from .models import Evenement, Inscription
+from .pagination import paginer_requete
+
+TAILLE_PAGE = 20
+TAILLE_PAGE_MAX = 100
+
+# Champs exposés et colonnes à charger pour chacun
+CHAMPS_EVENEMENT = {
+    'id': ['id'],
+    'titre': ['titre'],
+    'description': ['description'],
+    'date_debut': ['date_debut'],
+    'date_fin': ['date_fin'],
+    'lieu': ['lieu'],
+    'categorie': ['categorie'],
+    'capacite_max': ['capacite_max'],
+    'nb_inscrits': ['nb_inscrits'],
+    'places_restantes': ['capacite_max', 'nb_inscrits'],
+    'nb_en_attente': ['nb_en_attente'],
+    'organisateur': ['organisateur', 'organisateur__username', 'organisateur__first_name', 'organisateur__last_name'],
+    'date_modification': ['date_modification'],
+    'url': [],
+}
+# Colonnes toujours chargées : clé de pagination et version de l'ETag
+COLONNES_VERSION = [
+    'id', 'date_debut', 'date_fin', 'date_modification', 'statut', 'capacite_max',
+    'nb_inscrits', 'nb_en_attente', 'attente_tete',
+]
+
+
+class ErreurApi(Exception):
+    def __init__(self, message, statut=400):
+        super().__init__(message)
+        self.statut = statut
+
+
+def reponse_erreur(message, statut):
+    return JsonResponse({'erreur': message}, status=statut)
+
+
+def lire_champs(request):
+    """Champs demandés par ?champs=, tous par défaut"""
+    valeur = request.GET.get('champs')
+    if not valeur:
+        return list(CHAMPS_EVENEMENT)
+    champs = [champ.strip() for champ in valeur.split(',') if champ.strip()]
+    inconnus = [champ for champ in champs if champ not in CHAMPS_EVENEMENT]
+    if inconnus:
+        raise ErreurApi(f"Champ(s) inconnu(s) : {', '.join(inconnus)}")
+    return champs
+
+
+def lire_taille(request):
+    try:
+        taille = int(request.GET.get('taille', TAILLE_PAGE))
+    except ValueError:
+        raise ErreurApi("Le paramètre taille doit être un entier.")
+    return min(max(taille, 1), TAILLE_PAGE_MAX)
+
+
+def colonnes_evenement(champs, prefixe=''):
+    """Arguments de only() pour les champs demandés"""
+    colonnes = set(COLONNES_VERSION)
+    for champ in champs:
+        colonnes.update(CHAMPS_EVENEMENT[champ])
+    return [prefixe + colonne for colonne in sorted(colonnes)]
+
+
+def serialiser_evenement(request, evenement, champs):
+    donnees = {}
+    for champ in champs:
+        if champ == 'places_restantes':
+            donnees[champ] = max(evenement.capacite_max - evenement.nb_inscrits, 0)
+        elif champ == 'organisateur':
+            donnees[champ] = evenement.organisateur.get_full_name() or evenement.organisateur.username
+        elif champ == 'url':
+            donnees[champ] = request.build_absolute_uri(reverse('api_evenement', args=[evenement.pk]))
+        else:
+            donnees[champ] = getattr(evenement, champ)
+    return donnees
+
+
+def liens(request, page):
+    return {
+        'precedent': request.build_absolute_uri(request.path + page.lien_precedent) if page.lien_precedent else None,
+        'suivant': request.build_absolute_uri(request.path + page.lien_suivant) if page.lien_suivant else None,
+    }
+
+
+def api(vue):
+    """Méthodes GET/HEAD seulement, erreurs de paramètres renvoyées en JSON"""
+    @require_safe
+    @wraps(vue)
+    def enveloppe(request, *args, **kwargs):
+        try:
+            return vue(request, *args, **kwargs)
+        except ErreurApi as erreur:
+            return reponse_erreur(str(erreur), erreur.statut)
+    return enveloppe
+
+
+@api
+def api_liste_evenements(request):
+    """Liste paginée des événements validés"""
+    champs = lire_champs(request)
+    taille = lire_taille(request)
+    evenements = Evenement.objects.filter(statut='valide')
+
+    categorie = request.GET.get('categorie')
+    if categorie:
+        evenements = evenements.filter(categorie=categorie)
+
+    maintenant = timezone.now()
+    if request.GET.get('periode') == 'passes':
+        evenements = evenements.filter(date_debut__lt=maintenant)
+        ordre = ('-date_debut', '-id')
+    else:
+        evenements = evenements.filter(date_debut__gte=maintenant)
+        ordre = ('date_debut', 'id')
+
+    if 'organisateur' in champs:
+        evenements = evenements.select_related('organisateur')
+    evenements = evenements.only(*colonnes_evenement(champs))
+    page = paginer_requete(request, 'curseur', evenements, ordre, taille=taille)
+
+    etag = etag_fort(
+        'evenements', request.get_host(), champs, page.curseur_precedent, page.curseur_suivant,
+        [version_evenement(evenement) for evenement in page],
+    )
+    reponse = reponse_non_modifiee(request, etag)
+    if reponse is not None:
+        return reponse
+
+    return ajouter_validateurs(JsonResponse({
+        'resultats': [serialiser_evenement(request, evenement, champs) for evenement in page],
+        **liens(request, page),
+    }), etag)
+
+
+@api
+def api_detail_evenement(request, pk):
+    """Un événement validé"""
+    champs = lire_champs(request)
+    evenements = Evenement.objects.filter(pk=pk, statut='valide')
+    if 'organisateur' in champs:
+        evenements = evenements.select_related('organisateur')
+    evenement = evenements.only(*colonnes_evenement(champs)).first()
+    if evenement is None:
+        raise ErreurApi("Événement introuvable.", 404)
+
+    etag = etag_fort('evenement', request.get_host(), champs, version_evenement(evenement))
+    reponse = reponse_non_modifiee(request, etag)
+    if reponse is not None:
+        return reponse
+
+    return ajouter_validateurs(JsonResponse(serialiser_evenement(request, evenement, champs)), etag)
+
+
+@api
+def api_mes_inscriptions(request):
+    """Inscriptions actives de l'utilisateur connecté, par date d'événement"""
+    if not request.user.is_authenticated:
+        raise ErreurApi("Authentification requise.", 401)
+    champs = lire_champs(request)
+    taille = lire_taille(request)
+
+    inscriptions = Inscription.objects.filter(
+        participant=request.user, statut__in=['confirmee', 'en_attente']
+    ).select_related('evenement__organisateur' if 'organisateur' in champs else 'evenement').only(
+        'id', 'statut', 'ticket_attente', 'date_inscription', 'evenement',
+        *colonnes_evenement(champs, 'evenement__'),
+    ).annotate(date_debut=F('evenement__date_debut'))
+    page = paginer_requete(request, 'curseur', inscriptions, ('date_debut', 'id'), taille=taille)
+
+    etag = etag_fort(
+        'inscriptions', request.get_host(), request.user.pk, champs, page.curseur_precedent, page.curseur_suivant,
+        [(inscription.pk, inscription.statut, inscription.ticket_attente, version_evenement(inscription.evenement))
+         for inscription in page],
+    )
+    reponse = reponse_non_modifiee(request, etag, prive=True)
+    if reponse is not None:
+        return reponse
+
+    return ajouter_validateurs(JsonResponse({
+        'resultats': [
+            {
+                'id': inscription.pk,
+                'statut': inscription.statut,
+                'date_inscription': inscription.date_inscription,
+                'position_attente': inscription.position_attente(),
+                'evenement': serialiser_evenement(request, inscription.evenement, champs),
+            }
+            for inscription in page
+        ],
+        **liens(request, page),
+    }), etag, prive=True)
@@ -11,4 +11,4 @@ class EvenementsConfig(AppConfig):
         Méthode appelée au démarrage de l'application.
         Utilisée pour enregistrer les signaux si nécessaire.
         """
-        pass
\ No newline at end of file
+        from . import signals  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Fragments de pages mis en cache.
+
+Le bloc « Prochains événements » de l'accueil est identique pour tous les
+visiteurs, connectés ou non : son HTML est rendu une fois puis servi depuis
+le cache. Il est invalidé à la validation de la transaction qui modifie un
+événement ou les inscrits d'un événement affiché (signaux), et par les
+actions de l'admin qui passent par queryset.update(). Il expire de lui-même
+au début du premier événement affiché, qui n'est alors plus « à venir ».
+
+Le bloc est rangé sous une clé qui porte un numéro de génération, et
+l'invalidation fait avancer ce numéro (incr, atomique). Une requête qui a lu
+l'état précédent range son bloc sous l'ancienne génération, que plus
+personne ne lit : elle ne peut pas remettre en cache un état périmé.
+
+Les facettes de l'annuaire des utilisateurs (effectifs par rôle et par
+département) sont calculées par un seul GROUP BY et invalidées à la
+validation de chaque inscription, changement de rôle ou de département et
+suppression. Des incréments (lecture, modification, écriture de l'entrée)
+perdraient des mises à jour entre deux requêtes concurrentes.
+
+Le nombre d'événements validés à venir et passés de chaque catégorie, pour
+la recherche en cours, est gardé quelques instants par texte recherché.
+"""
+import hashlib
+import re
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from django.db.models import Count, Q
+from .models import Evenement, Utilisateur
+from .recherche import rechercher_evenements
+from .routeurs import lecture_primaire
+
+CLE_ACCUEIL = 'accueil:evenements_a_venir'
+CLE_GENERATION_ACCUEIL = 'accueil:generation'
+CLE_FACETTES_UTILISATEURS = 'utilisateurs:facettes'
+PREFIXE_CATEGORIES = 'evenements:categories'
+NB_EVENEMENTS_ACCUEIL = 6
+
+
+def cle_accueil():
+    """Clé du bloc de l'accueil pour la génération courante"""
+    generation = cache.get(CLE_GENERATION_ACCUEIL)
+    if generation is None:
+        # Génération absente (premier accès, éviction) : un point de départ
+        # jamais utilisé, pour ne pas retrouver un bloc d'une génération passée
+        cache.add(CLE_GENERATION_ACCUEIL, time.time_ns(), None)
+        generation = cache.get(CLE_GENERATION_ACCUEIL)
+    return f'{CLE_ACCUEIL}:{generation}'
+
+
+def bloc_evenements_accueil():
+    """
+    Retourne (html, nb_evenements) du bloc des prochains événements validés,
+    depuis le cache ou en le rendant.
+    """
+    # Génération lue avant les événements : une invalidation validée pendant
+    # le rendu rend le bloc rangé ci-dessous inaccessible
+    cle = cle_accueil()
+    entree = cache.get(cle)
+    if entree is not None:
+        return mark_safe(entree['html']), len(entree['ids'])
+
+    maintenant = timezone.now()
+    # Sur la base principale : le bloc reste en cache jusqu'à la prochaine invalidation
+    with lecture_primaire():
+        evenements = list(
+            Evenement.objects.filter(statut='valide', date_debut__gte=maintenant)
+            .order_by('date_debut')[:NB_EVENEMENTS_ACCUEIL]
+        )
+    html = render_to_string('evenements/_evenements_a_venir.html', {'evenements': evenements})
+
+    # Durée maximale : filet de sécurité pour les écritures sans signal
+    # (bulk_create, recalculer_inscrits) et les autres processus du serveur
+    duree = getattr(settings, 'CACHE_ACCUEIL_DUREE', 300)
+    if evenements:
+        duree = min(duree, (evenements[0].date_debut - maintenant).total_seconds())
+    cache.set(cle, {'html': html, 'ids': [evenement.pk for evenement in evenements]}, int(duree))
+    return html, len(evenements)
+
+
+def invalider_accueil(evenement_id=None):
+    """
+    Fait avancer la génération du bloc de l'accueil après validation de la
+    transaction en cours. Avec evenement_id, seulement si cet événement est
+    affiché ou si aucun bloc n'est en cache (une requête peut être en train
+    de le rendre).
+    """
+    def invalider():
+        if evenement_id is not None:
+            entree = cache.get(cle_accueil())
+            if entree is not None and evenement_id not in entree['ids']:
+                return
+        try:
+            cache.incr(CLE_GENERATION_ACCUEIL)
+        except ValueError:
+            # Génération perdue : la prochaine lecture en crée une nouvelle
+            pass
+
+    transaction.on_commit(invalider)
+
+
+def facettes_utilisateurs():
+    """
+    Retourne {'roles': {role: nb}, 'departements': {departement: nb}} pour
+    tous les utilisateurs, depuis le cache ou par un GROUP BY sur l'index
+    (departement, role). Les utilisateurs sans département ne comptent que
+    dans les rôles.
+    """
+    entree = cache.get(CLE_FACETTES_UTILISATEURS)
+    if entree is not None:
+        return entree
+
+    roles, departements = {}, {}
+    # Sur la base principale : un état en retard de la réplique resterait en cache
+    with lecture_primaire():
+        groupes = list(
+            Utilisateur.objects.order_by().values_list('departement', 'role').annotate(nb=Count('*'))
+        )
+    for departement, role, nb in groupes:
+        roles[role] = roles.get(role, 0) + nb
+        if departement:
+            departements[departement] = departements.get(departement, 0) + nb
+
+    # Durée maximale : filet de sécurité pour les écritures sans signal
+    # (bulk_create) et les autres processus du serveur
+    entree = {'roles': roles, 'departements': departements}
+    cache.set(CLE_FACETTES_UTILISATEURS, entree, getattr(settings, 'CACHE_FACETTES_DUREE', 3600))
+    return entree
+
+
+def invalider_facettes_utilisateurs():
+    """
+    Supprime les facettes après validation de la transaction en cours : la
+    requête suivante les recalcule avec l'utilisateur créé, modifié ou supprimé.
+    """
+    transaction.on_commit(lambda: cache.delete(CLE_FACETTES_UTILISATEURS))
+
+
+def comptes_categories(recherche=''):
+    """
+    Retourne {categorie: {'a_venir': nb, 'passes': nb}} pour les événements
+    validés correspondant à `recherche`, en un seul GROUP BY. Le résultat est
+    mis en cache CACHE_CATEGORIES_DUREE secondes par texte recherché (casse,
+    ponctuation et espaces ignorés, comme dans la recherche).
+    """
+    mots = ' '.join(re.findall(r'\w+', (recherche or '').lower()))
+    cle = f'{PREFIXE_CATEGORIES}:{hashlib.md5(mots.encode()).hexdigest()}'
+    comptes = cache.get(cle)
+    if comptes is not None:
+        return comptes
+
+    maintenant = timezone.now()
+    evenements = Evenement.objects.filter(statut='valide')
+    if mots:
+        evenements = rechercher_evenements(evenements, mots)
+    groupes = evenements.order_by().values('categorie').annotate(
+        a_venir=Count('id', filter=Q(date_debut__gte=maintenant)),
+        passes=Count('id', filter=Q(date_debut__lt=maintenant)),
+    )
+    comptes = {
+        groupe['categorie']: {'a_venir': groupe['a_venir'], 'passes': groupe['passes']}
+        for groupe in groupes
+    }
+    cache.set(cle, comptes, getattr(settings, 'CACHE_CATEGORIES_DUREE', 60))
+    return comptes
+
@@ -0,0 +1,169 @@
+"""
+Flux iCalendar (.ics) pour l'abonnement depuis un agenda (Google Agenda,
+Outlook, Thunderbird...).
+
+- GET calendrier/evenements.ics : événements validés, filtrables par
+  ?categorie=. Public : les agendas ne se connectent pas.
+- GET calendrier/<jeton>.ics : inscriptions confirmées d'un utilisateur. Le
+  jeton, affiché sur son profil, dépend du mot de passe : le changer
+  révoque les abonnements existants.
+
+Les flux sont écrits au fil de la lecture des lignes (StreamingHttpResponse
+sur iterator()) : la mémoire utilisée ne dépend pas du nombre d'événements.
+Les agendas interrogent les flux très souvent : une requête d'agrégat donne
+la version de l'ensemble, et un If-None-Match égal reçoit 304 sans lire les
+événements. Pas de Last-Modified : une suppression ne le ferait pas avancer.
+"""
+from datetime import timezone as fuseau
+from django.db.models import Count, Max, Sum
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.views.decorators.http import require_safe
+from .conditionnel import ajouter_validateurs, etag_fort, reponse_non_modifiee
+from .models import Evenement, Inscription, Utilisateur
+
+TAILLE_LOT = 500
+# Colonnes lues pour chaque VEVENT
+COLONNES = ['id', 'titre', 'description', 'date_debut', 'date_fin', 'lieu', 'categorie', 'date_modification']
+SEL_JETON = 'evenements.calendrier.jeton'
+
+
+def jeton_calendrier(utilisateur):
+    """Jeton du flux personnel : identifiant et HMAC du mot de passe haché"""
+    empreinte = salted_hmac(SEL_JETON, f'{utilisateur.pk}:{utilisateur.password}').hexdigest()[:20]
+    return f'{utilisateur.pk}-{empreinte}'
+
+
+def utilisateur_du_jeton(jeton):
+    """Utilisateur actif correspondant au jeton, sinon None"""
+    identifiant = jeton.partition('-')[0]
+    if not identifiant.isdigit():
+        return None
+    utilisateur = Utilisateur.objects.filter(pk=identifiant, is_active=True).only('id', 'password').first()
+    if utilisateur is None or not constant_time_compare(jeton, jeton_calendrier(utilisateur)):
+        return None
+    return utilisateur
+
+
+def echapper(texte):
+    """Échappement des valeurs texte (RFC 5545, 3.3.11)"""
+    return (
+        texte.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def plier(ligne):
+    """Coupe une ligne de contenu en segments de 75 octets au plus, terminés par CRLF"""
+    octets = ligne.encode()
+    if len(octets) <= 75:
+        return ligne + '\r\n'
+    segments = []
+    debut, limite = 0, 75
+    while debut < len(octets):
+        fin = min(debut + limite, len(octets))
+        # Ne pas couper un caractère UTF-8 en deux
+        while fin < len(octets) and octets[fin] & 0xC0 == 0x80:
+            fin -= 1
+        segments.append(octets[debut:fin].decode())
+        # Les lignes de continuation commencent par une espace
+        debut, limite = fin, 74
+    return '\r\n '.join(segments) + '\r\n'
+
+
+def date_utc(date):
+    return date.astimezone(fuseau.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def vevent(request, evenement, horodatage):
+    lignes = [
+        'BEGIN:VEVENT',
+        f'UID:evenement-{evenement.pk}@{request.get_host()}',
+        f'DTSTAMP:{horodatage}',
+        f'DTSTART:{date_utc(evenement.date_debut)}',
+        f'DTEND:{date_utc(evenement.date_fin)}',
+        f'LAST-MODIFIED:{date_utc(evenement.date_modification)}',
+        f'SUMMARY:{echapper(evenement.titre)}',
+        f'DESCRIPTION:{echapper(evenement.description)}',
+        f'LOCATION:{echapper(evenement.lieu)}',
+        f'CATEGORIES:{echapper(evenement.get_categorie_display())}',
+        f"URL:{request.build_absolute_uri(reverse('detail_evenement', args=[evenement.pk]))}",
+        'END:VEVENT',
+    ]
+    return ''.join(plier(ligne) for ligne in lignes)
+
+
+def contenu_calendrier(request, nom, evenements):
+    """Générateur du calendrier : en-tête, un VEVENT par événement lu, fin"""
+    yield ''.join(plier(ligne) for ligne in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Gestion des événements//Calendrier//FR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{echapper(nom)}',
+    ])
+    horodatage = date_utc(timezone.now())
+    for evenement in evenements.iterator(chunk_size=TAILLE_LOT):
+        yield vevent(request, evenement, horodatage)
+    yield 'END:VCALENDAR\r\n'
+
+
+def reponse_calendrier(request, nom, evenements, etag, prive=False):
+    reponse = StreamingHttpResponse(
+        contenu_calendrier(request, nom, evenements), content_type='text/calendar; charset=utf-8'
+    )
+    reponse['Content-Disposition'] = 'inline; filename="evenements.ics"'
+    return ajouter_validateurs(reponse, etag, prive=prive)
+
+
+@require_safe
+def calendrier_evenements(request):
+    """Flux des événements validés, éventuellement d'une seule catégorie"""
+    evenements = Evenement.objects.filter(statut='valide')
+    categorie = request.GET.get('categorie')
+    nom = 'Événements'
+    if categorie:
+        if categorie not in dict(Evenement.CATEGORIE_CHOICES):
+            raise Http404("Catégorie inconnue.")
+        evenements = evenements.filter(categorie=categorie)
+        nom = f'Événements - {dict(Evenement.CATEGORIE_CHOICES)[categorie]}'
+
+    # Version de l'ensemble : un ajout, une suppression ou une modification
+    # change le nombre, la somme des identifiants ou la dernière modification
+    version = evenements.order_by().aggregate(
+        nb=Count('id'), ids=Sum('id'), derniere_modification=Max('date_modification'),
+    )
+    etag = etag_fort('calendrier', request.get_host(), categorie, version)
+    reponse = reponse_non_modifiee(request, etag)
+    if reponse is not None:
+        return reponse
+
+    evenements = evenements.order_by('date_debut', 'id').only(*COLONNES)
+    return reponse_calendrier(request, nom, evenements, etag)
+
+
+@require_safe
+def calendrier_inscriptions(request, jeton):
+    """Flux des inscriptions confirmées de l'utilisateur du jeton"""
+    utilisateur = utilisateur_du_jeton(jeton)
+    if utilisateur is None:
+        raise Http404("Calendrier introuvable.")
+
+    inscriptions = Inscription.objects.filter(
+        participant=utilisateur, statut='confirmee', evenement__statut='valide'
+    )
+    version = inscriptions.order_by().aggregate(
+        nb=Count('id'), ids=Sum('id'), derniere_modification=Max('evenement__date_modification'),
+    )
+    etag = etag_fort('calendrier', request.get_host(), jeton, version)
+    reponse = reponse_non_modifiee(request, etag, prive=True)
+    if reponse is not None:
+        return reponse
+
+    evenements = Evenement.objects.filter(
+        inscriptions__participant=utilisateur, inscriptions__statut='confirmee', statut='valide'
+    ).order_by('date_debut', 'id').only(*COLONNES)
+    return reponse_calendrier(request, 'Mes inscriptions', evenements, etag, prive=True)
@@ -0,0 +1,91 @@
+"""
+Requêtes conditionnelles (ETag / If-None-Match).
+
+Les ETags sont calculés à partir des versions des lignes affichées
+(date_modification, statut, capacité, période et compteurs de places des
+événements) et non du contenu de la réponse : quand le client a déjà la
+bonne version, la réponse 304 est envoyée sans sérialiser ni rendre de
+template.
+
+Pas de Last-Modified : les places, la liste d'attente et l'inscription du
+visiteur changent la page sans faire avancer date_modification, et un
+client qui n'enverrait qu'If-Modified-Since recevrait une page périmée.
+"""
+import hashlib
+import json
+from django.contrib.messages import get_messages
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+
+def periode_evenement(evenement):
+    """'a_venir', 'en_cours' ou 'passe' : change avec l'heure, sans écriture en base"""
+    maintenant = timezone.now()
+    if evenement.date_fin < maintenant:
+        return 'passe'
+    if evenement.date_debut <= maintenant:
+        return 'en_cours'
+    return 'a_venir'
+
+
+def version_evenement(evenement):
+    """
+    Version d'un événement. date_modification (auto_now) n'est pas modifiée
+    par les UPDATE (compteurs, actions groupées) : les places, le statut et
+    la capacité sont donc ajoutés à la version, ainsi que la période, qui
+    change l'affichage (événement terminé) sans aucune écriture.
+    """
+    return (
+        evenement.pk, evenement.date_modification.isoformat(), evenement.statut, evenement.capacite_max,
+        periode_evenement(evenement), evenement.nb_inscrits, evenement.nb_en_attente, evenement.attente_tete,
+    )
+
+
+def etag_fort(*parties):
+    """ETag fort (entre guillemets) calculé sur des valeurs sérialisables en JSON"""
+    empreinte = hashlib.sha1(json.dumps(parties, default=str, separators=(',', ':')).encode())
+    return f'"{empreinte.hexdigest()}"'
+
+
+def etag_page(request, *parties):
+    """
+    ETag d'une page HTML : ajoute aux parties l'utilisateur connecté (barre
+    de navigation, droits affichés) et le secret CSRF des formulaires, créé
+    dès maintenant s'il n'existe pas encore pour que le premier rendu porte
+    déjà le bon ETag. Retourne None si des messages attendent d'être affichés : la page doit
+    alors être rendue.
+    """
+    if len(get_messages(request)):
+        return None
+    get_token(request)
+    utilisateur = request.user
+    return etag_fort(
+        *parties, utilisateur.pk, utilisateur.get_username(), utilisateur.first_name,
+        getattr(utilisateur, 'role', None), request.META['CSRF_COOKIE'],
+    )
+
+
+def reponse_non_modifiee(request, etag=None, prive=False):
+    """
+    Retourne une réponse 304 (ou 412 pour If-Match) si les en-têtes
+    conditionnels de la requête correspondent à la version courante, sinon None.
+    """
+    reponse = get_conditional_response(request, etag=etag)
+    if reponse is not None:
+        ajouter_validateurs(reponse, etag, prive)
+    return reponse
+
+
+def ajouter_validateurs(reponse, etag=None, prive=False):
+    """
+    Ajoute l'ETag à la réponse. no-cache : le client garde la réponse mais
+    la revalide à chaque fois (réponse 304 si rien n'a changé).
+    """
+    if etag:
+        reponse['ETag'] = etag
+    if prive:
+        patch_cache_control(reponse, private=True, no_cache=True)
+    else:
+        patch_cache_control(reponse, no_cache=True)
+    return reponse
@@ -0,0 +1,215 @@
+"""
+Places disponibles d'un événement en direct sur la page de détail.
+
+Sous ASGI (VUES_ASYNC), la page ouvre un flux Server-Sent Events sur
+evenements/<pk>/disponibilite/ : chaque changement du nombre d'inscrits,
+de la liste d'attente, de la capacité ou du statut y est poussé dans un
+événement « places » (JSON), et la page met à jour sa barre de progression
+sans être rechargée. Sous WSGI, un flux ouvert occuperait un fil du serveur
+pendant toute sa durée : la même URL répond alors par l'état courant en
+JSON, que la page redemande toutes les DISPONIBILITE_SONDAGE secondes.
+
+Les flux ne lisent pas la base eux-mêmes. Chaque processus tient un
+Diffuseur par événement suivi, alimenté par un seul fil (Releveur) qui
+relit tous les événements suivis en une requête toutes les
+DISPONIBILITE_INTERVALLE secondes, et aussitôt après une inscription
+validée dans ce processus (signaux). Cent étudiants sur la même page
+coûtent une requête par intervalle, et non cent.
+
+Un flux dure au plus DISPONIBILITE_DUREE_FLUX secondes ; le navigateur se
+reconnecte seul (EventSource) et ne reçoit l'état que s'il a changé
+depuis son dernier événement (Last-Event-ID). Chaque flux ouvert est une
+coroutine en attente, et non un fil.
+"""
+import asyncio
+import json
+import threading
+import time
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.http import StreamingHttpResponse
+from .models import Evenement
+
+# Colonnes lues pour l'état diffusé
+CHAMPS_ETAT = ['id', 'statut', 'capacite_max', 'nb_inscrits', 'nb_en_attente']
+# Délai de reconnexion du navigateur et intervalle des commentaires de maintien
+RECONNEXION_MS = 3000
+MAINTIEN = 15
+
+
+def etat_places(evenement):
+    """État diffusé d'un événement chargé avec au moins CHAMPS_ETAT"""
+    return {
+        'inscrits': evenement.nb_inscrits,
+        'capacite': evenement.capacite_max,
+        'places_restantes': evenement.places_restantes(),
+        'en_attente': evenement.nb_en_attente,
+        'complet': evenement.est_complet(),
+        'statut': evenement.statut,
+    }
+
+
+def identifiant_etat(etat):
+    """Identifiant SSE de l'état : le même dans tous les processus du serveur"""
+    return f"{etat['inscrits']}-{etat['capacite']}-{etat['en_attente']}-{etat['statut']}"
+
+
+def message_places(etat):
+    return f'id: {identifiant_etat(etat)}\nevent: places\ndata: {json.dumps(etat)}\n\n'
+
+
+def _reveiller(futur):
+    if not futur.done():
+        futur.set_result(None)
+
+
+class Diffuseur:
+    """
+    Dernier état connu d'un événement. Publié depuis le fil du releveur ; les
+    flux attendent, dans leur boucle d'événements, une version plus récente
+    que la leur.
+    """
+
+    def __init__(self):
+        self.etat = None
+        self.version = 0
+        self._verrou = threading.Lock()
+        self._futurs = set()
+
+    def publier(self, etat):
+        with self._verrou:
+            if etat == self.etat:
+                return
+            self.etat = etat
+            self.version += 1
+            futurs, self._futurs = self._futurs, set()
+        for boucle, futur in futurs:
+            boucle.call_soon_threadsafe(_reveiller, futur)
+
+    def lire(self):
+        with self._verrou:
+            return self.version, self.etat
+
+    async def aattendre(self, version, delai):
+        """Retourne (version, état) dès que version est dépassée, ou après delai secondes"""
+        boucle = asyncio.get_running_loop()
+        with self._verrou:
+            if self.version > version:
+                return self.version, self.etat
+            futur = boucle.create_future()
+            self._futurs.add((boucle, futur))
+        try:
+            await asyncio.wait_for(futur, delai)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._verrou:
+                self._futurs.discard((boucle, futur))
+        return self.lire()
+
+
+class Releveur:
+    """
+    Diffuseurs des événements suivis par ce processus et fil qui les
+    alimente. Le fil démarre avec le premier abonné et s'arrête (en fermant
+    sa connexion) quand il n'en reste plus.
+    """
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._diffuseurs = {}
+        self._abonnes = {}
+        self._reveil = threading.Event()
+        self._fil = None
+
+    def abonner(self, evenement_id, etat):
+        """Diffuseur de l'événement ; etat, lu par la vue, sert s'il n'est pas encore suivi"""
+        with self._verrou:
+            diffuseur = self._diffuseurs.setdefault(evenement_id, Diffuseur())
+            self._abonnes[evenement_id] = self._abonnes.get(evenement_id, 0) + 1
+            if self._fil is None:
+                self._fil = self.demarrer()
+        if diffuseur.etat is None:
+            diffuseur.publier(etat)
+        return diffuseur
+
+    def desabonner(self, evenement_id):
+        with self._verrou:
+            self._abonnes[evenement_id] -= 1
+            if not self._abonnes[evenement_id]:
+                del self._abonnes[evenement_id]
+                del self._diffuseurs[evenement_id]
+
+    def signaler(self, evenement_id):
+        """Relève anticipée : l'événement vient d'être modifié par ce processus"""
+        if evenement_id in self._diffuseurs:
+            self._reveil.set()
+
+    def demarrer(self):
+        fil = threading.Thread(target=self._boucle, name='releveur-places', daemon=True)
+        fil.start()
+        return fil
+
+    def relever(self):
+        """Relit tous les événements suivis en une requête et publie leurs états"""
+        with self._verrou:
+            diffuseurs = dict(self._diffuseurs)
+        if not diffuseurs:
+            return
+        for evenement in Evenement.objects.filter(pk__in=diffuseurs).only(*CHAMPS_ETAT):
+            diffuseurs[evenement.pk].publier(etat_places(evenement))
+
+    def _boucle(self):
+        try:
+            while True:
+                self._reveil.wait(getattr(settings, 'DISPONIBILITE_INTERVALLE', 1))
+                self._reveil.clear()
+                with self._verrou:
+                    if not self._diffuseurs:
+                        self._fil = None
+                        return
+                try:
+                    self.relever()
+                except DatabaseError:
+                    # Base momentanément indisponible : nouvelle connexion au prochain tour
+                    connections.close_all()
+        finally:
+            connections.close_all()
+
+
+releveur = Releveur()
+
+
+def signaler_places(evenement_id):
+    """Prévient les flux de ce processus après validation de la transaction en cours"""
+    transaction.on_commit(lambda: releveur.signaler(evenement_id))
+
+
+async def aflux_places(evenement_id, etat, dernier_id):
+    """Flux SSE d'un événement, fermé après DISPONIBILITE_DUREE_FLUX secondes"""
+    diffuseur = releveur.abonner(evenement_id, etat)
+    try:
+        # État courant du diffuseur : peut être plus récent que celui lu par la vue
+        version, etat = diffuseur.lire()
+        yield f'retry: {RECONNEXION_MS}\n\n'
+        if identifiant_etat(etat) != dernier_id:
+            yield message_places(etat)
+        fin = time.monotonic() + getattr(settings, 'DISPONIBILITE_DUREE_FLUX', 60)
+        while (reste := fin - time.monotonic()) > 0:
+            nouvelle, etat = await diffuseur.aattendre(version, min(reste, MAINTIEN))
+            if nouvelle == version:
+                # Commentaire : garde la connexion ouverte à travers les proxys
+                yield ': maintien\n\n'
+            else:
+                version = nouvelle
+                yield message_places(etat)
+    finally:
+        releveur.desabonner(evenement_id)
+
+
+def reponse_flux(flux):
+    reponse = StreamingHttpResponse(flux, content_type='text/event-stream')
+    reponse['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par nginx
+    reponse['X-Accel-Buffering'] = 'no'
+    return reponse
@@ -1,237 +1,341 @@
-from django.core.mail import send_mail, send_mass_mail
+import smtplib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 from django.conf import settings
+from .models import Evenement, Inscription, EmailSortant
+from .profilage import mesurer
 
 
-def envoyer_email_inscription(inscription):
+def mettre_en_file(sujet, message_texte, message_html, destinataire):
     """
-    Envoie un email de confirmation d'inscription au participant
+    Enregistre un email dans la file d'envoi. Appelée dans la transaction de
+    la vue, l'écriture est annulée avec elle si le changement d'état échoue.
     """
-    evenement = inscription.evenement
-    participant = inscription.participant
-    
-    sujet = f"✅ Confirmation d'inscription - {evenement.titre}"
+    return EmailSortant.objects.create(
+        sujet=sujet,
+        message_texte=message_texte,
+        message_html=message_html,
+        expediteur=settings.DEFAULT_FROM_EMAIL,
+        destinataire=destinataire,
+    )
+
+
+def connexion_perdue(erreur):
+    """
+    Vrai pour une erreur de la connexion au relais (déconnexion, erreur
+    réseau) plutôt que du message : les SMTPException sont aussi des
+    OSError, mais seule SMTPServerDisconnected concerne la connexion.
+    """
+    if isinstance(erreur, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(erreur, OSError) and not isinstance(erreur, smtplib.SMTPException)
+
+
+def envoyer_file_attente(taille_lot=50, max_tentatives=5, delai_base=60, connection=None):
+    """
+    Envoie un lot d'emails dus de la file d'envoi sur une seule connexion SMTP.
     
-    # Template HTML de l'email
-    contexte = {
-        'participant': participant,
-        'evenement': evenement,
-        'inscription': inscription,
-    }
+    Les messages dus sont d'abord réservés (statut 'en_cours' et jeton de
+    verrou) par un UPDATE conditionnel, ce qui permet de lancer plusieurs
+    workers sans double envoi, puis envoyés dans l'ordre (prochaine_tentative,
+    id) : les plus anciens d'abord.
+    En cas d'échec, le message est reprogrammé avec un délai exponentiel
+    (delai_base * 2^(tentatives - 1) secondes) puis passe en 'echec' après
+    max_tentatives essais. Une connexion perdue en cours de lot (voir
+    connexion_perdue) n'est pas un échec des messages : le lot s'arrête, les
+    messages restants sont remis en file sans compter d'essai et l'erreur
+    est propagée.
     
-    message_html = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
-                <h2 style="color: #667eea;">✅ Inscription confirmée !</h2>
-                
-                <p>Bonjour <strong>{participant.get_full_name()}</strong>,</p>
-                
-                <p>Votre inscription à l'événement suivant a bien été prise en compte :</p>
-                
-                <div style="background: #f9fafb; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="margin-top: 0; color: #667eea;">{evenement.titre}</h3>
-                    <p><strong>📅 Date :</strong> {evenement.date_debut.strftime('%d/%m/%Y à %H:%M')}</p>
-                    <p><strong>📍 Lieu :</strong> {evenement.lieu}</p>
-                    <p><strong>👤 Organisateur :</strong> {evenement.organisateur.get_full_name()}</p>
-                </div>
-                
-                <p><strong>Description :</strong></p>
-                <p>{evenement.description}</p>
-                
-                <div style="margin-top: 30px; padding: 15px; background: #e0f2fe; border-radius: 8px;">
-                    <p style="margin: 0;"><strong>💡 Conseils :</strong></p>
-                    <ul>
-                        <li>Arrivez 10 minutes avant le début</li>
-                        <li>N'oubliez pas votre pièce d'identité si nécessaire</li>
-                        <li>En cas d'empêchement, annulez votre inscription depuis votre espace</li>
-                    </ul>
-                </div>
-                
-                <p style="margin-top: 30px;">À très bientôt !</p>
-                <p style="color: #888; font-size: 12px;">
-                    Cet email a été envoyé automatiquement, merci de ne pas y répondre.
-                </p>
-            </div>
-        </body>
-    </html>
+    Retourne un tuple (nb_envoyes, nb_erreurs).
     """
+    maintenant = timezone.now()
+    
+    # Messages réservés par un worker interrompu : remis en file
+    EmailSortant.objects.filter(
+        statut='en_cours',
+        prochaine_tentative__lt=maintenant - timedelta(minutes=10)
+    ).update(statut='en_attente', verrou='')
+    
+    ids = list(
+        EmailSortant.objects.filter(
+            statut='en_attente',
+            prochaine_tentative__lte=maintenant
+        ).order_by('prochaine_tentative', 'id').values_list('pk', flat=True)[:taille_lot]
+    )
+    if not ids:
+        return 0, 0
     
-    message_texte = strip_tags(message_html)
+    verrou = uuid.uuid4().hex
+    EmailSortant.objects.filter(pk__in=ids, statut='en_attente').update(
+        statut='en_cours',
+        verrou=verrou,
+        prochaine_tentative=maintenant
+    )
+    reserves = EmailSortant.objects.filter(verrou=verrou, statut='en_cours').in_bulk()
+    messages = [reserves[pk] for pk in ids if pk in reserves]
     
+    # Une connexion fournie par l'appelant reste ouverte pour les lots suivants
+    fermer = connection is None
+    connection = connection or get_connection()
+    nb_envoyes = nb_erreurs = 0
     try:
-        send_mail(
-            sujet,
-            message_texte,
-            settings.DEFAULT_FROM_EMAIL,
-            [participant.email],
-            html_message=message_html,
-            fail_silently=False,
-        )
-        return True
+        connection.open()
+        for message in messages:
+            email = EmailMultiAlternatives(
+                message.sujet,
+                message.message_texte,
+                message.expediteur,
+                [message.destinataire],
+                connection=connection,
+            )
+            if message.message_html:
+                email.attach_alternative(message.message_html, 'text/html')
+            
+            try:
+                email.send()
+            except Exception as e:
+                if connexion_perdue(e):
+                    raise
+                nb_erreurs += 1
+                message.tentatives += 1
+                message.derniere_erreur = str(e)
+                if message.tentatives >= max_tentatives:
+                    message.statut = 'echec'
+                else:
+                    message.statut = 'en_attente'
+                    message.prochaine_tentative = timezone.now() + timedelta(
+                        seconds=delai_base * 2 ** (message.tentatives - 1)
+                    )
+                message.verrou = ''
+                message.save(update_fields=['statut', 'tentatives', 'derniere_erreur', 'prochaine_tentative', 'verrou'])
+            else:
+                nb_envoyes += 1
+                message.statut = 'envoye'
+                message.date_envoi = timezone.now()
+                message.verrou = ''
+                message.save(update_fields=['statut', 'date_envoi', 'verrou'])
     except Exception as e:
-        print(f"Erreur d'envoi d'email : {e}")
-        return False
+        # Connexion impossible ou perdue : les messages réservés restants sont
+        # remis en file, sans compter d'essai
+        EmailSortant.objects.filter(verrou=verrou, statut='en_cours').update(
+            statut='en_attente',
+            derniere_erreur=str(e),
+            prochaine_tentative=timezone.now() + timedelta(seconds=delai_base)
+        )
+        raise
+    finally:
+        if fermer:
+            connection.close()
+    
+    return nb_envoyes, nb_erreurs
+
 
+def rendre_email(nom, contexte):
+    """
+    Rend les variantes texte et HTML d'un email à partir des templates
+    evenements/emails/<nom>.txt et .html. Les templates sont compilés une
+    seule fois par le chargeur en cache de Django ; les champs saisis par les
+    utilisateurs (titre, description, lieu...) sont échappés dans la version HTML.
+    """
+    message_texte = render_to_string(f'evenements/emails/{nom}.txt', contexte)
+    message_html = render_to_string(f'evenements/emails/{nom}.html', contexte)
+    return message_texte.strip(), message_html
 
+
+@mesurer('email')
+def envoyer_email_inscription(inscription):
+    """
+    Met en file un email de confirmation d'inscription au participant
+    """
+    evenement = inscription.evenement
+    participant = inscription.participant
+    
+    sujet = f"✅ Confirmation d'inscription - {evenement.titre}"
+    message_texte, message_html = rendre_email('inscription', {
+        'nom_destinataire': participant.get_full_name(),
+        'evenement': evenement,
+        'inscription': inscription,
+    })
+    return mettre_en_file(sujet, message_texte, message_html, participant.email)
+
+
+@mesurer('email')
 def envoyer_email_annulation(inscription):
     """
-    Envoie un email de confirmation d'annulation
+    Met en file un email de confirmation d'annulation
     """
     evenement = inscription.evenement
     participant = inscription.participant
     
     sujet = f"❌ Annulation d'inscription - {evenement.titre}"
-    
-    message_html = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
-                <h2 style="color: #ef4444;">❌ Inscription annulée</h2>
-                
-                <p>Bonjour <strong>{participant.get_full_name()}</strong>,</p>
-                
-                <p>Votre inscription à l'événement suivant a bien été annulée :</p>
-                
-                <div style="background: #fef2f2; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="margin-top: 0;">{evenement.titre}</h3>
-                    <p><strong>📅 Date :</strong> {evenement.date_debut.strftime('%d/%m/%Y à %H:%M')}</p>
-                    <p><strong>📍 Lieu :</strong> {evenement.lieu}</p>
-                </div>
-                
-                <p>Vous pouvez vous réinscrire à tout moment si vous changez d'avis (sous réserve de places disponibles).</p>
-                
-                <p style="margin-top: 30px;">À bientôt sur notre plateforme !</p>
-            </div>
-        </body>
-    </html>
+    message_texte, message_html = rendre_email('annulation', {
+        'nom_destinataire': participant.get_full_name(),
+        'evenement': evenement,
+    })
+    return mettre_en_file(sujet, message_texte, message_html, participant.email)
+
+
+@mesurer('email')
+def envoyer_email_promotion(inscription):
     """
+    Met en file un email au participant promu depuis la liste d'attente
+    """
+    evenement = inscription.evenement
+    participant = inscription.participant
     
-    message_texte = strip_tags(message_html)
-    
-    try:
-        send_mail(
-            sujet,
-            message_texte,
-            settings.DEFAULT_FROM_EMAIL,
-            [participant.email],
-            html_message=message_html,
-            fail_silently=False,
-        )
-        return True
-    except Exception as e:
-        print(f"Erreur d'envoi d'email : {e}")
-        return False
+    sujet = f"🎉 Une place s'est libérée - {evenement.titre}"
+    message_texte, message_html = rendre_email('promotion', {
+        'nom_destinataire': participant.get_full_name(),
+        'evenement': evenement,
+    })
+    return mettre_en_file(sujet, message_texte, message_html, participant.email)
 
 
+@mesurer('email')
 def envoyer_email_validation_evenement(evenement):
     """
-    Envoie un email à l'organisateur quand son événement est validé
+    Met en file un email à l'organisateur quand son événement est validé
     """
     organisateur = evenement.organisateur
     
     sujet = f"✅ Votre événement '{evenement.titre}' a été validé"
-    
-    message_html = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
-                <h2 style="color: #10b981;">✅ Événement validé !</h2>
-                
-                <p>Bonjour <strong>{organisateur.get_full_name()}</strong>,</p>
-                
-                <p>Bonne nouvelle ! Votre événement a été validé et est maintenant visible par tous les utilisateurs :</p>
-                
-                <div style="background: #f0fdf4; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="margin-top: 0; color: #10b981;">{evenement.titre}</h3>
-                    <p><strong>📅 Date :</strong> {evenement.date_debut.strftime('%d/%m/%Y à %H:%M')}</p>
-                    <p><strong>📍 Lieu :</strong> {evenement.lieu}</p>
-                    <p><strong>👥 Capacité :</strong> {evenement.capacite_max} places</p>
-                </div>
-                
-                <p>Les étudiants peuvent maintenant s'inscrire à votre événement !</p>
-                
-                <p style="margin-top: 30px;">Bon succès pour votre événement !</p>
-            </div>
-        </body>
-    </html>
+    message_texte, message_html = rendre_email('validation', {
+        'nom_destinataire': organisateur.get_full_name(),
+        'evenement': evenement,
+    })
+    return mettre_en_file(sujet, message_texte, message_html, organisateur.email)
+
+
+# Marqueur remplacé par le nom du participant dans un rappel pré-rendu
+MARQUEUR_NOM = '\x00nom_destinataire\x00'
+
+
+def preparer_rappel(evenement):
     """
+    Rend une seule fois le rappel d'un événement, avec un marqueur à la
+    place du nom du participant. Retourne (sujet, message_texte, message_html).
+    """
+    sujet = f"⏰ Rappel - {evenement.titre} demain"
+    message_texte, message_html = rendre_email('rappel', {
+        'nom_destinataire': mark_safe(MARQUEUR_NOM),
+        'evenement': evenement,
+    })
+    return sujet, message_texte, message_html
+
+
+def construire_email_rappel(inscription, rappel=None):
+    """
+    Construit l'email de rappel d'un participant (sans l'envoyer) à partir
+    du rappel pré-rendu de l'événement : seul le nom est inséré.
+    """
+    participant = inscription.participant
+    sujet, message_texte, message_html = rappel or preparer_rappel(inscription.evenement)
+    nom = participant.get_full_name()
     
-    message_texte = strip_tags(message_html)
-    
-    try:
-        send_mail(
-            sujet,
-            message_texte,
-            settings.DEFAULT_FROM_EMAIL,
-            [organisateur.email],
-            html_message=message_html,
-            fail_silently=False,
-        )
-        return True
-    except Exception as e:
-        print(f"Erreur d'envoi d'email : {e}")
-        return False
+    email = EmailMultiAlternatives(
+        sujet,
+        message_texte.replace(MARQUEUR_NOM, nom),
+        settings.DEFAULT_FROM_EMAIL,
+        [participant.email],
+    )
+    email.attach_alternative(message_html.replace(MARQUEUR_NOM, escape(nom)), 'text/html')
+    return email
 
 
-def envoyer_rappel_evenement(evenement):
+def envoyer_rappels(evenements, nb_connexions=4, taille_lot=500):
     """
-    Envoie un rappel aux participants 24h avant l'événement
+    Envoie les rappels aux participants confirmés des événements donnés.
+    
+    Les inscriptions sont lues par blocs de taille_lot avec leur participant
+    (une requête par bloc, paginée sur pk plutôt qu'un curseur iterator() :
+    les lignes lues sont modifiées pendant le parcours), puis chaque bloc
+    est réservé en posant date_rappel par un UPDATE conditionnel : une
+    exécution concurrente ne renvoie jamais un rappel déjà pris. Les emails partent par un pool de nb_connexions threads,
+    chacun réutilisant sa propre connexion SMTP. En cas d'échec, date_rappel
+    est remise à NULL pour qu'une exécution suivante réessaie.
+    
+    Retourne un tuple (nb_envoyes, nb_erreurs).
     """
-    inscrits = evenement.inscriptions.filter(statut='confirmee')
+    evenements = {e.pk: e for e in evenements.select_related('organisateur')}
+    if not evenements:
+        return 0, 0
     
-    if not inscrits.exists():
-        return False
+    inscriptions = Inscription.objects.filter(
+        evenement_id__in=list(evenements),
+        statut='confirmee',
+        date_rappel__isnull=True
+    ).select_related('participant').order_by('pk')
     
-    sujet = f"⏰ Rappel - {evenement.titre} demain"
+    def lots():
+        dernier = 0
+        while lot := list(inscriptions.filter(pk__gt=dernier)[:taille_lot]):
+            yield lot
+            dernier = lot[-1].pk
+    
+    # Rappel pré-rendu une seule fois par événement
+    rappels = {}
     
-    emails = []
-    for inscription in inscrits:
-        participant = inscription.participant
-        
-        message_html = f"""
-        <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
-                    <h2 style="color: #f59e0b;">⏰ Rappel : Événement demain !</h2>
-                    
-                    <p>Bonjour <strong>{participant.get_full_name()}</strong>,</p>
-                    
-                    <p>Nous vous rappelons que l'événement suivant aura lieu <strong>demain</strong> :</p>
-                    
-                    <div style="background: #fffbeb; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="margin-top: 0; color: #f59e0b;">{evenement.titre}</h3>
-                        <p><strong>📅 Date :</strong> {evenement.date_debut.strftime('%d/%m/%Y à %H:%M')}</p>
-                        <p><strong>📍 Lieu :</strong> {evenement.lieu}</p>
-                        <p><strong>👤 Organisateur :</strong> {evenement.organisateur.get_full_name()}</p>
-                    </div>
-                    
-                    <p><strong>⚠️ N'oubliez pas :</strong></p>
-                    <ul>
-                        <li>Arrivez à l'heure</li>
-                        <li>Préparez vos questions si nécessaire</li>
-                        <li>En cas d'empêchement, annulez votre inscription</li>
-                    </ul>
-                    
-                    <p style="margin-top: 30px;">À demain !</p>
-                </div>
-            </body>
-        </html>
-        """
-        
-        message_texte = strip_tags(message_html)
-        
-        emails.append((
-            sujet,
-            message_texte,
-            settings.DEFAULT_FROM_EMAIL,
-            [participant.email],
-        ))
+    # Une connexion SMTP par thread du pool, ouverte une fois et réutilisée :
+    # le backend SMTP referme après send_messages() une connexion qu'il a dû
+    # ouvrir lui-même
+    local = threading.local()
+    connexions = []
     
+    def envoyer(email):
+        try:
+            if not hasattr(local, 'connexion'):
+                connexion = get_connection()
+                connexion.open()
+                local.connexion = connexion
+                connexions.append(connexion)
+            email.connection = local.connexion
+            email.send()
+            return True
+        except Exception:
+            # Compté dans nb_erreurs, le rappel sera retenté à la prochaine exécution
+            return False
+    
+    nb_envoyes = nb_erreurs = 0
     try:
-        send_mass_mail(emails, fail_silently=False)
-        return True
-    except Exception as e:
-        print(f"Erreur d'envoi d'emails : {e}")
-        return False
\ No newline at end of file
+        with ThreadPoolExecutor(max_workers=nb_connexions) as pool:
+            for lot in lots():
+                marqueur = timezone.now()
+                ids = [inscription.pk for inscription in lot]
+                Inscription.objects.filter(pk__in=ids, date_rappel__isnull=True).update(date_rappel=marqueur)
+                reservees = set(
+                    Inscription.objects.filter(pk__in=ids, date_rappel=marqueur).values_list('pk', flat=True)
+                )
+                lot = [inscription for inscription in lot if inscription.pk in reservees]
+                
+                emails = []
+                for inscription in lot:
+                    if inscription.evenement_id not in rappels:
+                        rappels[inscription.evenement_id] = preparer_rappel(evenements[inscription.evenement_id])
+                    emails.append(construire_email_rappel(inscription, rappels[inscription.evenement_id]))
+                
+                resultats = list(pool.map(envoyer, emails))
+                echecs = [inscription.pk for inscription, ok in zip(lot, resultats) if not ok]
+                if echecs:
+                    Inscription.objects.filter(pk__in=echecs).update(date_rappel=None)
+                nb_envoyes += len(lot) - len(echecs)
+                nb_erreurs += len(echecs)
+    finally:
+        for connexion in connexions:
+            connexion.close()
+    
+    return nb_envoyes, nb_erreurs
+
+
+def envoyer_rappel_evenement(evenement):
+    """
+    Envoie un rappel aux participants 24h avant l'événement
+    """
+    nb_envoyes, nb_erreurs = envoyer_rappels(Evenement.objects.filter(pk=evenement.pk), nb_connexions=1)
+    return nb_envoyes > 0 and nb_erreurs == 0
@@ -0,0 +1,192 @@
+"""
+Exports CSV et XLSX des inscriptions.
+
+- Participants d'un événement, pour son organisateur et les admins.
+- Inscriptions filtrées de l'admin (action de la liste des inscriptions).
+
+Les lignes sont lues par lots (iterator(chunk_size=TAILLE_LOT)) et écrites
+au fil de l'envoi de la réponse (StreamingHttpResponse) : un export de
+100 000 lignes n'est jamais chargé en entier en mémoire, et la lecture se
+fait hors de toute transaction ouverte par la vue.
+
+Le fichier XLSX est une archive zip écrite en flux avec zipfile (sans
+dépendance) : chaînes en ligne dans la feuille, sans table partagée.
+"""
+import csv
+import re
+import zipfile
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.text import slugify
+from xml.sax.saxutils import escape
+
+TAILLE_LOT = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+COLONNES_PARTICIPANTS = [
+    ('Nom', lambda i: i.participant.last_name),
+    ('Prénom', lambda i: i.participant.first_name),
+    ("Nom d'utilisateur", lambda i: i.participant.username),
+    ('Email', lambda i: i.participant.email),
+    ('Département', lambda i: i.participant.departement),
+    ('Statut', lambda i: i.get_statut_display()),
+    ("Position en liste d'attente", lambda i: i.position_attente()),
+    ("Date d'inscription", lambda i: i.date_inscription),
+]
+COLONNES_INSCRIPTIONS = [
+    ('Événement', lambda i: i.evenement.titre),
+    ("Date de l'événement", lambda i: i.evenement.date_debut),
+    *COLONNES_PARTICIPANTS[:5],
+    ('Statut', lambda i: i.get_statut_display()),
+    ("Date d'inscription", lambda i: i.date_inscription),
+]
+# Colonnes lues (only) pour chaque liste de colonnes
+CHAMPS_PARTICIPANT = [
+    'statut', 'ticket_attente', 'date_inscription', 'evenement__attente_tete',
+    'participant__last_name', 'participant__first_name', 'participant__username',
+    'participant__email', 'participant__departement',
+]
+CHAMPS_INSCRIPTION = [
+    'statut', 'date_inscription', 'evenement__titre', 'evenement__date_debut',
+    'participant__last_name', 'participant__first_name', 'participant__username',
+    'participant__email', 'participant__departement',
+]
+
+
+class Echo:
+    """Pseudo-fichier pour csv.writer : writerow() retourne la ligne écrite"""
+
+    def write(self, valeur):
+        return valeur
+
+
+class Tampon:
+    """Fichier binaire en écriture seule, vidé au fur et à mesure de l'envoi"""
+
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, donnees):
+        self.morceaux.append(bytes(donnees))
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        contenu = b''.join(self.morceaux)
+        self.morceaux = []
+        return contenu
+
+
+def texte_cellule(valeur):
+    """Valeur d'une cellule en texte : dates locales, None vide"""
+    if valeur is None:
+        return ''
+    if hasattr(valeur, 'tzinfo'):
+        return timezone.localtime(valeur).strftime('%d/%m/%Y %H:%M')
+    return str(valeur)
+
+
+def neutraliser_formule(texte):
+    """Évite qu'un tableur interprète un champ saisi par un utilisateur comme une formule"""
+    if texte[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + texte
+    return texte
+
+
+def lignes(inscriptions, colonnes):
+    for inscription in inscriptions.iterator(chunk_size=TAILLE_LOT):
+        yield [neutraliser_formule(texte_cellule(valeur(inscription))) for _, valeur in colonnes]
+
+
+def flux_csv(inscriptions, colonnes):
+    """Point-virgule et BOM : ouverture directe dans un tableur réglé en français"""
+    ecrivain = csv.writer(Echo(), delimiter=';')
+    yield '\ufeff' + ecrivain.writerow([titre for titre, _ in colonnes])
+    lot = []
+    for ligne in lignes(inscriptions, colonnes):
+        lot.append(ecrivain.writerow(ligne))
+        if len(lot) == TAILLE_LOT:
+            yield ''.join(lot)
+            lot = []
+    yield ''.join(lot)
+
+
+TYPES_CONTENU_XLSX = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+RELATIONS_XLSX = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+CLASSEUR_XLSX = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Inscriptions" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+RELATIONS_CLASSEUR_XLSX = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+# Caractères de contrôle refusés dans un document XML
+CARACTERES_INTERDITS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def ligne_xlsx(valeurs):
+    cellules = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(CARACTERES_INTERDITS.sub("", valeur))}</t></is></c>'
+        for valeur in valeurs
+    )
+    return f'<row>{cellules}</row>'
+
+
+def flux_xlsx(inscriptions, colonnes):
+    tampon = Tampon()
+    with zipfile.ZipFile(tampon, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', TYPES_CONTENU_XLSX)
+        archive.writestr('_rels/.rels', RELATIONS_XLSX)
+        archive.writestr('xl/workbook.xml', CLASSEUR_XLSX)
+        archive.writestr('xl/_rels/workbook.xml.rels', RELATIONS_CLASSEUR_XLSX)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as feuille:
+            feuille.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + ligne_xlsx([titre for titre, _ in colonnes])
+            ).encode())
+            for numero, ligne in enumerate(lignes(inscriptions, colonnes), 1):
+                feuille.write(ligne_xlsx(ligne).encode())
+                if numero % TAILLE_LOT == 0:
+                    yield tampon.vider()
+            feuille.write(b'</sheetData></worksheet>')
+    yield tampon.vider()
+
+
+def reponse_export(inscriptions, colonnes, format_, nom):
+    """Réponse en flux au format 'csv' ou 'xlsx', téléchargée sous nom.format_"""
+    flux = flux_xlsx if format_ == 'xlsx' else flux_csv
+    reponse = StreamingHttpResponse(flux(inscriptions, colonnes), content_type=FORMATS[format_])
+    reponse['Content-Disposition'] = f'attachment; filename="{slugify(nom) or "export"}.{format_}"'
+    return reponse
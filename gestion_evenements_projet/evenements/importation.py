@@ -0,0 +1,235 @@
+"""
+Import en masse des utilisateurs et des événements (CSV ou JSON).
+
+Chaque ligne est validée par le formulaire de l'interface (UtilisateurForm,
+EvenementForm) : mêmes règles qu'une saisie à la main (champs obligatoires,
+nom d'utilisateur libre, validateurs de mot de passe, dates). Les lignes
+valides sont insérées par lots de bulk_create, une transaction par lot : une
+ligne refusée par la base n'annule que son lot, qui est alors repris ligne à
+ligne pour isoler l'erreur.
+
+Le hachage des mots de passe (PBKDF2, plusieurs centaines de millisecondes
+par compte) est réparti sur un pool de processus pendant que le processus
+principal valide le lot suivant.
+"""
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from .caches import invalider_accueil, invalider_facettes_utilisateurs
+from .forms import EvenementForm, UtilisateurForm
+from .models import Evenement, Utilisateur
+from .recherche import indexer_evenement
+
+TAILLE_LOT = 1000
+# Colonnes du fichier ; le mot de passe remplit les deux champs du formulaire
+COLONNES_UTILISATEUR = ['username', 'first_name', 'last_name', 'email', 'departement', 'telephone', 'mot_de_passe']
+COLONNES_EVENEMENT = [
+    'titre', 'description', 'date_debut', 'date_fin', 'lieu', 'categorie', 'capacite_max', 'organisateur',
+]
+NOMS_COLONNES = {'password1': 'mot_de_passe', 'password2': 'mot_de_passe', '__all__': 'ligne'}
+
+
+class ErreurImport(Exception):
+    pass
+
+
+class ResultatImport:
+    """Lignes importées et erreurs (numéro de ligne, message) dans l'ordre du fichier"""
+
+    def __init__(self):
+        self.crees = 0
+        self.valides = 0
+        self.erreurs = []
+
+    def refuser(self, numero, message):
+        self.erreurs.append((numero, message))
+
+
+def lire_lignes(fichier, format_=None):
+    """
+    Itère sur les couples (numéro, ligne) du fichier : numéro de ligne du CSV
+    (séparateur ',' ou ';', en-tête obligatoire) ou rang de l'objet dans la
+    liste JSON. Le format est déduit de l'extension par défaut.
+    """
+    format_ = (format_ or os.path.splitext(fichier)[1].lstrip('.')).lower()
+    if format_ == 'csv':
+        with open(fichier, newline='', encoding='utf-8-sig') as f:
+            entete = f.readline()
+            f.seek(0)
+            lecteur = csv.DictReader(f, delimiter=';' if entete.count(';') > entete.count(',') else ',')
+            for ligne in lecteur:
+                yield lecteur.line_num, ligne
+    elif format_ == 'json':
+        with open(fichier, encoding='utf-8') as f:
+            donnees = json.load(f)
+        if not isinstance(donnees, list) or not all(isinstance(ligne, dict) for ligne in donnees):
+            raise ErreurImport("Le fichier JSON doit contenir une liste d'objets.")
+        yield from enumerate(donnees, 1)
+    else:
+        raise ErreurImport(f"Format inconnu « {format_} » : csv ou json.")
+
+
+def par_lots(lignes, taille):
+    lignes = iter(lignes)
+    while lot := list(islice(lignes, taille)):
+        yield lot
+
+
+def donnees_formulaire(ligne, colonnes):
+    """Valeurs des colonnes attendues, en texte sans espaces autour (absentes : vides)"""
+    return {colonne: str(ligne.get(colonne) or '').strip() for colonne in colonnes}
+
+
+def messages_erreur(form):
+    return [
+        f"{NOMS_COLONNES.get(champ, champ)} : {message}"
+        for champ, messages in form.errors.items()
+        for message in messages
+    ]
+
+
+def inserer(modele, elements, taille_lot, resultat, apres_insertion=None):
+    """
+    Insère les instances [(numéro, instance)] en une transaction. Si la base
+    refuse le lot, chaque ligne est reprise dans son propre point de sauvegarde
+    et seules les lignes fautives sont rapportées.
+    """
+    try:
+        with transaction.atomic():
+            crees = modele.objects.bulk_create([instance for _, instance in elements], batch_size=taille_lot)
+            if apres_insertion:
+                apres_insertion(crees)
+        resultat.crees += len(crees)
+        return
+    except IntegrityError:
+        pass
+
+    with transaction.atomic():
+        for numero, instance in elements:
+            # Identifiant éventuellement attribué par le lot annulé
+            instance.pk = None
+            instance._state.adding = True
+            try:
+                with transaction.atomic():
+                    crees = modele.objects.bulk_create([instance])
+                    if apres_insertion:
+                        apres_insertion(crees)
+            except IntegrityError as erreur:
+                resultat.refuser(numero, f"refusée par la base de données : {erreur}")
+            else:
+                resultat.crees += 1
+
+
+def importer_utilisateurs(lignes, taille_lot=TAILLE_LOT, processus=None, simulation=False):
+    """
+    Importe des étudiants. Colonnes : COLONNES_UTILISATEUR. `processus` :
+    taille du pool de hachage (nombre de cœurs par défaut, 1 pour hacher
+    dans le processus courant).
+    """
+    resultat = ResultatImport()
+    deja_vus = set()
+    pool = ProcessPoolExecutor(processus) if processus != 1 and not simulation else nullcontext()
+    with pool:
+        en_cours = None
+        for lot in par_lots(lignes, taille_lot):
+            valides = []
+            for numero, ligne in lot:
+                donnees = donnees_formulaire(ligne, COLONNES_UTILISATEUR)
+                donnees['password1'] = donnees['password2'] = donnees.pop('mot_de_passe')
+                form = UtilisateurForm(donnees)
+                if not form.is_valid():
+                    for message in messages_erreur(form):
+                        resultat.refuser(numero, message)
+                    continue
+                # Le formulaire ne voit que la base : doublons à l'intérieur du fichier
+                cle = form.cleaned_data['username'].lower()
+                if cle in deja_vus:
+                    resultat.refuser(numero, "username : nom d'utilisateur déjà présent plus haut dans le fichier.")
+                    continue
+                deja_vus.add(cle)
+                utilisateur = form.instance
+                # Comme UtilisateurForm.save() : toujours étudiant
+                utilisateur.role = 'etudiant'
+                valides.append((numero, utilisateur, form.cleaned_data['password1']))
+
+            resultat.valides += len(valides)
+            if simulation:
+                continue
+            mots_de_passe = [mot_de_passe for _, _, mot_de_passe in valides]
+            if processus == 1:
+                hachages = map(make_password, mots_de_passe)
+            else:
+                # Tâches envoyées aux processus sans attendre : le lot suivant
+                # est validé pendant le hachage
+                hachages = pool.map(make_password, mots_de_passe, chunksize=max(1, len(valides) // 64))
+            if en_cours:
+                inserer_utilisateurs(*en_cours, taille_lot, resultat)
+            en_cours = (valides, hachages)
+        if en_cours:
+            inserer_utilisateurs(*en_cours, taille_lot, resultat)
+
+    if resultat.crees:
+        invalider_facettes_utilisateurs()
+    return resultat
+
+
+def inserer_utilisateurs(valides, hachages, taille_lot, resultat):
+    # Hachages attendus avant d'ouvrir la transaction, pour qu'elle reste courte
+    for (_, utilisateur, _), hachage in zip(valides, list(hachages)):
+        utilisateur.password = hachage
+    inserer(Utilisateur, [(numero, utilisateur) for numero, utilisateur, _ in valides], taille_lot, resultat)
+
+
+def importer_evenements(lignes, organisateur=None, statut='valide', taille_lot=TAILLE_LOT, simulation=False):
+    """
+    Importe des événements. Colonnes : COLONNES_EVENEMENT, dates au format
+    du formulaire (AAAA-MM-JJTHH:MM). La colonne organisateur (nom
+    d'utilisateur) remplace l'organisateur par défaut.
+    """
+    resultat = ResultatImport()
+    organisateurs = {}
+    if organisateur is not None:
+        organisateurs[organisateur.username] = organisateur
+
+    def trouver_organisateur(nom):
+        if nom not in organisateurs:
+            organisateurs[nom] = Utilisateur.objects.filter(username=nom).first()
+        return organisateurs[nom]
+
+    def indexer(evenements):
+        for evenement in evenements:
+            indexer_evenement(evenement)
+
+    for lot in par_lots(lignes, taille_lot):
+        valides = []
+        for numero, ligne in lot:
+            donnees = donnees_formulaire(ligne, COLONNES_EVENEMENT)
+            nom_organisateur = donnees.pop('organisateur') or (organisateur and organisateur.username)
+            form = EvenementForm(donnees)
+            erreurs = [] if form.is_valid() else messages_erreur(form)
+            if not nom_organisateur:
+                erreurs.append("organisateur : ce champ est obligatoire.")
+            elif trouver_organisateur(nom_organisateur) is None:
+                erreurs.append(f"organisateur : utilisateur « {nom_organisateur} » introuvable.")
+            if erreurs:
+                for message in erreurs:
+                    resultat.refuser(numero, message)
+                continue
+            evenement = form.instance
+            evenement.organisateur = trouver_organisateur(nom_organisateur)
+            evenement.statut = statut
+            valides.append((numero, evenement))
+
+        resultat.valides += len(valides)
+        if not simulation:
+            # Pas de signal post_save avec bulk_create : index de recherche mis à jour ici
+            inserer(Evenement, valides, taille_lot, resultat, apres_insertion=indexer)
+
+    if resultat.crees:
+        invalider_accueil()
+    return resultat
@@ -0,0 +1,71 @@
+import smtplib
+import time
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from evenements.emails import envoyer_file_attente
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails de la file d'envoi par lots, sur une connexion SMTP réutilisée"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, default=50, help="Nombre d'emails par lot (défaut : 50)")
+        parser.add_argument(
+            '--max-tentatives', type=int, default=5,
+            help="Nombre d'essais avant de passer un email en échec définitif (défaut : 5)",
+        )
+        parser.add_argument(
+            '--delai-base', type=int, default=60,
+            help="Délai en secondes avant le premier nouvel essai, doublé à chaque échec (défaut : 60)",
+        )
+        parser.add_argument(
+            '--boucle', action='store_true',
+            help="Ne pas s'arrêter quand la file est vide et la surveiller en continu",
+        )
+        parser.add_argument(
+            '--intervalle', type=float, default=5,
+            help="Pause en secondes entre deux vérifications en mode --boucle (défaut : 5)",
+        )
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        total_envoyes = total_erreurs = 0
+        try:
+            while True:
+                try:
+                    envoyes, erreurs = envoyer_file_attente(
+                        taille_lot=options['lot'],
+                        max_tentatives=options['max_tentatives'],
+                        delai_base=options['delai_base'],
+                        connection=connection,
+                    )
+                except (smtplib.SMTPException, OSError) as e:
+                    if not options['boucle']:
+                        raise
+                    # Relais SMTP injoignable : les emails réservés sont déjà
+                    # remis en file, le worker continue après une pause
+                    self.stderr.write(
+                        f"Relais SMTP indisponible ({e}), nouvel essai dans {options['intervalle']:g} s."
+                    )
+                    connection.close()
+                    time.sleep(options['intervalle'])
+                    continue
+                total_envoyes += envoyes
+                total_erreurs += erreurs
+                if envoyes or erreurs:
+                    self.stdout.write(f"Lot traité : {envoyes} envoyé(s), {erreurs} erreur(s).")
+                    continue
+                
+                if not options['boucle']:
+                    break
+                # File vide : on libère la connexion SMTP pendant l'attente
+                connection.close()
+                time.sleep(options['intervalle'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"{total_envoyes} email(s) envoyé(s), {total_erreurs} erreur(s)."
+        ))
@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from evenements.emails import envoyer_rappels
+from evenements.models import Evenement
+
+
+class Command(BaseCommand):
+    help = "Envoie les rappels aux participants des événements validés qui commencent dans les prochaines 24h"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--heures', type=int, default=24,
+            help="Fenêtre en heures des événements concernés (défaut : 24)",
+        )
+        parser.add_argument(
+            '--connexions', type=int, default=4,
+            help="Nombre de connexions SMTP parallèles (défaut : 4)",
+        )
+        parser.add_argument(
+            '--lot', type=int, default=500,
+            help="Nombre d'inscriptions lues et envoyées par lot (défaut : 500)",
+        )
+
+    def handle(self, *args, **options):
+        maintenant = timezone.now()
+        evenements = Evenement.objects.filter(
+            statut='valide',
+            date_debut__gte=maintenant,
+            date_debut__lt=maintenant + timedelta(hours=options['heures'])
+        )
+
+        debut = time.perf_counter()
+        nb_envoyes, nb_erreurs = envoyer_rappels(
+            evenements,
+            nb_connexions=options['connexions'],
+            taille_lot=options['lot'],
+        )
+        duree = time.perf_counter() - debut
+
+        debit = nb_envoyes / duree if duree > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{nb_envoyes} rappel(s) envoyé(s), {nb_erreurs} erreur(s) en {duree:.2f} s "
+            f"({debit:.1f} messages/s)."
+        ))
@@ -0,0 +1,212 @@
+import bisect
+import itertools
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from evenements.models import Evenement, Inscription, Utilisateur
+from evenements.recherche import reconstruire_index
+
+DEPARTEMENTS = [
+    'Informatique', 'Mathématiques', 'Physique', 'Chimie', 'Biologie', 'Économie',
+    'Droit', 'Lettres modernes', 'Histoire', 'Langues étrangères', 'Psychologie', 'STAPS',
+]
+PRENOMS = ['Camille', 'Léa', 'Hugo', 'Yanis', 'Inès', 'Lucas', 'Manon', 'Nathan', 'Sarah', 'Adam', 'Chloé', 'Rayan']
+NOMS = ['Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy', 'Moreau']
+SUJETS = {
+    'conference': ['Conférence', 'Table ronde', 'Débat'],
+    'soutenance': ['Soutenance de thèse', 'Soutenance de mémoire', 'Soutenance de projet'],
+    'atelier': ['Atelier', 'Formation', 'Hackathon'],
+    'culturel': ['Concert', 'Exposition', 'Projection', 'Pièce de théâtre'],
+    'autre': ['Forum', 'Rencontre', 'Journée portes ouvertes'],
+}
+THEMES = [
+    'intelligence artificielle', 'développement durable', 'santé publique', 'cybersécurité',
+    'économie sociale', 'littérature', 'astronomie', 'robotique', 'égalité', 'entrepreneuriat',
+]
+LIEUX = ['Amphi A', 'Amphi B', 'Amphi C', 'Bibliothèque universitaire', 'Gymnase', 'Salle des actes', 'Maison des étudiants']
+
+# Répartition des statuts d'événements et des capacités proposées
+POIDS_STATUTS = {'valide': 75, 'en_attente': 10, 'refuse': 5, 'annule': 10}
+CAPACITES = [20, 30, 50, 80, 100, 150, 200, 300]
+# Part des inscriptions annulées par les participants
+TAUX_ANNULATION = 0.08
+
+
+class Command(BaseCommand):
+    help = "Génère des utilisateurs, événements et inscriptions fictifs pour les tests de charge"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--utilisateurs', type=int, default=1000, help="Nombre d'utilisateurs (défaut : 1000)")
+        parser.add_argument('--evenements', type=int, default=200, help="Nombre d'événements (défaut : 200)")
+        parser.add_argument(
+            '--graine', type=int, default=42,
+            help="Graine du générateur aléatoire, pour des données reproductibles (défaut : 42)",
+        )
+        parser.add_argument(
+            '--prefixe', default='charge',
+            help="Préfixe des identifiants des utilisateurs générés (défaut : charge)",
+        )
+        parser.add_argument(
+            '--mot-de-passe', default='motdepasse',
+            help="Mot de passe commun à tous les utilisateurs générés (défaut : motdepasse)",
+        )
+        parser.add_argument('--lot', type=int, default=5000, help="Taille des lots de bulk_create (défaut : 5000)")
+
+    def handle(self, *args, **options):
+        prefixe = options['prefixe']
+        for option in ('utilisateurs', 'evenements'):
+            if options[option] < 0:
+                raise CommandError(f"--{option} doit être positif ou nul.")
+        if options['lot'] < 1:
+            raise CommandError("--lot doit être au moins 1.")
+        if options['evenements'] and not options['utilisateurs']:
+            raise CommandError(
+                "Les événements générés ont besoin d'organisateurs : --utilisateurs doit être au moins 1."
+            )
+        if Utilisateur.objects.filter(username__startswith=f'{prefixe}_').exists():
+            raise CommandError(
+                f"Des utilisateurs « {prefixe}_* » existent déjà : choisissez un autre --prefixe ou une base vide."
+            )
+
+        self.aleatoire = random.Random(options['graine'])
+        self.lot = options['lot']
+        self.maintenant = timezone.now()
+
+        debut = time.perf_counter()
+        with transaction.atomic():
+            utilisateurs = self.generer_utilisateurs(options['utilisateurs'], prefixe, options['mot_de_passe'])
+            evenements = self.generer_evenements(options['evenements'], utilisateurs)
+            nb_inscriptions = self.generer_inscriptions(evenements, utilisateurs)
+        # bulk_create ne déclenche pas les signaux qui tiennent l'index à jour
+        reconstruire_index()
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(utilisateurs)} utilisateur(s), {len(evenements)} événement(s) et "
+            f"{nb_inscriptions} inscription(s) générés en {duree:.1f} s."
+        ))
+
+    def generer_utilisateurs(self, nombre, prefixe, mot_de_passe):
+        aleatoire = self.aleatoire
+        # Un seul hachage pour tous : les comptes restent utilisables pour se
+        # connecter sans payer des centaines de milliers d'itérations PBKDF2
+        mot_de_passe = make_password(mot_de_passe)
+        utilisateurs = []
+        for i in range(nombre):
+            prenom, nom = aleatoire.choice(PRENOMS), aleatoire.choice(NOMS)
+            utilisateurs.append(Utilisateur(
+                username=f'{prefixe}_{i}',
+                first_name=prenom,
+                last_name=nom,
+                email=f'{prefixe}_{i}@exemple.com',
+                password=mot_de_passe,
+                role='admin' if aleatoire.random() < 0.02 else 'etudiant',
+                departement=aleatoire.choice(DEPARTEMENTS) if aleatoire.random() < 0.9 else '',
+                telephone=f'06{aleatoire.randrange(10 ** 8):08d}' if aleatoire.random() < 0.5 else '',
+                date_joined=self.maintenant - timedelta(minutes=aleatoire.randrange(3 * 365 * 24 * 60)),
+            ))
+        return Utilisateur.objects.bulk_create(utilisateurs, batch_size=self.lot)
+
+    def generer_evenements(self, nombre, utilisateurs):
+        if not nombre:
+            return []
+        aleatoire = self.aleatoire
+        categories = [code for code, _ in Evenement.CATEGORIE_CHOICES]
+        statuts, poids = zip(*POIDS_STATUTS.items())
+        # Quelques organisateurs très actifs (associations, laboratoires)
+        organisateurs = aleatoire.sample(utilisateurs, max(1, len(utilisateurs) // 20))
+        evenements = []
+        for i in range(nombre):
+            categorie = aleatoire.choice(categories)
+            # Une année passée et six mois à venir, aux heures ouvrables
+            debut = (self.maintenant + timedelta(days=aleatoire.randint(-365, 180))).replace(
+                hour=aleatoire.randint(8, 19), minute=aleatoire.choice([0, 15, 30, 45]), second=0, microsecond=0
+            )
+            theme = aleatoire.choice(THEMES)
+            evenements.append(Evenement(
+                titre=f'{aleatoire.choice(SUJETS[categorie])} : {theme}',
+                description=f"Événement consacré à {theme}. " * aleatoire.randint(2, 8),
+                date_debut=debut,
+                date_fin=debut + timedelta(hours=aleatoire.choice([1, 2, 3, 4, 8])),
+                lieu=aleatoire.choice(LIEUX),
+                categorie=categorie,
+                capacite_max=aleatoire.choice(CAPACITES),
+                organisateur=aleatoire.choice(organisateurs),
+                statut=aleatoire.choices(statuts, poids)[0],
+            ))
+        return Evenement.objects.bulk_create(evenements, batch_size=self.lot)
+
+    def generer_inscriptions(self, evenements, utilisateurs):
+        """
+        Inscriptions des événements validés ou annulés. Le taux de remplissage
+        suit une loi bêta (la plupart des événements à moitié pleins, quelques
+        événements complets avec liste d'attente) et certains étudiants
+        s'inscrivent beaucoup plus que d'autres (activité log-normale).
+        
+        Les lignes sont insérées par executemany() sans instancier de modèles :
+        c'est ce qui permet d'atteindre le million d'inscriptions en quelques
+        secondes. Les compteurs des événements sont recalculés à la fin.
+        """
+        if not evenements:
+            return 0
+        aleatoire = self.aleatoire
+        cumul = list(itertools.accumulate(aleatoire.lognormvariate(0, 1) for _ in utilisateurs))
+
+        def tirer_participants(nombre):
+            choisis = set()
+            while len(choisis) < min(nombre, len(utilisateurs)):
+                choisis.add(bisect.bisect(cumul, aleatoire.random() * cumul[-1]))
+            return [utilisateurs[indice].pk for indice in choisis]
+
+        meta = Inscription._meta
+        colonnes = ['evenement', 'participant', 'statut', 'date_inscription', 'commentaire', 'ticket_attente']
+        requete = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(meta.db_table),
+            ', '.join(connection.ops.quote_name(meta.get_field(nom).column) for nom in colonnes),
+            ', '.join(['%s'] * len(colonnes)),
+        )
+        adapter_date = connection.ops.adapt_datetimefield_value
+
+        lot, nb_inscriptions = [], 0
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                # Cache de pages large : les index de la table sont remplis dans le désordre
+                cursor.execute('PRAGMA cache_size = -262144')
+            for evenement in evenements:
+                if evenement.statut not in ('valide', 'annule'):
+                    continue
+                remplissage = aleatoire.betavariate(2, 2) * 1.3
+                participants = tirer_participants(int(evenement.capacite_max * remplissage))
+                # Inscriptions étalées sur le mois qui précède l'événement. Les
+                # dates sont converties une fois pour toutes (une par jour)
+                fin_inscriptions = min(evenement.date_debut, self.maintenant)
+                dates = [
+                    adapter_date(fin_inscriptions - timedelta(days=jours, minutes=aleatoire.randrange(24 * 60)))
+                    for jours in range(30)
+                ]
+                confirmees = en_attente = 0
+                for participant_id in participants:
+                    statut, ticket = 'confirmee', None
+                    if aleatoire.random() < TAUX_ANNULATION:
+                        statut = 'annulee'
+                    elif confirmees < evenement.capacite_max:
+                        confirmees += 1
+                    else:
+                        # Tickets consécutifs à partir de attente_tete (1)
+                        en_attente += 1
+                        statut, ticket = 'en_attente', en_attente
+                    lot.append((evenement.pk, participant_id, statut, aleatoire.choice(dates), '', ticket))
+                if len(lot) >= self.lot:
+                    cursor.executemany(requete, lot)
+                    nb_inscriptions += len(lot)
+                    lot = []
+            if lot:
+                cursor.executemany(requete, lot)
+                nb_inscriptions += len(lot)
+
+        Evenement.objects.filter(pk__gte=evenements[0].pk, pk__lte=evenements[-1].pk).recalculer_inscrits()
+        return nb_inscriptions
@@ -0,0 +1,96 @@
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
+from evenements.importation import (
+    TAILLE_LOT,
+    ErreurImport,
+    importer_evenements,
+    importer_utilisateurs,
+    lire_lignes,
+)
+from evenements.models import Evenement, Utilisateur
+
+# Erreurs affichées dans la console quand il n'y a pas de --rapport
+NB_ERREURS_AFFICHEES = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe des utilisateurs (étudiants) ou des événements depuis un fichier CSV ou JSON, "
+        "avec les règles de validation des formulaires"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('type', choices=['utilisateurs', 'evenements'], help="Type des lignes importées")
+        parser.add_argument('fichier', help="Fichier CSV (avec en-tête) ou JSON (liste d'objets)")
+        parser.add_argument('--format', choices=['csv', 'json'], help="Format du fichier (défaut : son extension)")
+        parser.add_argument(
+            '--lot', type=int, default=TAILLE_LOT,
+            help=f"Lignes par lot : un bulk_create et une transaction par lot (défaut : {TAILLE_LOT})",
+        )
+        parser.add_argument(
+            '--processus', type=int, default=None,
+            help="Processus de hachage des mots de passe (défaut : nombre de cœurs ; 1 : sans pool)",
+        )
+        parser.add_argument(
+            '--organisateur',
+            help="Nom d'utilisateur de l'organisateur des événements sans colonne organisateur",
+        )
+        parser.add_argument(
+            '--statut', choices=[code for code, _ in Evenement.STATUT_CHOICES], default='valide',
+            help="Statut des événements importés (défaut : valide)",
+        )
+        parser.add_argument('--rapport', help="Fichier CSV où écrire les erreurs (ligne;erreur)")
+        parser.add_argument(
+            '--simulation', action='store_true',
+            help="Valide le fichier et produit le rapport sans rien enregistrer",
+        )
+
+    def handle(self, *args, **options):
+        if options['lot'] < 1 or (options['processus'] is not None and options['processus'] < 1):
+            raise CommandError("--lot et --processus doivent être positifs.")
+        lignes = lire_lignes(options['fichier'], options['format'])
+
+        debut = time.perf_counter()
+        try:
+            if options['type'] == 'utilisateurs':
+                resultat = importer_utilisateurs(
+                    lignes, taille_lot=options['lot'], processus=options['processus'],
+                    simulation=options['simulation'],
+                )
+            else:
+                organisateur = None
+                if options['organisateur']:
+                    organisateur = Utilisateur.objects.filter(username=options['organisateur']).first()
+                    if organisateur is None:
+                        raise CommandError(f"Utilisateur « {options['organisateur']} » introuvable.")
+                resultat = importer_evenements(
+                    lignes, organisateur=organisateur, statut=options['statut'],
+                    taille_lot=options['lot'], simulation=options['simulation'],
+                )
+        except (ErreurImport, OSError, ValueError) as erreur:
+            raise CommandError(str(erreur))
+        duree = time.perf_counter() - debut
+
+        self.ecrire_rapport(resultat.erreurs, options['rapport'])
+        lignes_refusees = len({numero for numero, _ in resultat.erreurs})
+        if options['simulation']:
+            message = f"Simulation : {resultat.valides} ligne(s) valide(s), {lignes_refusees} refusée(s)"
+        else:
+            message = f"{resultat.crees} {options['type']} importé(s), {lignes_refusees} ligne(s) refusée(s)"
+        style = self.style.WARNING if resultat.erreurs else self.style.SUCCESS
+        self.stdout.write(style(f"{message} en {duree:.1f} s."))
+
+    def ecrire_rapport(self, erreurs, fichier):
+        if fichier:
+            with open(fichier, 'w', newline='', encoding='utf-8') as f:
+                ecrivain = csv.writer(f, delimiter=';')
+                ecrivain.writerow(['ligne', 'erreur'])
+                ecrivain.writerows(erreurs)
+            if erreurs:
+                self.stderr.write(f"{len(erreurs)} erreur(s) écrite(s) dans {fichier}.")
+            return
+        for numero, message in erreurs[:NB_ERREURS_AFFICHEES]:
+            self.stderr.write(f"Ligne {numero} : {message}")
+        if len(erreurs) > NB_ERREURS_AFFICHEES:
+            self.stderr.write(f"... et {len(erreurs) - NB_ERREURS_AFFICHEES} autre(s) erreur(s) : utilisez --rapport.")
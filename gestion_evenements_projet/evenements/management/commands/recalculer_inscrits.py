@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Q
+from evenements.models import Evenement
+
+
+class Command(BaseCommand):
+    help = "Réconcilie les compteurs nb_inscrits et nb_en_attente des événements avec les inscriptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--evenement', type=int, nargs='+', dest='evenements',
+            help="Limiter la réconciliation à ces identifiants d'événements",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Afficher les écarts sans les corriger",
+        )
+
+    def handle(self, *args, **options):
+        evenements = Evenement.objects.all()
+        if options['evenements']:
+            evenements = evenements.filter(pk__in=options['evenements'])
+
+        ecarts = list(
+            evenements.annotate(
+                reel=Count('inscriptions', filter=Q(inscriptions__statut='confirmee')),
+                reel_attente=Count('inscriptions', filter=Q(inscriptions__statut='en_attente')),
+            ).exclude(
+                nb_inscrits=F('reel'), nb_en_attente=F('reel_attente')
+            ).values_list('pk', 'titre', 'nb_inscrits', 'reel', 'nb_en_attente', 'reel_attente')
+        )
+
+        for pk, titre, stocke, reel, stocke_attente, reel_attente in ecarts:
+            self.stdout.write(
+                f"  #{pk} {titre} : inscrits {stocke} → {reel}, en attente {stocke_attente} → {reel_attente}"
+            )
+
+        if not ecarts:
+            self.stdout.write(self.style.SUCCESS("Tous les compteurs sont à jour."))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(ecarts)} compteur(s) à corriger (dry-run)."))
+            return
+
+        Evenement.objects.filter(pk__in=[pk for pk, *_ in ecarts]).recalculer_inscrits()
+        self.stdout.write(self.style.SUCCESS(f"{len(ecarts)} compteur(s) corrigé(s)."))
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from evenements.models import Evenement
+from evenements.recherche import reconstruire_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des événements"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default='default',
+            help="Alias de la base de données à réindexer",
+        )
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        if not reconstruire_index(using=options['database']):
+            self.stdout.write(self.style.WARNING(
+                "Aucun index plein texte sur cette base : la recherche utilise icontains."
+            ))
+            return
+
+        nb_evenements = Evenement.objects.using(options['database']).count()
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{nb_evenements} événement(s) réindexé(s) en {duree:.2f} s."
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:54
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def initialiser_nb_inscrits(apps, schema_editor):
+    """Initialise le compteur à partir des inscriptions confirmées existantes"""
+    Evenement = apps.get_model('evenements', 'Evenement')
+    Inscription = apps.get_model('evenements', 'Inscription')
+    confirmees = Inscription.objects.filter(
+        evenement=OuterRef('pk'),
+        statut='confirmee'
+    ).order_by().values('evenement').annotate(total=Count('pk')).values('total')
+    Evenement.objects.update(nb_inscrits=Coalesce(Subquery(confirmees), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evenements', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evenement',
+            name='nb_inscrits',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(initialiser_nb_inscrits, migrations.RunPython.noop),
+    ]
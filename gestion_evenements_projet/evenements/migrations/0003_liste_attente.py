@@ -0,0 +1,47 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:06
+
+from django.db import migrations, models
+
+
+def numeroter_liste_attente(apps, schema_editor):
+    """Attribue des tickets aux inscriptions déjà en attente, par date d'inscription"""
+    Evenement = apps.get_model('evenements', 'Evenement')
+    Inscription = apps.get_model('evenements', 'Inscription')
+    en_attente = Inscription.objects.filter(statut='en_attente').order_by('evenement_id', 'date_inscription', 'pk')
+    tickets = {}
+    for inscription in en_attente:
+        tickets[inscription.evenement_id] = tickets.get(inscription.evenement_id, 0) + 1
+        inscription.ticket_attente = tickets[inscription.evenement_id]
+        inscription.save(update_fields=['ticket_attente'])
+    for evenement_id, nombre in tickets.items():
+        Evenement.objects.filter(pk=evenement_id).update(nb_en_attente=nombre)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evenements', '0002_evenement_nb_inscrits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evenement',
+            name='attente_tete',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='evenement',
+            name='nb_en_attente',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='inscription',
+            name='ticket_attente',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='inscription',
+            index=models.Index(fields=['evenement', 'ticket_attente'], name='inscription_ticket_attente'),
+        ),
+        migrations.RunPython(numeroter_liste_attente, migrations.RunPython.noop),
+    ]
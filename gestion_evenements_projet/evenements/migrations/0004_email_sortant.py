@@ -0,0 +1,38 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evenements', '0003_liste_attente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSortant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sujet', models.CharField(max_length=255)),
+                ('message_texte', models.TextField()),
+                ('message_html', models.TextField(blank=True)),
+                ('expediteur', models.CharField(max_length=254)),
+                ('destinataire', models.EmailField(max_length=254)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', "En cours d'envoi"), ('envoye', 'Envoyé'), ('echec', 'Échec définitif')], default='en_attente', max_length=20)),
+                ('tentatives', models.PositiveIntegerField(default=0)),
+                ('prochaine_tentative', models.DateTimeField(default=django.utils.timezone.now)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('verrou', models.CharField(blank=True, editable=False, max_length=32)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': "Email en file d'envoi",
+                'verbose_name_plural': "File d'envoi des emails",
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['statut', 'prochaine_tentative'], name='email_sortant_a_envoyer')],
+            },
+        ),
+    ]
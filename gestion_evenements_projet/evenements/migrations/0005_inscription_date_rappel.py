@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evenements', '0004_email_sortant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inscription',
+            name='date_rappel',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+def creer_index_recherche(apps, schema_editor):
+    """
+    SQLite : table FTS5 remplie avec les événements existants (ignorée si
+    SQLite est compilé sans FTS5).
+    PostgreSQL : configuration fr_unaccent et index GIN sur le tsvector pondéré.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            if 'ENABLE_FTS5' not in {ligne[0] for ligne in cursor.fetchall()}:
+                return
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE evenements_evenement_fts USING fts5("
+            "titre, description, lieu, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO evenements_evenement_fts (rowid, titre, description, lieu) "
+            "SELECT id, titre, description, lieu FROM evenements_evenement"
+        )
+        connection.fts_evenements = None
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        schema_editor.execute("""
+            DO $$ BEGIN
+                CREATE TEXT SEARCH CONFIGURATION fr_unaccent (COPY = french);
+                ALTER TEXT SEARCH CONFIGURATION fr_unaccent
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem;
+            EXCEPTION WHEN unique_violation THEN NULL;
+            END $$
+        """)
+        # Même expression que evenements.recherche.vecteur_postgres()
+        schema_editor.execute("""
+            CREATE INDEX evenement_recherche_gin ON evenements_evenement USING gin ((
+                setweight(to_tsvector('fr_unaccent'::regconfig, COALESCE(titre::text, '')), 'A')
+                || setweight(to_tsvector('fr_unaccent'::regconfig, COALESCE(lieu::text, '')), 'B')
+                || setweight(to_tsvector('fr_unaccent'::regconfig, COALESCE(description::text, '')), 'C')
+            ))
+        """)
+
+
+def supprimer_index_recherche(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS evenements_evenement_fts")
+        connection.fts_evenements = None
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS evenement_recherche_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evenements', '0005_inscription_date_rappel'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index_recherche, supprimer_index_recherche),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('evenements', '0006_recherche_plein_texte'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evenement',
+            index=models.Index(condition=models.Q(('statut', 'valide')), fields=['date_debut', 'id'], name='evenement_valide_date'),
+        ),
+        migrations.AddIndex(
+            model_name='evenement',
+            index=models.Index(condition=models.Q(('statut', 'valide')), fields=['categorie', 'date_debut', 'id'], name='evenement_valide_categorie'),
+        ),
+        migrations.AddIndex(
+            model_name='evenement',
+            index=models.Index(condition=models.Q(('statut', 'en_attente')), fields=['date_debut'], name='evenement_a_valider'),
+        ),
+        migrations.AddIndex(
+            model_name='evenement',
+            index=models.Index(fields=['organisateur', 'date_debut'], name='evenement_organisateur_date'),
+        ),
+        migrations.AddIndex(
+            model_name='inscription',
+            index=models.Index(fields=['evenement', 'statut'], name='inscription_evenement_statut'),
+        ),
+        migrations.AddIndex(
+            model_name='inscription',
+            index=models.Index(fields=['participant', 'statut', '-date_inscription'], name='inscription_participant'),
+        ),
+        migrations.AddIndex(
+            model_name='inscription',
+            index=models.Index(condition=models.Q(('date_rappel__isnull', True), ('statut', 'confirmee')), fields=['evenement'], name='inscription_rappel_a_envoyer'),
+        ),
+        migrations.AddIndex(
+            model_name='utilisateur',
+            index=models.Index(fields=['date_joined', 'id'], name='utilisateur_date_inscription'),
+        ),
+        migrations.AddIndex(
+            model_name='utilisateur',
+            index=models.Index(fields=['role', 'date_joined', 'id'], name='utilisateur_role_date'),
+        ),
+        migrations.AddIndex(
+            model_name='utilisateur',
+            index=models.Index(fields=['departement'], name='utilisateur_departement'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('evenements', '0007_index_requetes_frequentes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='utilisateur',
+            name='utilisateur_departement',
+        ),
+        migrations.AddIndex(
+            model_name='utilisateur',
+            index=models.Index(fields=['departement', 'role'], name='utilisateur_departement_role'),
+        ),
+    ]
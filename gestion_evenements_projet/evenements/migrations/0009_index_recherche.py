@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-17 21:07
+
+import django.db.models.deletion
+import evenements.recherche
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evenements', '0008_facettes_utilisateurs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexRecherche',
+            fields=[
+                ('evenement', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='index_recherche', serialize=False, to='evenements.evenement')),
+                ('titre', models.TextField()),
+                ('description', models.TextField()),
+                ('lieu', models.TextField()),
+                ('document', evenements.recherche.ColonneFts(db_column='evenements_evenement_fts')),
+            ],
+            options={
+                'db_table': 'evenements_evenement_fts',
+                'managed': False,
+            },
+        ),
+    ]
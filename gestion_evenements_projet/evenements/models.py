@@ -1,7 +1,11 @@
 # Create your models here.
-from django.db import models
+import itertools
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
+from .recherche import TABLE_FTS, ColonneFts
 
 class Utilisateur(AbstractUser):
     """Modèle utilisateur personnalisé"""
@@ -17,14 +21,62 @@ class Utilisateur(AbstractUser):
     class Meta:
         verbose_name = 'Utilisateur'
         verbose_name_plural = 'Utilisateurs'
+        indexes = [
+            # Annuaire paginé sur (date_joined, id), avec ou sans filtre de rôle
+            models.Index(fields=['date_joined', 'id'], name='utilisateur_date_inscription'),
+            models.Index(fields=['role', 'date_joined', 'id'], name='utilisateur_role_date'),
+            # Filtre par département et facettes (GROUP BY departement, role)
+            models.Index(fields=['departement', 'role'], name='utilisateur_departement_role'),
+        ]
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.role})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Mémorise le rôle et le département chargés pour mettre à jour les facettes"""
+        instance = super().from_db(db, field_names, values)
+        instance._facettes_enregistrees = (instance.__dict__.get('role'), instance.__dict__.get('departement'))
+        return instance
+    
     def est_admin(self):
         return self.role == 'admin'
 
 
+class EvenementQuerySet(models.QuerySet):
+    """QuerySet des événements"""
+
+    def recalculer_inscrits(self):
+        """
+        Recalcule les compteurs nb_inscrits et nb_en_attente à partir des
+        inscriptions, en une seule requête UPDATE pour tout le queryset.
+        
+        Les listes d'attente sont renumérotées à partir de 1 (attente_tete
+        remis à 1), dans l'ordre des tickets puis des dates d'inscription ;
+        les inscriptions sorties de la liste perdent leur ticket.
+        """
+        def compter(statut):
+            return Coalesce(Subquery(
+                Inscription.objects.filter(
+                    evenement=OuterRef('pk'),
+                    statut=statut
+                ).order_by().values('evenement').annotate(total=Count('pk')).values('total')
+            ), Value(0))
+        with transaction.atomic(using=self.db):
+            inscriptions = Inscription.objects.using(self.db).filter(evenement__in=self.values('pk'))
+            inscriptions.filter(ticket_attente__isnull=False).exclude(statut='en_attente').update(ticket_attente=None)
+            en_attente = list(inscriptions.filter(statut='en_attente').order_by(
+                'evenement_id', F('ticket_attente').asc(nulls_last=True), 'date_inscription', 'pk'
+            ).only('pk', 'evenement_id', 'ticket_attente'))
+            for _, groupe in itertools.groupby(en_attente, key=lambda inscription: inscription.evenement_id):
+                for ticket, inscription in enumerate(groupe, start=1):
+                    inscription.ticket_attente = ticket
+            Inscription.objects.using(self.db).bulk_update(en_attente, ['ticket_attente'], batch_size=500)
+            return self.update(
+                nb_inscrits=compter('confirmee'), nb_en_attente=compter('en_attente'), attente_tete=1
+            )
+
+
 class Evenement(models.Model):
     """Modèle pour les événements universitaires"""
     CATEGORIE_CHOICES = [
@@ -56,21 +108,199 @@ class Evenement(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
+    # Compteur des inscriptions confirmées, tenu à jour par les signaux
+    # (voir signals.py) et par InscriptionQuerySet pour les mises à jour en masse
+    nb_inscrits = models.PositiveIntegerField(default=0, editable=False)
+    
+    # Liste d'attente : taille et ticket de la personne en tête. Les tickets
+    # des inscriptions en attente sont consécutifs à partir de attente_tete.
+    nb_en_attente = models.PositiveIntegerField(default=0, editable=False)
+    attente_tete = models.PositiveIntegerField(default=1, editable=False)
+    
+    # Champs tenus à jour par des UPDATE atomiques, jamais réécrits par save()
+    COMPTEURS = ('nb_inscrits', 'nb_en_attente', 'attente_tete')
+    
+    objects = EvenementQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Événement'
         verbose_name_plural = 'Événements'
         ordering = ['date_debut']
+        indexes = [
+            # Accueil, liste paginée et rappels : événements validés par date
+            models.Index(fields=['date_debut', 'id'], name='evenement_valide_date', condition=Q(statut='valide')),
+            models.Index(
+                fields=['categorie', 'date_debut', 'id'], name='evenement_valide_categorie',
+                condition=Q(statut='valide')
+            ),
+            # Événements à valider (tableau de bord des admins)
+            models.Index(fields=['date_debut'], name='evenement_a_valider', condition=Q(statut='en_attente')),
+            models.Index(fields=['organisateur', 'date_debut'], name='evenement_organisateur_date'),
+        ]
     
     def __str__(self):
         return f"{self.titre} - {self.date_debut.strftime('%d/%m/%Y')}"
     
+    def save(self, *args, **kwargs):
+        """
+        Les compteurs ne sont jamais réécrits par save() : une instance
+        chargée avant une inscription écraserait sinon la valeur à jour.
+        """
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COMPTEURS
+            ]
+        super().save(*args, **kwargs)
+    
     def est_complet(self):
         """Vérifie si l'événement a atteint sa capacité maximale"""
-        return self.inscriptions.filter(statut='confirmee').count() >= self.capacite_max
+        return self.nb_inscrits >= self.capacite_max
+    
+    def places_restantes(self):
+        """Retourne le nombre de places encore libres"""
+        return max(self.capacite_max - self.nb_inscrits, 0)
     
     def nombre_inscrits(self):
         """Retourne le nombre d'inscrits confirmés"""
-        return self.inscriptions.filter(statut='confirmee').count()
+        return self.nb_inscrits
+    nombre_inscrits.short_description = 'Inscrits'
+    nombre_inscrits.admin_order_field = 'nb_inscrits'
+    
+    def reserver_place(self, participant, liste_attente=True):
+        """
+        Inscrit le participant si une place est libre.
+        
+        La vérification de capacité et la prise de place sont une seule
+        requête UPDATE conditionnelle sur nb_inscrits : la base sérialise les
+        écritures concurrentes sur la ligne (verrou de ligne sur PostgreSQL,
+        verrou d'écriture sur SQLite), si bien que deux requêtes ne peuvent pas
+        obtenir la dernière place. La place n'est ensuite attachée à
+        l'inscription que dans la même transaction. Une place ne peut pas être
+        prise tant que la liste d'attente n'est pas vide.
+        
+        Si l'événement est complet et que liste_attente est vrai, le
+        participant est ajouté en fin de liste d'attente.
+        
+        Retourne un tuple (inscription, resultat) où resultat vaut 'creee',
+        'reactivee', 'en_attente', 'deja_inscrit', 'deja_en_attente' ou 'complet'.
+        """
+        try:
+            with transaction.atomic():
+                place_obtenue = Evenement.objects.filter(
+                    pk=self.pk,
+                    statut='valide',
+                    nb_inscrits__lt=F('capacite_max'),
+                    nb_en_attente=0
+                ).update(nb_inscrits=F('nb_inscrits') + 1)
+                
+                inscription = Inscription.objects.filter(evenement=self, participant=participant).first()
+                if inscription is not None and inscription.statut == 'confirmee':
+                    transaction.set_rollback(True)
+                    return inscription, 'deja_inscrit'
+                if inscription is not None and inscription.statut == 'en_attente':
+                    transaction.set_rollback(True)
+                    return inscription, 'deja_en_attente'
+                
+                if not place_obtenue:
+                    if not liste_attente:
+                        return inscription, 'complet'
+                    return self._ajouter_liste_attente(participant, inscription)
+                
+                resultat = 'reactivee'
+                if inscription is None:
+                    inscription = Inscription(evenement=self, participant=participant)
+                    resultat = 'creee'
+                inscription.statut = 'confirmee'
+                inscription._place_reservee = True
+                inscription.save()
+        except IntegrityError:
+            # Double clic : une requête concurrente du même participant a créé l'inscription
+            inscription = Inscription.objects.get(evenement=self, participant=participant)
+            return inscription, 'deja_inscrit' if inscription.statut == 'confirmee' else 'deja_en_attente'
+        
+        self.nb_inscrits += 1
+        return inscription, resultat
+    
+    def _ajouter_liste_attente(self, participant, inscription):
+        """Ajoute le participant en fin de liste d'attente (dans la transaction de reserver_place)"""
+        verrouille = Evenement.objects.select_for_update().filter(pk=self.pk, statut='valide').first()
+        if verrouille is None:
+            return inscription, 'complet'
+        Evenement.objects.filter(pk=self.pk).update(nb_en_attente=F('nb_en_attente') + 1)
+        
+        if inscription is None:
+            inscription = Inscription(evenement=self, participant=participant)
+        inscription.statut = 'en_attente'
+        inscription.ticket_attente = verrouille.attente_tete + verrouille.nb_en_attente
+        inscription.save()
+        self.nb_en_attente = verrouille.nb_en_attente + 1
+        self.attente_tete = verrouille.attente_tete
+        
+        # Une place a pu se libérer entre-temps : la tête de liste en profite
+        if self.promouvoir_liste_attente():
+            inscription.refresh_from_db(fields=['statut', 'ticket_attente'])
+        return inscription, 'creee' if inscription.statut == 'confirmee' else 'en_attente'
+    
+    def promouvoir_liste_attente(self, places_liberees=None):
+        """
+        Confirme les premières personnes de la liste d'attente tant qu'il reste
+        des places. Chaque promotion prend la place par un UPDATE conditionnel
+        puis lit la tête de liste sur l'index (evenement, ticket_attente) : le
+        coût ne dépend pas de la longueur de la liste.
+        
+        places_liberees est donné par un appelant qui a lu l'événement sous
+        verrou dans la transaction en cours : ce sont les places libres
+        (capacite_max - nb_inscrits). Il borne le nombre de tentatives (pas
+        d'UPDATE voué à l'échec) et les compteurs de l'instance sont tenus à
+        jour en mémoire au lieu d'être relus.
+        
+        Retourne la liste des inscriptions promues.
+        """
+        promues = []
+        if places_liberees is None:
+            tentatives = itertools.repeat(None)
+        else:
+            tentatives = range(min(places_liberees, self.nb_en_attente))
+        with transaction.atomic(savepoint=False):
+            for _ in tentatives:
+                place_obtenue = Evenement.objects.filter(
+                    pk=self.pk,
+                    nb_inscrits__lt=F('capacite_max'),
+                    nb_en_attente__gt=0
+                ).update(
+                    nb_inscrits=F('nb_inscrits') + 1,
+                    nb_en_attente=F('nb_en_attente') - 1
+                )
+                if not place_obtenue:
+                    break
+                
+                premiere = Inscription.objects.select_related('participant').filter(
+                    evenement=self,
+                    statut='en_attente',
+                    ticket_attente__isnull=False
+                ).order_by('ticket_attente').first()
+                if premiere is None:
+                    # Compteur désynchronisé : on rend la place et on vide le compteur
+                    Evenement.objects.filter(pk=self.pk).update(nb_inscrits=F('nb_inscrits') - 1, nb_en_attente=0)
+                    self.nb_en_attente = 0
+                    break
+                
+                Evenement.objects.filter(pk=self.pk).update(attente_tete=premiere.ticket_attente + 1)
+                if places_liberees is not None:
+                    self.nb_inscrits += 1
+                    self.nb_en_attente -= 1
+                    self.attente_tete = premiere.ticket_attente + 1
+                premiere.evenement = self
+                premiere.statut = 'confirmee'
+                premiere.ticket_attente = None
+                premiere._place_reservee = True
+                premiere.save()
+                promues.append(premiere)
+        
+        if promues and places_liberees is None:
+            self.refresh_from_db(fields=self.COMPTEURS)
+        return promues
     
     def est_passe(self):
         """Vérifie si l'événement est passé"""
@@ -78,7 +308,57 @@ class Evenement(models.Model):
     
     def peut_modifier(self, utilisateur):
         """Vérifie si l'utilisateur peut modifier cet événement"""
-        return self.organisateur == utilisateur or utilisateur.est_admin()
+        # Comparaison des identifiants : évite de charger l'organisateur
+        return self.organisateur_id == utilisateur.pk or utilisateur.est_admin()
+
+
+class IndexRecherche(models.Model):
+    """
+    Table virtuelle FTS5 de la recherche plein texte (SQLite), créée par la
+    migration 0006 et tenue à jour par evenements.recherche : seulement lue,
+    par jointure depuis Evenement (rechercher_evenements).
+    """
+    evenement = models.OneToOneField(
+        Evenement, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='index_recherche'
+    )
+    titre = models.TextField()
+    description = models.TextField()
+    lieu = models.TextField()
+    document = ColonneFts(db_column=TABLE_FTS)
+    
+    class Meta:
+        managed = False
+        db_table = TABLE_FTS
+
+
+class InscriptionQuerySet(models.QuerySet):
+    """
+    QuerySet des inscriptions. update() et bulk_create() ne déclenchent pas
+    les signaux : on recalcule donc les compteurs et les listes d'attente
+    des événements concernés.
+    """
+
+    def update(self, **kwargs):
+        if 'statut' not in kwargs and 'evenement' not in kwargs and 'evenement_id' not in kwargs:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            evenement_ids = set(self.values_list('evenement_id', flat=True))
+            nombre = super().update(**kwargs)
+            nouvel_evenement = kwargs.get('evenement', kwargs.get('evenement_id'))
+            if nouvel_evenement is not None:
+                evenement_ids.add(getattr(nouvel_evenement, 'pk', nouvel_evenement))
+            Evenement.objects.using(self.db).filter(pk__in=evenement_ids).recalculer_inscrits()
+        return nombre
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            evenement_ids = {obj.evenement_id for obj in objs}
+            Evenement.objects.using(self.db).filter(pk__in=evenement_ids).recalculer_inscrits()
+        return objs
+    bulk_create.alters_data = True
 
 
 class Inscription(models.Model):
@@ -95,11 +375,144 @@ class Inscription(models.Model):
     date_inscription = models.DateTimeField(auto_now_add=True)
     commentaire = models.TextField(blank=True)
     
+    # Ticket dans la liste d'attente de l'événement (statut 'en_attente' uniquement)
+    ticket_attente = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Date d'envoi du rappel 24h avant l'événement (voir la commande envoyer_rappels)
+    date_rappel = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = InscriptionQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Inscription'
         verbose_name_plural = 'Inscriptions'
         unique_together = ['evenement', 'participant']
         ordering = ['-date_inscription']
+        indexes = [
+            models.Index(fields=['evenement', 'ticket_attente'], name='inscription_ticket_attente'),
+            models.Index(fields=['evenement', 'statut'], name='inscription_evenement_statut'),
+            models.Index(fields=['participant', 'statut', '-date_inscription'], name='inscription_participant'),
+            # Rappels restant à envoyer
+            models.Index(
+                fields=['evenement'], name='inscription_rappel_a_envoyer',
+                condition=Q(statut='confirmee', date_rappel__isnull=True)
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.participant.get_full_name()} - {self.evenement.titre}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Mémorise l'état chargé pour calculer les variations du compteur"""
+        instance = super().from_db(db, field_names, values)
+        instance._etat_enregistre = (instance.__dict__.get('evenement_id'), instance.__dict__.get('statut'))
+        return instance
+    
+    def position_attente(self):
+        """
+        Position dans la liste d'attente (1 = prochaine personne promue),
+        calculée à partir du ticket et de la tête de liste, sans parcourir la liste.
+        """
+        if self.statut != 'en_attente' or self.ticket_attente is None:
+            return None
+        return self.ticket_attente - self.evenement.attente_tete + 1
+    
+    def annuler(self, deja_verrouillee=False):
+        """
+        Annule l'inscription, confirmée ou en liste d'attente. Si une place se
+        libère, la tête de la liste d'attente est promue dans la même transaction.
+        
+        deja_verrouillee indique que l'appelant a lu l'inscription et son
+        événement (self.evenement) sous verrou dans la transaction en cours :
+        ils ne sont pas relus.
+        
+        Retourne la liste des inscriptions promues.
+        """
+        with transaction.atomic(savepoint=False):
+            if deja_verrouillee:
+                evenement, actuelle = self.evenement, self
+                etat_actuel = (self.evenement_id, self.statut)
+            else:
+                evenement = Evenement.objects.select_for_update().get(pk=self.evenement_id)
+                actuelle = Inscription.objects.select_for_update().get(pk=self.pk)
+                etat_actuel = (actuelle.evenement_id, actuelle.statut)
+            if actuelle.statut == 'annulee':
+                self.statut = 'annulee'
+                return []
+            
+            if actuelle.statut == 'en_attente':
+                if actuelle.ticket_attente == evenement.attente_tete:
+                    Evenement.objects.filter(pk=evenement.pk).update(
+                        nb_en_attente=F('nb_en_attente') - 1, attente_tete=F('attente_tete') + 1
+                    )
+                    evenement.attente_tete += 1
+                else:
+                    Evenement.objects.filter(pk=evenement.pk).update(nb_en_attente=F('nb_en_attente') - 1)
+                    actuelle.liberer_ticket_attente()
+                evenement.nb_en_attente -= 1
+            
+            # L'état en base fait foi : une promotion a pu avoir lieu depuis le chargement
+            self._etat_enregistre = etat_actuel
+            self.statut = 'annulee'
+            self.ticket_attente = None
+            self.save()
+            
+            promues = []
+            if etat_actuel[1] == 'confirmee':
+                # Le signal post_save a décrémenté nb_inscrits en base, et sur
+                # self.evenement s'il est chargé. Toutes les places libres sont
+                # attribuées : la capacité a pu être augmentée sans promotion
+                # (dans l'admin par exemple).
+                if not deja_verrouillee:
+                    evenement.nb_inscrits -= 1
+                promues = evenement.promouvoir_liste_attente(
+                    places_liberees=evenement.capacite_max - evenement.nb_inscrits
+                )
+        return promues
+    
+    def liberer_ticket_attente(self):
+        """Fait avancer d'une place les personnes placées derrière en liste d'attente"""
+        Inscription.objects.filter(
+            evenement_id=self.evenement_id,
+            ticket_attente__gt=self.ticket_attente
+        ).update(ticket_attente=F('ticket_attente') - 1)
+
+class EmailSortant(models.Model):
+    """
+    File d'envoi persistante des emails. Les messages sont enregistrés dans
+    la même transaction que le changement d'état qui les déclenche, puis
+    envoyés par la commande envoyer_emails.
+    """
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', "En cours d'envoi"),
+        ('envoye', 'Envoyé'),
+        ('echec', 'Échec définitif'),
+    ]
+    
+    sujet = models.CharField(max_length=255)
+    message_texte = models.TextField()
+    message_html = models.TextField(blank=True)
+    expediteur = models.CharField(max_length=254)
+    destinataire = models.EmailField()
+    
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente')
+    tentatives = models.PositiveIntegerField(default=0)
+    prochaine_tentative = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True)
+    # Jeton du worker qui a réservé le message (statut 'en_cours')
+    verrou = models.CharField(max_length=32, blank=True, editable=False)
+    
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_envoi = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Email en file d'envoi"
+        verbose_name_plural = "File d'envoi des emails"
+        ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['statut', 'prochaine_tentative'], name='email_sortant_a_envoyer'),
+        ]
     
     def __str__(self):
-        return f"{self.participant.get_full_name()} - {self.evenement.titre}"
\ No newline at end of file
+        return f"{self.sujet} → {self.destinataire} ({self.get_statut_display()})"
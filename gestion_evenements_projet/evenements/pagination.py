@@ -0,0 +1,139 @@
+"""
+Pagination par curseur (keyset) des listes.
+
+Au lieu d'un OFFSET, chaque page est filtrée à partir de la clé de tri du
+dernier élément affiché : une page profonde coûte le même prix que la
+première et aucun COUNT n'est nécessaire. Le curseur transmis dans l'URL
+contient le sens de navigation et les valeurs de la clé, encodés en base64.
+"""
+import base64
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+APRES = 'apres'
+AVANT = 'avant'
+
+
+def encoder_curseur(sens, valeurs):
+    # isoformat() garde les microsecondes, contrairement à DjangoJSONEncoder
+    valeurs = [valeur.isoformat() if hasattr(valeur, 'isoformat') else valeur for valeur in valeurs]
+    donnees = json.dumps([sens, valeurs], separators=(',', ':'))
+    return base64.urlsafe_b64encode(donnees.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur, modele, champs):
+    """
+    Retourne (sens, valeurs) ou None si le curseur est absent ou invalide.
+    Les valeurs sont reconverties avec le champ du modèle correspondant.
+    """
+    if not curseur:
+        return None
+    try:
+        donnees = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        sens, valeurs = json.loads(donnees)
+        if sens not in (APRES, AVANT) or len(valeurs) != len(champs):
+            return None
+        converties = []
+        for (nom, _), valeur in zip(champs, valeurs):
+            try:
+                converties.append(modele._meta.get_field(nom).to_python(valeur))
+            except FieldDoesNotExist:
+                # Annotation (ex. pertinence de la recherche)
+                converties.append(valeur)
+        return sens, converties
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def filtre_keyset(champs, valeurs, inverser=False):
+    """
+    Condition « strictement après la clé `valeurs` » dans l'ordre `champs`.
+    La première colonne est bornée seule (>= ou <=) pour que la base puisse
+    parcourir l'index à partir de la clé.
+    """
+    comparaisons = []
+    for nom, descendant in champs:
+        comparaisons.append((nom, 'gt' if descendant == inverser else 'lt'))
+
+    premier, lookup = comparaisons[0]
+    condition = Q()
+    egalites = {}
+    for (nom, lookup_champ), valeur in zip(comparaisons, valeurs):
+        condition |= Q(**egalites, **{f'{nom}__{lookup_champ}': valeur})
+        egalites[nom] = valeur
+    return Q(**{f'{premier}__{lookup}e': valeurs[0]}) & condition
+
+
+class PageCurseur:
+    """Une page de résultats avec les liens vers les pages voisines"""
+
+    def __init__(self, elements, curseur_precedent=None, curseur_suivant=None):
+        self.elements = elements
+        self.curseur_precedent = curseur_precedent
+        self.curseur_suivant = curseur_suivant
+        self.lien_precedent = None
+        self.lien_suivant = None
+
+    def __iter__(self):
+        return iter(self.elements)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __bool__(self):
+        return bool(self.elements)
+
+
+def paginer(queryset, ordre, curseur=None, taille=20):
+    """
+    Retourne une PageCurseur de `taille` éléments de `queryset`, triés selon
+    `ordre` (ex. ('date_debut', 'id') ou ('-date_joined', '-id')). Le dernier
+    champ de `ordre` doit être unique pour que la clé soit totale.
+    """
+    champs = [(nom.lstrip('-'), nom.startswith('-')) for nom in ordre]
+    cle = decoder_curseur(curseur, queryset.model, champs)
+
+    def valeurs(element):
+        return [getattr(element, nom) for nom, _ in champs]
+
+    # Un élément de plus que la page indique s'il existe une page suivante
+    if cle is None:
+        elements = list(queryset.order_by(*ordre)[:taille + 1])
+        a_suivante, a_precedente = len(elements) > taille, False
+        elements = elements[:taille]
+    elif cle[0] == APRES:
+        elements = list(queryset.filter(filtre_keyset(champs, cle[1])).order_by(*ordre)[:taille + 1])
+        a_suivante, a_precedente = len(elements) > taille, True
+        elements = elements[:taille]
+    else:
+        ordre_inverse = [nom[1:] if nom.startswith('-') else f'-{nom}' for nom in ordre]
+        elements = list(
+            queryset.filter(filtre_keyset(champs, cle[1], inverser=True)).order_by(*ordre_inverse)[:taille + 1]
+        )
+        a_suivante, a_precedente = True, len(elements) > taille
+        elements = elements[:taille][::-1]
+
+    if not elements:
+        # Curseur périmé (éléments supprimés entre-temps) : retour au début
+        return paginer(queryset, ordre, taille=taille) if cle else PageCurseur(elements)
+    return PageCurseur(
+        elements,
+        encoder_curseur(AVANT, valeurs(elements[0])) if a_precedente else None,
+        encoder_curseur(APRES, valeurs(elements[-1])) if a_suivante else None,
+    )
+
+
+def paginer_requete(request, parametre, queryset, ordre, taille=20):
+    """
+    Pagine `queryset` avec le curseur lu dans request.GET[parametre] et
+    construit les liens précédent/suivant en conservant les autres
+    paramètres de la requête (filtres, curseurs des autres listes).
+    """
+    page = paginer(queryset, ordre, request.GET.get(parametre), taille)
+    for attribut, curseur in (('lien_precedent', page.curseur_precedent), ('lien_suivant', page.curseur_suivant)):
+        if curseur is not None:
+            parametres = request.GET.copy()
+            parametres[parametre] = curseur
+            setattr(page, attribut, '?' + parametres.urlencode())
+    return page
@@ -0,0 +1,229 @@
+"""
+Profilage des requêtes en production.
+
+ProfilageMiddleware mesure, pour une fraction des requêtes
+(PROFILAGE_ECHANTILLONNAGE), le nombre et la durée des requêtes SQL, le
+temps de rendu des templates, le temps de préparation des emails et la
+durée totale. Les mesures sont renvoyées dans l'en-tête Server-Timing
+(visible dans l'onglet Réseau du navigateur) et les requêtes les plus lentes
+sont conservées en mémoire pour la page « Performances » des admins.
+
+Les requêtes non échantillonnées ne paient qu'un tirage aléatoire.
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import ContextDecorator, ExitStack
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils import timezone
+
+# Mesure de la requête en cours (None hors échantillon)
+_mesure_courante = ContextVar('mesure_profilage', default=None)
+
+
+class Mesure:
+    """Compteurs d'une requête profilée"""
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.nb_sql = 0
+        self.duree_sql = 0.0
+        self.segments = {}
+        self.actifs = set()
+
+    def ajouter(self, nom, duree):
+        self.segments[nom] = self.segments.get(nom, 0.0) + duree
+
+    def chronometrer_sql(self, execute, sql, params, many, context):
+        """execute_wrapper des connexions : compte et chronomètre chaque requête"""
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.nb_sql += 1
+            self.duree_sql += time.perf_counter() - debut
+
+
+class mesurer(ContextDecorator):
+    """
+    Ajoute la durée du bloc (ou de la fonction décorée) au segment `nom` de la
+    requête profilée. Sans requête profilée, ne fait rien. Un segment imbriqué
+    dans lui-même n'est compté qu'une fois.
+    """
+
+    def __init__(self, nom):
+        self.nom = nom
+
+    def __enter__(self):
+        mesure = _mesure_courante.get()
+        if mesure is None or self.nom in mesure.actifs:
+            self.mesure = None
+        else:
+            self.mesure = mesure
+            mesure.actifs.add(self.nom)
+            self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.mesure is not None:
+            self.mesure.ajouter(self.nom, time.perf_counter() - self.debut)
+            self.mesure.actifs.discard(self.nom)
+        return False
+
+    def _recreate_cm(self):
+        # Un nouvel objet par appel : le décorateur est partagé entre threads
+        return type(self)(self.nom)
+
+
+class TemplateProfile(Template):
+    def render(self, context=None, request=None):
+        with mesurer('tpl'):
+            return super().render(context, request)
+
+
+class DjangoTemplatesProfiles(DjangoTemplates):
+    """Moteur de templates Django dont le rendu est compté dans le segment « tpl »"""
+
+    def from_string(self, template_code):
+        return TemplateProfile(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TemplateProfile(super().get_template(template_name).template, self)
+
+
+class RequetesLentes:
+    """
+    Les `capacite` requêtes les plus lentes depuis le démarrage du processus
+    (tas borné : ajouter une requête coûte O(log capacite)). Chaque processus
+    du serveur a le sien.
+    """
+
+    def __init__(self, capacite=None):
+        self._capacite = capacite
+        self._tas = []
+        self._compteur = itertools.count()
+        self._verrou = threading.Lock()
+
+    @property
+    def capacite(self):
+        if self._capacite is not None:
+            return self._capacite
+        return getattr(settings, 'PROFILAGE_NB_REQUETES_LENTES', 50)
+
+    def ajouter(self, enregistrement):
+        element = (enregistrement['total'], next(self._compteur), enregistrement)
+        with self._verrou:
+            if len(self._tas) < self.capacite:
+                heapq.heappush(self._tas, element)
+            elif element[0] > self._tas[0][0]:
+                heapq.heapreplace(self._tas, element)
+
+    def lister(self):
+        """Enregistrements du plus lent au plus rapide"""
+        with self._verrou:
+            elements = sorted(self._tas, reverse=True)
+        return [enregistrement for _, _, enregistrement in elements]
+
+    def vider(self):
+        with self._verrou:
+            self._tas = []
+
+
+requetes_lentes = RequetesLentes()
+
+
+def en_tete_server_timing(mesure, total):
+    """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+    metriques = [f'db;dur={mesure.duree_sql * 1000:.1f};desc="{mesure.nb_sql} requetes SQL"']
+    for nom, duree in sorted(mesure.segments.items()):
+        metriques.append(f'{nom};dur={duree * 1000:.1f}')
+    metriques.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(metriques)
+
+
+class ProfilageMiddleware:
+    """
+    À placer en tête de MIDDLEWARE pour que la durée totale inclue les autres
+    middlewares (session, authentification...).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.echantillonner():
+            return self.get_response(request)
+
+        mesure = Mesure()
+        jeton = _mesure_courante.set(mesure)
+        try:
+            with ExitStack() as pile:
+                self.chronometrer_connexions(pile, mesure)
+                response = self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        return self.terminer(request, response, mesure)
+
+    async def __acall__(self, request):
+        if not self.echantillonner():
+            return await self.get_response(request)
+
+        mesure = Mesure()
+        jeton = _mesure_courante.set(mesure)
+        try:
+            # Les connexions sont propres au fil où l'ORM async exécute les
+            # requêtes : le chronométrage y est installé puis retiré
+            pile = ExitStack()
+            await sync_to_async(self.chronometrer_connexions)(pile, mesure)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(pile.close)()
+        finally:
+            _mesure_courante.reset(jeton)
+        return self.terminer(request, response, mesure)
+
+    def echantillonner(self):
+        taux = getattr(settings, 'PROFILAGE_ECHANTILLONNAGE', 0.0)
+        return taux > 0 and random.random() < taux
+
+    def chronometrer_connexions(self, pile, mesure):
+        for connexion in connections.all():
+            pile.enter_context(connexion.execute_wrapper(mesure.chronometrer_sql))
+
+    def terminer(self, request, response, mesure):
+        total = time.perf_counter() - mesure.debut
+        response['Server-Timing'] = en_tete_server_timing(mesure, total)
+        requetes_lentes.ajouter(self.enregistrement(request, response, mesure, total))
+        return response
+
+    def enregistrement(self, request, response, mesure, total):
+        # Utilisateur déjà chargé par la vue (auser() pour une vue async) : pas
+        # de requête supplémentaire
+        utilisateur = getattr(request, '_cached_user', None) or getattr(request, '_acached_user', None)
+        correspondance = request.resolver_match
+        return {
+            'date': timezone.now(),
+            'methode': request.method,
+            'chemin': request.path,
+            'vue': correspondance.view_name if correspondance else '',
+            'utilisateur': utilisateur.get_username() if utilisateur and utilisateur.is_authenticated else '',
+            'statut': response.status_code,
+            'total': total * 1000,
+            'nb_sql': mesure.nb_sql,
+            'duree_sql': mesure.duree_sql * 1000,
+            'segments': {nom: duree * 1000 for nom, duree in mesure.segments.items()},
+        }
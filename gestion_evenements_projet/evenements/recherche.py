@@ -0,0 +1,198 @@
+"""
+Recherche plein texte sur les événements.
+
+- SQLite : table virtuelle FTS5 (evenements_evenement_fts) alimentée par les
+  signaux de Evenement, tokenizer unicode61 sans diacritiques, classement bm25.
+- PostgreSQL : index GIN sur un tsvector calculé avec la configuration
+  fr_unaccent (french + unaccent), classement ts_rank.
+
+Dans les deux cas la recherche ignore les accents : « conference » trouve
+« Conférence ». Sans FTS5, chaque mot recherché doit apparaître dans le
+titre, la description ou le lieu, comparés sans accents ni majuscules
+(fonction SANS_ACCENTS enregistrée sur les connexions SQLite, mêmes règles
+que le tokenizer unicode61).
+"""
+import re
+import unicodedata
+from django.db import connections
+from django.db.models import FloatField, Func, Lookup, Q, TextField, Value
+from django.db.models.functions import Cast
+
+TABLE_FTS = 'evenements_evenement_fts'
+CONFIG_POSTGRES = 'fr_unaccent'
+
+# Poids bm25 des colonnes (titre, description, lieu)
+POIDS_BM25 = (10.0, 1.0, 5.0)
+
+
+def vecteur_postgres():
+    """tsvector pondéré des événements, identique à l'expression de l'index GIN"""
+    # Import local : psycopg n'est installé qu'avec PostgreSQL
+    from django.contrib.postgres.search import SearchVector
+    return (
+        SearchVector('titre', weight='A', config=CONFIG_POSTGRES)
+        + SearchVector('lieu', weight='B', config=CONFIG_POSTGRES)
+        + SearchVector('description', weight='C', config=CONFIG_POSTGRES)
+    )
+
+
+class ColonneFts(TextField):
+    """
+    Colonne cachée d'une table FTS5, qui porte le nom de la table : opérande
+    de MATCH (lookup `correspond`) et des fonctions de classement (Bm25).
+    """
+
+
+@ColonneFts.register_lookup
+class Correspond(Lookup):
+    lookup_name = 'correspond'
+    
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class Bm25(Func):
+    """Score bm25 de la ligne courante d'une requête MATCH (plus petit = plus pertinent)"""
+    function = 'bm25'
+    output_field = FloatField()
+
+
+def sans_accents(texte):
+    """Minuscules sans diacritiques, comme unicode61 remove_diacritics de FTS5"""
+    if texte is None:
+        return None
+    decompose = unicodedata.normalize('NFKD', texte)
+    return ''.join(c for c in decompose if not unicodedata.combining(c)).lower()
+
+
+def enregistrer_sans_accents(connection):
+    """Rend SANS_ACCENTS() disponible en SQL sur une nouvelle connexion SQLite"""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('SANS_ACCENTS', 1, sans_accents, deterministic=True)
+
+
+class SansAccents(Func):
+    """
+    Colonne sans accents ni majuscules. Hors SQLite, la colonne est comparée
+    telle quelle : les collations par défaut de MySQL ignorent déjà les accents.
+    """
+    function = 'SANS_ACCENTS'
+    output_field = TextField()
+    
+    def as_sql(self, compiler, connection, **extra_context):
+        return compiler.compile(self.source_expressions[0])
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+def fts_disponible(using='default'):
+    """Vérifie que la table FTS5 existe sur une base SQLite"""
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return False
+    # Résultat mémorisé sur la connexion pour éviter une requête par recherche
+    if getattr(conn, 'fts_evenements', None) is None:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLE_FTS])
+            conn.fts_evenements = cursor.fetchone() is not None
+    return conn.fts_evenements
+
+
+def requete_fts(texte):
+    """
+    Transforme la saisie de l'utilisateur en requête FTS5 : chaque mot devient
+    un préfixe entre guillemets, ce qui neutralise la syntaxe FTS5.
+    """
+    mots = re.findall(r'\w+', texte)
+    return ' '.join(f'"{mot}"*' for mot in mots)
+
+
+def indexer_evenement(evenement, using='default'):
+    """Met à jour l'entrée FTS5 d'un événement (appelé par le signal post_save)"""
+    if not fts_disponible(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE_FTS} WHERE rowid = %s", [evenement.pk])
+        cursor.execute(
+            f"INSERT INTO {TABLE_FTS} (rowid, titre, description, lieu) VALUES (%s, %s, %s, %s)",
+            [evenement.pk, evenement.titre, evenement.description, evenement.lieu]
+        )
+
+
+def desindexer_evenement(pk, using='default'):
+    """Supprime l'entrée FTS5 d'un événement (appelé par le signal post_delete)"""
+    if not fts_disponible(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE_FTS} WHERE rowid = %s", [pk])
+
+
+def reconstruire_index(using='default'):
+    """
+    Reconstruit entièrement l'index de recherche. Retourne False si la base
+    ne dispose d'aucun index plein texte.
+    """
+    conn = connections[using]
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute("REINDEX INDEX evenement_recherche_gin")
+            return True
+        if not fts_disponible(using):
+            return False
+        cursor.execute(f"DELETE FROM {TABLE_FTS}")
+        cursor.execute(
+            f"INSERT INTO {TABLE_FTS} (rowid, titre, description, lieu) "
+            "SELECT id, titre, description, lieu FROM evenements_evenement"
+        )
+        cursor.execute(f"INSERT INTO {TABLE_FTS} ({TABLE_FTS}) VALUES ('optimize')")
+    return True
+
+
+def rechercher_evenements(queryset, texte):
+    """
+    Filtre le queryset sur le texte recherché et l'annote avec `pertinence`
+    (plus grand = plus pertinent). Le tri par pertinence reste à la charge de
+    l'appelant.
+    """
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        requete = SearchQuery(texte, config=CONFIG_POSTGRES, search_type='websearch')
+        vecteur = vecteur_postgres()
+        # Cast en double precision : le float4 de ts_rank ne ferait pas un
+        # curseur de pagination exact une fois relu en Python
+        return queryset.annotate(recherche=vecteur).filter(recherche=requete).annotate(
+            pertinence=Cast(SearchRank(vecteur, requete), FloatField())
+        )
+
+    if fts_disponible(queryset.db):
+        requete = requete_fts(texte)
+        if not requete:
+            return queryset.annotate(pertinence=Value(0.0, output_field=FloatField())).none()
+        # Jointure avec la table FTS5 (IndexRecherche) : un seul passage MATCH
+        # fournit à la fois le filtre et le score bm25 (une sous-requête
+        # corrélée recalculerait les statistiques bm25 pour chaque ligne). Le
+        # score est une annotation pour pouvoir servir de clé de pagination.
+        return queryset.filter(index_recherche__document__correspond=requete).annotate(
+            pertinence=-Bm25('index_recherche__document', *(Value(poids) for poids in POIDS_BM25))
+        )
+
+    mots = [sans_accents(mot) for mot in re.findall(r'\w+', texte)]
+    evenements = queryset.alias(
+        titre_sans_accents=SansAccents('titre'),
+        description_sans_accents=SansAccents('description'),
+        lieu_sans_accents=SansAccents('lieu'),
+    ).annotate(pertinence=Value(0.0, output_field=FloatField()))
+    if not mots:
+        return evenements.none()
+    for mot in mots:
+        evenements = evenements.filter(
+            Q(titre_sans_accents__icontains=mot) |
+            Q(description_sans_accents__icontains=mot) |
+            Q(lieu_sans_accents__icontains=mot)
+        )
+    return evenements
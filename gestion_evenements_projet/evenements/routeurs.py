@@ -0,0 +1,130 @@
+"""
+Lectures sur une réplique de la base.
+
+Quand BASE_REPLIQUE désigne un alias de DATABASES, les pages en lecture
+seule décorées par @lecture_replique (accueil, liste et détail des
+événements, annuaire des utilisateurs) lisent sur cet alias pour leurs
+requêtes GET et HEAD. Toutes les écritures, et les lectures des autres
+vues, restent sur la base principale.
+
+La réplique peut être en retard sur la base principale : après une
+écriture (requête POST réussie), le navigateur reçoit le cookie
+COOKIE_PRIMAIRE pendant REPLIQUE_DELAI_PRIMAIRE secondes, et toutes ses
+lectures restent sur la base principale tant qu'il l'envoie. L'utilisateur
+voit ainsi tout de suite sa propre inscription ou sa propre validation.
+
+Les fragments mis en cache et tenus à jour par invalidation ou par
+incréments (bloc de l'accueil, facettes de l'annuaire) sont recalculés sur
+la base principale (lecture_primaire) : un état en retard de la réplique
+resterait sinon en cache après l'invalidation.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+COOKIE_PRIMAIRE = 'lecture_primaire'
+METHODES_LECTURE = ('GET', 'HEAD')
+
+# Vrai pendant une vue en lecture dont les requêtes vont sur la réplique
+_lecture_replique = ContextVar('lecture_replique', default=False)
+
+
+def base_replique():
+    """Alias de la réplique, ou None si aucune n'est configurée"""
+    return getattr(settings, 'BASE_REPLIQUE', None) or None
+
+
+def lecture_replique(vue):
+    """
+    Décorateur de vue : les lectures des requêtes GET et HEAD vont sur la
+    réplique, sauf pour un navigateur qui vient d'écrire.
+    """
+    def sur_replique(request):
+        return request.method in METHODES_LECTURE and COOKIE_PRIMAIRE not in request.COOKIES
+
+    if iscoroutinefunction(vue):
+        # Vue async : le contexte est copié dans les appels sync_to_async de l'ORM
+        @wraps(vue)
+        async def envelopper_async(request, *args, **kwargs):
+            if not sur_replique(request):
+                return await vue(request, *args, **kwargs)
+            jeton = _lecture_replique.set(True)
+            try:
+                return await vue(request, *args, **kwargs)
+            finally:
+                _lecture_replique.reset(jeton)
+
+        return envelopper_async
+
+    @wraps(vue)
+    def envelopper(request, *args, **kwargs):
+        if not sur_replique(request):
+            return vue(request, *args, **kwargs)
+        jeton = _lecture_replique.set(True)
+        try:
+            return vue(request, *args, **kwargs)
+        finally:
+            _lecture_replique.reset(jeton)
+
+    return envelopper
+
+
+@contextmanager
+def lecture_primaire():
+    """Lectures du bloc sur la base principale, même dans une vue en lecture"""
+    jeton = _lecture_replique.set(False)
+    try:
+        yield
+    finally:
+        _lecture_replique.reset(jeton)
+
+
+class RouteurReplique:
+    """Routeur de DATABASE_ROUTERS : sans BASE_REPLIQUE, n'intervient pas"""
+
+    def db_for_read(self, model, **hints):
+        alias = base_replique()
+        if alias and _lecture_replique.get():
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Une instance lue sur la réplique est enregistrée sur la base principale
+        return DEFAULT_DB_ALIAS if base_replique() else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {DEFAULT_DB_ALIAS, base_replique()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+
+class PrimaireApresEcritureMiddleware:
+    """Après une écriture réussie, lectures sur la base principale (COOKIE_PRIMAIRE)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.epingler(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.epingler(request, await self.get_response(request))
+
+    def epingler(self, request, response):
+        if base_replique() and request.method not in METHODES_LECTURE and response.status_code < 400:
+            response.set_cookie(
+                COOKIE_PRIMAIRE, '1', max_age=getattr(settings, 'REPLIQUE_DELAI_PRIMAIRE', 10),
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
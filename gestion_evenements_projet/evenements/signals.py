@@ -0,0 +1,167 @@
+from django.db.backends.signals import connection_created
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .caches import invalider_accueil, invalider_facettes_utilisateurs
+from .disponibilite import signaler_places
+from .models import Evenement, Inscription, Utilisateur
+from .recherche import desindexer_evenement, enregistrer_sans_accents, indexer_evenement
+
+
+def _ajuster_compteur(inscription, evenement_id, delta):
+    """
+    Incrémente ou décrémente nb_inscrits en base avec une expression F(),
+    sûre en cas d'écritures concurrentes, et répercute la variation sur
+    l'événement déjà chargé en mémoire s'il y en a un.
+    """
+    if not evenement_id or not delta:
+        return
+    Evenement.objects.filter(pk=evenement_id).update(nb_inscrits=F('nb_inscrits') + delta)
+    if Inscription.evenement.is_cached(inscription) and inscription.evenement.pk == evenement_id:
+        inscription.evenement.nb_inscrits += delta
+
+
+def _quitter_liste_attente(evenement_id, ticket):
+    """Retire un ticket de la liste d'attente : les personnes placées derrière avancent d'une place"""
+    Evenement.objects.filter(pk=evenement_id).update(nb_en_attente=F('nb_en_attente') - 1)
+    Inscription.objects.filter(
+        evenement_id=evenement_id,
+        ticket_attente__gt=ticket
+    ).update(ticket_attente=F('ticket_attente') - 1)
+
+
+def _rejoindre_liste_attente(evenement_id):
+    """Ticket de fin de liste d'attente, pris sous verrou de l'événement"""
+    evenement = Evenement.objects.select_for_update().only('attente_tete', 'nb_en_attente').get(pk=evenement_id)
+    Evenement.objects.filter(pk=evenement_id).update(nb_en_attente=F('nb_en_attente') + 1)
+    return evenement.attente_tete + evenement.nb_en_attente
+
+
+@receiver(pre_save, sender=Inscription)
+def memoriser_etat_inscription(sender, instance, raw=False, **kwargs):
+    """Retrouve l'état enregistré si l'instance n'a pas été chargée depuis la base"""
+    if raw or instance.pk is None or hasattr(instance, '_etat_enregistre'):
+        return
+    instance._etat_enregistre = (
+        Inscription.objects.filter(pk=instance.pk).values_list('evenement_id', 'statut').first()
+        or (None, None)
+    )
+
+
+@receiver(post_save, sender=Inscription)
+def mettre_a_jour_compteur_apres_sauvegarde(sender, instance, created, raw=False, **kwargs):
+    """Met à jour le compteur de l'événement après création ou modification"""
+    if raw:
+        return
+    ancien_evenement_id, ancien_statut = (None, None) if created else instance._etat_enregistre
+    if ancien_statut == 'confirmee':
+        _ajuster_compteur(instance, ancien_evenement_id, -1)
+    # Une place prise par Evenement.reserver_place() est déjà comptée
+    if instance.statut == 'confirmee' and not instance.__dict__.pop('_place_reservee', False):
+        _ajuster_compteur(instance, instance.evenement_id, 1)
+    
+    # Liste d'attente quittée ou rejointe hors de annuler(), promouvoir_liste_attente()
+    # et reserver_place(), qui tiennent eux-mêmes les tickets (statut modifié dans
+    # l'admin par exemple). Un ticket conservé est celui de l'ancienne liste.
+    ticket = instance.ticket_attente
+    quitte = ancien_statut == 'en_attente' and ticket is not None and (
+        instance.statut != 'en_attente' or instance.evenement_id != ancien_evenement_id
+    )
+    rejoint = instance.statut == 'en_attente' and (ticket is None or quitte) and (
+        ancien_statut != 'en_attente' or instance.evenement_id != ancien_evenement_id
+    )
+    if quitte or rejoint:
+        with transaction.atomic():
+            if quitte:
+                _quitter_liste_attente(ancien_evenement_id, ticket)
+                instance.ticket_attente = None
+            if rejoint:
+                instance.ticket_attente = _rejoindre_liste_attente(instance.evenement_id)
+            Inscription.objects.filter(pk=instance.pk).update(ticket_attente=instance.ticket_attente)
+    instance._etat_enregistre = (instance.evenement_id, instance.statut)
+
+
+@receiver(post_delete, sender=Inscription)
+def mettre_a_jour_compteur_apres_suppression(sender, instance, origin=None, **kwargs):
+    """Met à jour les compteurs quand une inscription confirmée ou en attente est supprimée"""
+    if isinstance(origin, Evenement) or getattr(origin, 'model', None) is Evenement:
+        # L'événement lui-même est en cours de suppression
+        return
+    evenement_id, statut = getattr(instance, '_etat_enregistre', (instance.evenement_id, instance.statut))
+    if statut == 'confirmee':
+        _ajuster_compteur(instance, evenement_id, -1)
+    elif statut == 'en_attente' and instance.ticket_attente is not None:
+        _quitter_liste_attente(evenement_id, instance.ticket_attente)
+
+
+@receiver(post_save, sender=Evenement)
+def indexer_evenement_apres_sauvegarde(sender, instance, raw=False, using='default', update_fields=None, **kwargs):
+    """Tient à jour l'index de recherche plein texte"""
+    if raw:
+        return
+    if update_fields is not None and not {'titre', 'description', 'lieu'} & set(update_fields):
+        return
+    indexer_evenement(instance, using=using)
+
+
+@receiver(post_delete, sender=Evenement)
+def desindexer_evenement_apres_suppression(sender, instance, using='default', **kwargs):
+    """Retire l'événement supprimé de l'index de recherche plein texte"""
+    desindexer_evenement(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Evenement)
+@receiver(post_delete, sender=Evenement)
+def invalider_accueil_apres_evenement(sender, instance, raw=False, **kwargs):
+    """Un événement créé, validé, déplacé ou supprimé peut changer les prochains événements"""
+    if not raw:
+        invalider_accueil()
+
+
+@receiver(post_save, sender=Inscription)
+@receiver(post_delete, sender=Inscription)
+def invalider_accueil_apres_inscription(sender, instance, raw=False, origin=None, **kwargs):
+    """Le nombre d'inscrits affiché sur l'accueil a pu changer"""
+    if raw or isinstance(origin, Evenement) or getattr(origin, 'model', None) is Evenement:
+        return
+    invalider_accueil(instance.evenement_id)
+
+
+@receiver(post_save, sender=Evenement)
+def signaler_places_apres_evenement(sender, instance, raw=False, **kwargs):
+    """Capacité ou statut modifié : relève anticipée des places suivies en direct"""
+    if not raw:
+        signaler_places(instance.pk)
+
+
+@receiver(post_save, sender=Inscription)
+@receiver(post_delete, sender=Inscription)
+def signaler_places_apres_inscription(sender, instance, raw=False, origin=None, **kwargs):
+    """Inscription, annulation ou promotion : relève anticipée des places suivies en direct"""
+    if raw or isinstance(origin, Evenement) or getattr(origin, 'model', None) is Evenement:
+        return
+    signaler_places(instance.evenement_id)
+
+
+@receiver(post_save, sender=Utilisateur)
+def invalider_facettes_apres_sauvegarde(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Inscription ou modification de profil : les effectifs par rôle et département ont pu changer"""
+    if raw or (update_fields is not None and not {'role', 'departement'} & set(update_fields)):
+        return
+    nouveau = (instance.role, instance.departement)
+    # État précédent inconnu (instance construite sans chargement) : invalidé aussi
+    if created or getattr(instance, '_facettes_enregistrees', None) != nouveau:
+        invalider_facettes_utilisateurs()
+    instance._facettes_enregistrees = nouveau
+
+
+@receiver(post_delete, sender=Utilisateur)
+def invalider_facettes_apres_suppression(sender, instance, **kwargs):
+    invalider_facettes_utilisateurs()
+
+
+@receiver(connection_created)
+def enregistrer_fonctions_sql(sender, connection, **kwargs):
+    """Fonction SANS_ACCENTS de la recherche sans FTS5"""
+    enregistrer_sans_accents(connection)
@@ -0,0 +1,238 @@
+"""
+Budget de requêtes SQL par vue.
+
+Un jeu de données de la taille d'une année universitaire (milliers
+d'événements, dizaines de milliers d'inscriptions) est créé une fois. Chaque
+URL de evenements/urls.py est rendue pour chaque rôle : le nombre de
+requêtes doit rester sous le budget de la vue et ne pas changer quand le
+volume de données liées à la page augmente (régression N+1).
+"""
+import random
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from . import urls
+from .calendrier import jeton_calendrier
+from .models import Evenement, Inscription, Utilisateur
+
+NB_UTILISATEURS = 600
+NB_EVENEMENTS = 3000
+INSCRIPTIONS_PAR_EVENEMENT = 10
+
+# Nombre maximal de requêtes par vue, session et utilisateur compris
+BUDGETS = {
+    'accueil': 3,
+    'inscription': 2,
+    'connexion': 2,
+    'deconnexion': 4,
+    'tableau_bord': 7,
+    'profil': 2,
+    'gestion_utilisateurs': 5,
+    'performances': 2,
+    'liste_evenements': 6,
+    'detail_evenement': 4,
+    'creer_evenement': 2,
+    'modifier_evenement': 3,
+    'supprimer_evenement': 3,
+    'valider_evenement': 10,
+    'inscrire_evenement': 11,
+    # Annulation d'une place avec promotion de la tête de liste (plancher) :
+    # session, utilisateur, SAVEPOINT de la vue (le test tourne dans une
+    # transaction), événement et inscription lus sous verrou, UPDATE de
+    # l'inscription, nb_inscrits - 1 (signal), prise de la place libérée,
+    # tête de liste, attente_tete, UPDATE de la promue, email de promotion,
+    # email d'annulation, RELEASE SAVEPOINT
+    'annuler_inscription': 14,
+    # API JSON : une requête, plus la session et l'utilisateur si nécessaire
+    'api_evenements': 1,
+    'api_evenement': 1,
+    'api_mes_inscriptions': 3,
+    # Flux iCalendar : l'agrégat de version, puis les événements (jeton : l'utilisateur)
+    'calendrier_evenements': 2,
+    'calendrier_inscriptions': 3,
+    # Export en flux des participants : l'événement, puis les inscriptions
+    'exporter_participants': 4,
+    # Places disponibles en JSON (sondage sous WSGI) : l'événement
+    'disponibilite_evenement': 3,
+}
+
+# Pages affichées (GET) ; les actions POST sont testées à part
+PAGES = [
+    'accueil', 'inscription', 'connexion', 'tableau_bord', 'profil', 'gestion_utilisateurs', 'performances',
+    'liste_evenements', 'detail_evenement', 'creer_evenement', 'modifier_evenement', 'supprimer_evenement',
+    'api_evenements', 'api_evenement', 'api_mes_inscriptions', 'calendrier_evenements', 'calendrier_inscriptions',
+    'exporter_participants', 'disponibilite_evenement',
+]
+ACTIONS = ['deconnexion', 'valider_evenement', 'inscrire_evenement', 'annuler_inscription']
+
+
+class BudgetRequetesTest(TestCase):
+    """Nombre de requêtes constant et borné pour chaque vue et chaque rôle"""
+
+    @classmethod
+    def setUpTestData(cls):
+        aleatoire = random.Random(2024)
+        maintenant = timezone.now()
+        cls.admin = Utilisateur.objects.create_user(username='admin', password='test123', role='admin')
+        cls.organisateur = Utilisateur.objects.create_user(username='organisateur', password='test123')
+        cls.etudiant = Utilisateur.objects.create_user(username='etudiant', password='test123')
+
+        # Mot de passe inutilisable : pas de hachage coûteux pour le volume
+        cls.utilisateurs = Utilisateur.objects.bulk_create([
+            Utilisateur(
+                username=f'etudiant{i}', first_name=f'Prénom{i}', last_name='Nom',
+                email=f'etudiant{i}@exemple.com', departement=f'Département {i % 12}',
+                date_joined=maintenant - timedelta(hours=i), password='!'
+            )
+            for i in range(NB_UTILISATEURS)
+        ])
+        categories = [code for code, _ in Evenement.CATEGORIE_CHOICES]
+        statuts = ['valide'] * 8 + ['en_attente', 'refuse']
+        evenements = Evenement.objects.bulk_create([
+            Evenement(
+                titre=f'Événement {i}',
+                description='Description de l\'événement',
+                date_debut=maintenant + timedelta(hours=aleatoire.randint(-4000, 4000)),
+                date_fin=maintenant + timedelta(hours=4001),
+                lieu='Amphi A',
+                categorie=aleatoire.choice(categories),
+                capacite_max=100,
+                organisateur=cls.organisateur if i % 20 == 0 else aleatoire.choice(cls.utilisateurs),
+                statut=aleatoire.choice(statuts),
+            )
+            for i in range(NB_EVENEMENTS)
+        ])
+        Inscription.objects.bulk_create([
+            Inscription(evenement=evenement, participant=participant)
+            for evenement in evenements
+            for participant in aleatoire.sample(cls.utilisateurs, INSCRIPTIONS_PAR_EVENEMENT)
+        ], batch_size=2000)
+
+        cls.evenement = cls.creer_evenement('valide')
+        cls.evenement_a_valider = cls.creer_evenement('en_attente')
+        Inscription.objects.bulk_create([
+            Inscription(evenement=cls.evenement, participant=participant)
+            for participant in [cls.etudiant, *cls.utilisateurs[:20]]
+        ])
+        Inscription.objects.bulk_create([
+            Inscription(evenement=evenement, participant=cls.etudiant)
+            for evenement in evenements[:50]
+        ])
+
+    @classmethod
+    def creer_evenement(cls, statut, capacite_max=100):
+        return Evenement.objects.create(
+            titre='Événement suivi',
+            description='Description',
+            date_debut=timezone.now() + timedelta(days=10),
+            date_fin=timezone.now() + timedelta(days=10, hours=2),
+            lieu='Amphi B',
+            categorie='conference',
+            capacite_max=capacite_max,
+            organisateur=cls.organisateur,
+            statut=statut,
+        )
+
+    def grossir(self):
+        """Multiplie les données affichées par les pages : plus d'inscrits, d'événements, d'utilisateurs"""
+        nouveaux = Utilisateur.objects.bulk_create([
+            Utilisateur(username=f'nouveau{i}', departement=f'Nouveau {i}', password='!')
+            for i in range(300)
+        ])
+        Inscription.objects.bulk_create([
+            Inscription(evenement=self.evenement, participant=participant) for participant in nouveaux[:60]
+        ])
+        evenements = Evenement.objects.bulk_create([
+            Evenement(
+                titre=f'Supplémentaire {i}', description='Description',
+                date_debut=timezone.now() + timedelta(days=i % 30 + 1),
+                date_fin=timezone.now() + timedelta(days=40),
+                lieu='Amphi C', categorie='atelier', organisateur=self.organisateur,
+                statut='en_attente' if i % 2 else 'valide',
+            )
+            for i in range(100)
+        ])
+        Inscription.objects.bulk_create([
+            Inscription(evenement=evenement, participant=self.etudiant) for evenement in evenements[::2]
+        ])
+
+    def url(self, nom):
+        if nom in ('detail_evenement', 'modifier_evenement', 'supprimer_evenement',
+                   'inscrire_evenement', 'annuler_inscription', 'api_evenement', 'exporter_participants',
+                   'disponibilite_evenement'):
+            return reverse(nom, args=[self.evenement.pk])
+        if nom == 'valider_evenement':
+            return reverse(nom, args=[self.evenement_a_valider.pk])
+        if nom == 'calendrier_inscriptions':
+            return reverse(nom, args=[jeton_calendrier(self.etudiant)])
+        return reverse(nom)
+
+    def compter(self, utilisateur, nom, methode='get', donnees=None):
+        client = Client()
+        if utilisateur is not None:
+            client.force_login(utilisateur)
+        # Pire cas : fragments en cache vides
+        cache.clear()
+        with CaptureQueriesContext(connection) as requetes:
+            response = getattr(client, methode)(self.url(nom), donnees or {})
+            # Réponses en flux : les requêtes ont lieu pendant la lecture
+            if response.streaming:
+                b''.join(response.streaming_content)
+        # L'API répond 401 aux anonymes au lieu de rediriger vers la connexion
+        if not (utilisateur is None and response.status_code == 401):
+            self.assertLess(response.status_code, 400)
+        return len(requetes)
+
+    def verifier_pages(self, utilisateur):
+        avant = {nom: self.compter(utilisateur, nom) for nom in PAGES}
+        self.grossir()
+        apres = {nom: self.compter(utilisateur, nom) for nom in PAGES}
+        for nom in PAGES:
+            with self.subTest(page=nom):
+                self.assertLessEqual(avant[nom], BUDGETS[nom])
+                self.assertEqual(apres[nom], avant[nom], "Le nombre de requêtes dépend du volume de données")
+
+    def test_toutes_les_urls_ont_un_budget(self):
+        noms = {motif.name for motif in urls.urlpatterns}
+        self.assertEqual(noms, set(BUDGETS))
+        self.assertEqual(noms, set(PAGES) | set(ACTIONS))
+
+    def test_pages_anonyme(self):
+        self.verifier_pages(None)
+
+    def test_pages_etudiant(self):
+        self.verifier_pages(self.etudiant)
+
+    def test_pages_organisateur(self):
+        self.verifier_pages(self.organisateur)
+
+    def test_pages_admin(self):
+        self.verifier_pages(self.admin)
+
+    def test_inscription_et_annulation(self):
+        participant = self.utilisateurs[-1]
+        self.assertLessEqual(self.compter(participant, 'inscrire_evenement', 'post'), BUDGETS['inscrire_evenement'])
+        self.assertLessEqual(self.compter(participant, 'annuler_inscription', 'post'), BUDGETS['annuler_inscription'])
+
+    def test_annulation_avec_promotion(self):
+        """Annuler une place promeut la tête de liste à coût constant, quelle que soit la longueur de la liste"""
+        nb_requetes = []
+        for taille_liste in (5, 100):
+            self.evenement = self.creer_evenement('valide', capacite_max=1)
+            self.evenement.reserver_place(self.etudiant)
+            for participant in self.utilisateurs[:taille_liste]:
+                self.evenement.reserver_place(participant)
+            nb_requetes.append(self.compter(self.etudiant, 'annuler_inscription', 'post'))
+        self.assertEqual(nb_requetes[0], nb_requetes[1])
+        self.assertLessEqual(nb_requetes[0], BUDGETS['annuler_inscription'])
+
+    def test_validation(self):
+        nb_requetes = self.compter(self.admin, 'valider_evenement', 'post', {'action': 'valider'})
+        self.assertLessEqual(nb_requetes, BUDGETS['valider_evenement'])
+
+    def test_deconnexion(self):
+        self.assertLessEqual(self.compter(self.etudiant, 'deconnexion'), BUDGETS['deconnexion'])
@@ -0,0 +1,158 @@
+"""
+Plans d'exécution des requêtes fréquentes.
+
+Chaque page est rendue sur un jeu de données réaliste, puis chaque SELECT
+émis passe par EXPLAIN QUERY PLAN : un parcours complet d'une table
+(« SCAN <table> » sans index) fait échouer le test. Les requêtes des tâches
+de fond (rappels, file d'emails) sont vérifiées de la même façon.
+"""
+import re
+import unittest
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .calendrier import jeton_calendrier
+from .models import EmailSortant, Evenement, Inscription, Utilisateur
+
+# « SCAN table » seul, sans « USING ... INDEX » : toute la table est lue.
+# Les tables virtuelles FTS5, les sous-requêtes matérialisées « (subquery) »
+# et le catalogue sqlite_master ne sont pas concernés.
+PARCOURS_COMPLET = re.compile(r'^SCAN (?!sqlite_master$)[^(\s]\S*$')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN est propre à SQLite")
+class PlansRequetesTest(TestCase):
+    """Aucune requête fréquente ne doit parcourir une table entière"""
+
+    @classmethod
+    def setUpTestData(cls):
+        maintenant = timezone.now()
+        cls.admin = Utilisateur.objects.create_user(username='admin', password='test123', role='admin')
+        cls.etudiant = Utilisateur.objects.create_user(username='etudiant', password='test123')
+        utilisateurs = Utilisateur.objects.bulk_create([
+            Utilisateur(
+                username=f'u{i}', role='admin' if i % 50 == 0 else 'etudiant',
+                departement=f'Département {i % 8}', date_joined=maintenant - timedelta(hours=i)
+            )
+            for i in range(300)
+        ])
+        statuts = ['valide', 'valide', 'valide', 'en_attente', 'refuse']
+        categories = [code for code, _ in Evenement.CATEGORIE_CHOICES]
+        evenements = Evenement.objects.bulk_create([
+            Evenement(
+                titre=f'Événement {i}',
+                description='Description',
+                date_debut=maintenant + timedelta(hours=i - 200),
+                date_fin=maintenant + timedelta(hours=i - 198),
+                lieu='Amphi A',
+                categorie=categories[i % len(categories)],
+                organisateur=cls.admin if i % 10 == 0 else utilisateurs[i],
+                statut=statuts[i % len(statuts)],
+            )
+            for i in range(300)
+        ])
+        Inscription.objects.bulk_create([
+            Inscription(evenement=evenement, participant=participant)
+            for evenement in evenements[::3]
+            for participant in [cls.etudiant, *utilisateurs[:20]]
+        ])
+        cls.evenement = evenements[210]
+        # Statistiques de l'optimiseur, comme après un ANALYZE en production
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def parcours_complets(self, requetes):
+        """Retourne les couples (requête, ligne du plan) qui parcourent une table entière"""
+        resultats = []
+        with connection.cursor() as cursor:
+            for requete in requetes:
+                sql = requete['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                for ligne in cursor.fetchall():
+                    if PARCOURS_COMPLET.match(ligne[3]):
+                        resultats.append((sql, ligne[3]))
+        return resultats
+
+    def verifier_page(self, utilisateur, url, parametres=None):
+        client = Client()
+        client.force_login(utilisateur)
+        cache.clear()
+        with CaptureQueriesContext(connection) as requetes:
+            response = client.get(url, parametres or {})
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.parcours_complets(requetes.captured_queries), [])
+        return response
+
+    def verifier_requete(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            parcours = [ligne[3] for ligne in cursor.fetchall() if PARCOURS_COMPLET.match(ligne[3])]
+        self.assertEqual(parcours, [], sql)
+
+    def test_accueil(self):
+        self.verifier_page(self.etudiant, reverse('accueil'))
+
+    def test_liste_evenements(self):
+        self.verifier_page(self.etudiant, reverse('liste_evenements'))
+
+    def test_liste_evenements_filtree(self):
+        self.verifier_page(self.etudiant, reverse('liste_evenements'), {'categorie': 'atelier'})
+
+    def test_liste_evenements_page_suivante(self):
+        response = self.verifier_page(self.etudiant, reverse('liste_evenements'))
+        lien = response.context['evenements_passes'].lien_suivant
+        self.verifier_page(self.etudiant, reverse('liste_evenements') + lien)
+
+    def test_recherche(self):
+        self.verifier_page(self.etudiant, reverse('liste_evenements'), {'recherche': 'evenement'})
+
+    def test_detail_evenement(self):
+        self.verifier_page(self.etudiant, reverse('detail_evenement', args=[self.evenement.pk]))
+
+    def test_tableau_bord(self):
+        self.verifier_page(self.etudiant, reverse('tableau_bord'))
+        self.verifier_page(self.admin, reverse('tableau_bord'))
+
+    def test_gestion_utilisateurs(self):
+        self.verifier_page(self.admin, reverse('gestion_utilisateurs'))
+        self.verifier_page(self.admin, reverse('gestion_utilisateurs'), {'role': 'etudiant'})
+        self.verifier_page(self.admin, reverse('gestion_utilisateurs'), {'departement': 'Département 3'})
+
+    def test_api(self):
+        self.verifier_page(self.etudiant, reverse('api_evenements'), {'categorie': 'atelier'})
+        self.verifier_page(self.etudiant, reverse('api_evenements'), {'periode': 'passes'})
+        self.verifier_page(self.etudiant, reverse('api_mes_inscriptions'))
+
+    def test_export_participants(self):
+        url = reverse('exporter_participants', args=[self.evenement.pk])
+        self.verifier_page(self.admin, url)
+        self.verifier_page(self.admin, url, {'format': 'xlsx'})
+
+    def test_calendriers(self):
+        self.verifier_page(self.etudiant, reverse('calendrier_evenements'))
+        self.verifier_page(self.etudiant, reverse('calendrier_evenements'), {'categorie': 'atelier'})
+        self.verifier_page(self.etudiant, reverse('calendrier_inscriptions', args=[jeton_calendrier(self.etudiant)]))
+    
+    def test_commande_envoyer_rappels(self):
+        """Les requêtes mêmes de la commande : événements de la fenêtre, puis inscriptions par lots"""
+        with CaptureQueriesContext(connection) as requetes:
+            call_command('envoyer_rappels', lot=5, stdout=StringIO())
+        # Plusieurs lots lus : la requête paginée sur pk est vérifiée aussi
+        self.assertGreater(Inscription.objects.filter(date_rappel__isnull=False).count(), 5)
+        self.assertEqual(self.parcours_complets(requetes.captured_queries), [])
+
+    def test_file_emails(self):
+        self.verifier_requete(EmailSortant.objects.filter(
+            statut='en_attente', prochaine_tentative__lte=timezone.now()
+        ).order_by('prochaine_tentative', 'id'))
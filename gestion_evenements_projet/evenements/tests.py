@@ -1,9 +1,54 @@
 # Create your tests here.
-from django.test import TestCase, Client
-from django.urls import reverse
+import importlib
+import json
+import os
+import smtplib
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from io import BytesIO, StringIO
+from importlib import import_module
+from unittest import mock
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends import locmem
+from django.core.mail.backends.base import BaseEmailBackend
+from django.contrib.auth import authenticate
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.utils import load_backend
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
 from django.utils import timezone
+from django.utils.http import http_date
 from datetime import timedelta
-from .models import Utilisateur, Evenement, Inscription
+from . import caches
+from .caches import cle_accueil, comptes_categories, facettes_utilisateurs
+from .calendrier import jeton_calendrier, plier
+from . import disponibilite
+from .disponibilite import Diffuseur, Releveur, aflux_places, etat_places, identifiant_etat
+from .emails import (
+    MARQUEUR_NOM,
+    construire_email_rappel,
+    envoyer_email_inscription,
+    envoyer_file_attente,
+    envoyer_rappels,
+    mettre_en_file,
+    preparer_rappel,
+)
+from .importation import ResultatImport, inserer
+from .models import Utilisateur, Evenement, Inscription, EmailSortant
+from .pagination import paginer
+from . import urls
+from .profilage import RequetesLentes, requetes_lentes
+from .recherche import fts_disponible, rechercher_evenements
+from .routeurs import COOKIE_PRIMAIRE, RouteurReplique, lecture_primaire
 
 
 class UtilisateurModelTest(TestCase):
@@ -216,4 +261,2020 @@ class IntegrationTest(TestCase):
         
         # 4. Vérifier que l'événement est créé
         event_exists = Evenement.objects.filter(titre='Nouvel événement').exists()
-        self.assertTrue(event_exists)
\ No newline at end of file
+        self.assertTrue(event_exists)
+
+class CompteurInscritsTest(TestCase):
+    """Tests du compteur nb_inscrits stocké sur Evenement"""
+    
+    def setUp(self):
+        self.organisateur = Utilisateur.objects.create_user(username='organisateur', password='test123')
+        self.evenement = Evenement.objects.create(
+            titre='Compteur',
+            description='Test',
+            date_debut=timezone.now() + timedelta(days=7),
+            date_fin=timezone.now() + timedelta(days=7, hours=2),
+            lieu='Test',
+            categorie='conference',
+            capacite_max=3,
+            organisateur=self.organisateur,
+            statut='valide'
+        )
+        self.participants = [
+            Utilisateur.objects.create_user(username=f'p{i}', password='test123')
+            for i in range(3)
+        ]
+    
+    def compteur(self):
+        return Evenement.objects.values_list('nb_inscrits', flat=True).get(pk=self.evenement.pk)
+    
+    def test_changements_de_statut(self):
+        """Création, annulation, réactivation et suppression"""
+        inscription = Inscription.objects.create(evenement=self.evenement, participant=self.participants[0])
+        self.assertEqual(self.compteur(), 1)
+        
+        inscription = Inscription.objects.get(pk=inscription.pk)
+        inscription.statut = 'annulee'
+        inscription.save()
+        self.assertEqual(self.compteur(), 0)
+        
+        inscription.statut = 'confirmee'
+        inscription.save()
+        inscription.commentaire = 'Sans changement de statut'
+        inscription.save()
+        self.assertEqual(self.compteur(), 1)
+        
+        inscription.delete()
+        self.assertEqual(self.compteur(), 0)
+    
+    def test_update_et_bulk_create(self):
+        """Les chemins queryset.update() et bulk_create() recalculent le compteur"""
+        Inscription.objects.bulk_create([
+            Inscription(evenement=self.evenement, participant=p) for p in self.participants
+        ])
+        self.assertEqual(self.compteur(), 3)
+        
+        Inscription.objects.filter(participant=self.participants[0]).update(statut='annulee')
+        self.assertEqual(self.compteur(), 2)
+    
+    def test_save_evenement_ne_reecrit_pas_le_compteur(self):
+        """Une instance périmée ne doit pas écraser le compteur"""
+        perime = Evenement.objects.get(pk=self.evenement.pk)
+        Inscription.objects.create(evenement=self.evenement, participant=self.participants[0])
+        perime.statut = 'annule'
+        perime.save()
+        self.assertEqual(self.compteur(), 1)
+    
+    def test_commande_recalculer_inscrits(self):
+        """La commande corrige un compteur désynchronisé"""
+        Inscription.objects.create(evenement=self.evenement, participant=self.participants[0])
+        Evenement.objects.filter(pk=self.evenement.pk).update(nb_inscrits=42)
+        
+        call_command('recalculer_inscrits', stdout=StringIO())
+        self.assertEqual(self.compteur(), 1)
+
+
+class ReservationConcurrenteTest(TransactionTestCase):
+    """Test de charge : inscriptions concurrentes sur un petit événement"""
+    
+    NB_PARTICIPANTS = 1000
+    NB_THREADS = 8
+    CAPACITE = 10
+    
+    def setUp(self):
+        self.organisateur = Utilisateur.objects.create_user(username='organisateur', password='test123')
+        self.evenement = Evenement.objects.create(
+            titre='Conférence populaire',
+            description='Test',
+            date_debut=timezone.now() + timedelta(days=7),
+            date_fin=timezone.now() + timedelta(days=7, hours=2),
+            lieu='Amphi A',
+            categorie='conference',
+            capacite_max=self.CAPACITE,
+            organisateur=self.organisateur,
+            statut='valide'
+        )
+        Utilisateur.objects.bulk_create([
+            Utilisateur(username=f'etudiant{i}', password='!') for i in range(self.NB_PARTICIPANTS)
+        ])
+        self.participant_ids = list(
+            Utilisateur.objects.filter(username__startswith='etudiant').values_list('pk', flat=True)
+        )
+    
+    def reserver(self, participant_id):
+        """Réserve une place depuis un thread, avec sa propre connexion"""
+        try:
+            for tentative in range(100):
+                try:
+                    evenement = Evenement.objects.get(pk=self.evenement.pk)
+                    participant = Utilisateur.objects.get(pk=participant_id)
+                    return evenement.reserver_place(participant)[1]
+                except OperationalError:
+                    # SQLite : table verrouillée par un autre thread, on réessaie
+                    time.sleep(0.001 * (tentative + 1))
+            return 'erreur'
+        finally:
+            connection.close()
+    
+    def test_capacite_jamais_depassee(self):
+        """Le nombre de confirmés ne dépasse jamais la capacité"""
+        # Chaque participant tente deux fois (double clic / réactivation)
+        demandes = self.participant_ids * 2
+        with ThreadPoolExecutor(max_workers=self.NB_THREADS) as pool:
+            resultats = list(pool.map(self.reserver, demandes))
+        
+        # Les threads affamés par le verrou SQLite ('erreur') ne faussent pas le décompte
+        confirmes = Inscription.objects.filter(evenement=self.evenement, statut='confirmee').count()
+        self.evenement.refresh_from_db()
+        self.assertEqual(resultats.count('creee'), self.CAPACITE)
+        self.assertEqual(confirmes, self.CAPACITE)
+        self.assertEqual(self.evenement.nb_inscrits, self.CAPACITE)
+    
+    def test_reactivation_concurrente(self):
+        """Les réactivations d'inscriptions annulées respectent aussi la capacité"""
+        Inscription.objects.bulk_create([
+            Inscription(evenement=self.evenement, participant_id=pk, statut='annulee')
+            for pk in self.participant_ids[:200]
+        ])
+        with ThreadPoolExecutor(max_workers=self.NB_THREADS) as pool:
+            resultats = list(pool.map(self.reserver, self.participant_ids[:200]))
+        
+        self.evenement.refresh_from_db()
+        self.assertEqual(resultats.count('reactivee'), self.CAPACITE)
+        self.assertEqual(self.evenement.nb_inscrits, self.CAPACITE)
+        self.assertEqual(
+            Inscription.objects.filter(evenement=self.evenement, statut='confirmee').count(),
+            self.CAPACITE
+        )
+
+
+class ListeAttenteTest(TestCase):
+    """Tests de la liste d'attente et de la promotion automatique"""
+    
+    def setUp(self):
+        self.organisateur = Utilisateur.objects.create_user(username='organisateur', password='test123')
+        self.evenement = Evenement.objects.create(
+            titre='Atelier complet',
+            description='Test',
+            date_debut=timezone.now() + timedelta(days=7),
+            date_fin=timezone.now() + timedelta(days=7, hours=2),
+            lieu='Salle B',
+            categorie='atelier',
+            capacite_max=1,
+            organisateur=self.organisateur,
+            statut='valide'
+        )
+        self.participants = [
+            Utilisateur.objects.create_user(username=f'p{i}', password='test123', email=f'p{i}@test.com')
+            for i in range(4)
+        ]
+    
+    def inscrire_tous(self):
+        return [self.evenement.reserver_place(p) for p in self.participants]
+    
+    def test_positions_attente(self):
+        """Un événement complet accepte des inscriptions en attente, dans l'ordre"""
+        resultats = self.inscrire_tous()
+        self.assertEqual([r for _, r in resultats], ['creee', 'en_attente', 'en_attente', 'en_attente'])
+        self.assertEqual([i.position_attente() for i, _ in resultats[1:]], [1, 2, 3])
+        
+        _, resultat = self.evenement.reserver_place(self.participants[2])
+        self.assertEqual(resultat, 'deja_en_attente')
+    
+    def test_quitter_liste_attente(self):
+        """Quitter la liste fait avancer les personnes suivantes"""
+        resultats = self.inscrire_tous()
+        resultats[2][0].annuler()
+        
+        positions = [
+            Inscription.objects.select_related('evenement').get(pk=i.pk).position_attente()
+            for i, _ in (resultats[1], resultats[3])
+        ]
+        self.assertEqual(positions, [1, 2])
+        self.assertEqual(Evenement.objects.get(pk=self.evenement.pk).nb_en_attente, 2)
+    
+    def test_promotion_a_l_annulation(self):
+        """Une annulation promeut la tête de liste et la notifie par email"""
+        self.inscrire_tous()
+        self.client.login(username='p0', password='test123')
+        self.client.post(reverse('annuler_inscription', args=[self.evenement.pk]))
+        
+        promue = Inscription.objects.get(evenement=self.evenement, participant=self.participants[1])
+        self.assertEqual(promue.statut, 'confirmee')
+        self.assertIsNone(promue.ticket_attente)
+        evenement = Evenement.objects.get(pk=self.evenement.pk)
+        self.assertEqual((evenement.nb_inscrits, evenement.nb_en_attente), (1, 2))
+        self.assertEqual(
+            Inscription.objects.select_related('evenement').get(participant=self.participants[3]).position_attente(),
+            2
+        )
+        envoyer_file_attente()
+        self.assertIn('p1@test.com', [m.to[0] for m in mail.outbox])
+    
+    def test_augmentation_capacite(self):
+        """Augmenter la capacité promeut autant de personnes que de places ajoutées"""
+        self.inscrire_tous()
+        Evenement.objects.filter(pk=self.evenement.pk).update(capacite_max=3)
+        self.evenement.refresh_from_db()
+        
+        promues = self.evenement.promouvoir_liste_attente()
+        self.assertEqual([i.participant for i in promues], self.participants[1:3])
+        self.assertEqual((self.evenement.nb_inscrits, self.evenement.nb_en_attente), (3, 1))
+    
+    def test_annulation_apres_augmentation_sans_promotion(self):
+        """Une annulation attribue toutes les places libres, y compris celles ajoutées sans promotion"""
+        self.inscrire_tous()
+        Evenement.objects.filter(pk=self.evenement.pk).update(capacite_max=3)
+        self.client.login(username='p0', password='test123')
+        self.client.post(reverse('annuler_inscription', args=[self.evenement.pk]))
+        
+        confirmees = Inscription.objects.filter(evenement=self.evenement, statut='confirmee')
+        self.assertEqual({i.participant for i in confirmees}, set(self.participants[1:]))
+        evenement = Evenement.objects.get(pk=self.evenement.pk)
+        self.assertEqual((evenement.nb_inscrits, evenement.nb_en_attente), (3, 0))
+    
+    def verifier_liste_apres_sortie(self, sortie):
+        """sortie a quitté la liste hors de annuler() : elle n'est ni promue ni comptée"""
+        sortie.refresh_from_db()
+        self.assertIsNone(sortie.ticket_attente)
+        evenement = Evenement.objects.get(pk=self.evenement.pk)
+        self.assertEqual((evenement.nb_inscrits, evenement.nb_en_attente), (1, 2))
+        suivants = Inscription.objects.select_related('evenement').filter(
+            participant__in=self.participants[2:]
+        ).order_by('ticket_attente')
+        self.assertEqual([i.position_attente() for i in suivants], [1, 2])
+        
+        Inscription.objects.get(participant=self.participants[0]).annuler()
+        promue = Inscription.objects.get(evenement=self.evenement, statut='confirmee')
+        self.assertEqual(promue.participant, self.participants[2])
+        
+        nouveau = Utilisateur.objects.create_user(username='p4', password='test123')
+        inscription, resultat = self.evenement.reserver_place(nouveau)
+        self.assertEqual(resultat, 'en_attente')
+        self.assertEqual(inscription.position_attente(), 2)
+        tickets = list(Inscription.objects.filter(statut='en_attente').values_list('ticket_attente', flat=True))
+        self.assertEqual(len(set(tickets)), len(tickets))
+    
+    def test_sortie_de_liste_dans_l_admin(self):
+        """Un statut modifié dans l'admin rend le ticket et fait avancer la liste"""
+        resultats = self.inscrire_tous()
+        Utilisateur.objects.create_superuser(username='admin', password='test123')
+        self.client.login(username='admin', password='test123')
+        sortie = resultats[1][0]
+        response = self.client.post(reverse('admin:evenements_inscription_change', args=[sortie.pk]), {
+            'evenement': self.evenement.pk,
+            'participant': sortie.participant_id,
+            'statut': 'annulee',
+            'commentaire': '',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.verifier_liste_apres_sortie(sortie)
+    
+    def test_sortie_de_liste_par_update(self):
+        """Un statut modifié par queryset.update() rend le ticket et renumérote la liste"""
+        resultats = self.inscrire_tous()
+        sortie = resultats[1][0]
+        Inscription.objects.filter(pk=sortie.pk).update(statut='annulee')
+        self.verifier_liste_apres_sortie(sortie)
+    
+    def test_detail_affiche_position(self):
+        """La page de détail affiche la position en liste d'attente"""
+        self.inscrire_tous()
+        self.client.login(username='p2', password='test123')
+        response = self.client.get(reverse('detail_evenement', args=[self.evenement.pk]))
+        self.assertEqual(response.context['position_attente'], 2)
+        self.assertContains(response, "Quitter la liste d'attente")
+
+
+
+class BackendEnPanne(BaseEmailBackend):
+    """Backend email de test dont le relais refuse chaque message"""
+    
+    def send_messages(self, email_messages):
+        raise smtplib.SMTPDataError(554, 'Message refusé par le relais')
+
+
+class BackendDeconnexion(locmem.EmailBackend):
+    """Backend email de test dont la connexion est coupée après `envois` messages"""
+    envois = 0
+    
+    def send_messages(self, email_messages):
+        if not BackendDeconnexion.envois:
+            raise smtplib.SMTPServerDisconnected('Connexion fermée par le relais')
+        BackendDeconnexion.envois -= 1
+        return super().send_messages(email_messages)
+
+
+class BackendConnexions(locmem.EmailBackend):
+    """
+    Backend email de test qui, comme le backend SMTP, ouvre une connexion pour
+    chaque envoi si elle n'a pas été ouverte avant, et compte les ouvertures
+    """
+    ouvertures = 0
+    verrou = threading.Lock()
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ouverte = False
+    
+    def open(self):
+        if self.ouverte:
+            return False
+        with BackendConnexions.verrou:
+            BackendConnexions.ouvertures += 1
+        self.ouverte = True
+        return True
+    
+    def close(self):
+        self.ouverte = False
+    
+    def send_messages(self, email_messages):
+        nouvelle = self.open()
+        try:
+            return super().send_messages(email_messages)
+        finally:
+            if nouvelle:
+                self.close()
+
+
+class BackendRelaisIntermittent(locmem.EmailBackend):
+    """Backend email de test dont les `pannes` premières connexions échouent"""
+    pannes = 0
+    
+    def open(self):
+        if BackendRelaisIntermittent.pannes:
+            BackendRelaisIntermittent.pannes -= 1
+            raise ConnectionRefusedError('Relais SMTP indisponible')
+        return super().open()
+
+
+class FileEnvoiEmailsTest(TestCase):
+    """Tests de la file d'envoi persistante des emails"""
+    
+    def setUp(self):
+        self.organisateur = Utilisateur.objects.create_user(
+            username='organisateur', password='test123', email='orga@test.com'
+        )
+        self.admin = Utilisateur.objects.create_user(username='admin', password='test123', role='admin')
+        self.evenement = Evenement.objects.create(
+            titre='Soutenance',
+            description='Test',
+            date_debut=timezone.now() + timedelta(days=7),
+            date_fin=timezone.now() + timedelta(days=7, hours=2),
+            lieu='Salle C',
+            categorie='soutenance',
+            organisateur=self.organisateur
+        )
+    
+    def test_validation_met_en_file(self):
+        """La validation enregistre l'email sans l'envoyer pendant la requête"""
+        self.client.login(username='admin', password='test123')
+        self.client.post(reverse('valider_evenement', args=[self.evenement.pk]), {'action': 'valider'})
+        
+        self.assertEqual(len(mail.outbox), 0)
+        email = EmailSortant.objects.get()
+        self.assertEqual((email.destinataire, email.statut), ('orga@test.com', 'en_attente'))
+        
+        call_command('envoyer_emails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertEqual(EmailSortant.objects.get().statut, 'envoye')
+    
+    def test_envoi_par_lots(self):
+        """Les lots successifs vident la file"""
+        for i in range(5):
+            mettre_en_file(f'Sujet {i}', 'Texte', '', f'dest{i}@test.com')
+        
+        self.assertEqual(envoyer_file_attente(taille_lot=2), (2, 0))
+        call_command('envoyer_emails', lot=2, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(EmailSortant.objects.exclude(statut='envoye').exists())
+    
+    @override_settings(EMAIL_BACKEND='evenements.tests.BackendEnPanne')
+    def test_nouvel_essai_puis_echec(self):
+        """Un échec reprogramme l'email avec délai croissant, puis le passe en échec"""
+        email = mettre_en_file('Sujet', 'Texte', '', 'dest@test.com')
+        
+        self.assertEqual(envoyer_file_attente(max_tentatives=3, delai_base=60), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.statut, email.tentatives), ('en_attente', 1))
+        self.assertGreater(email.prochaine_tentative, timezone.now() + timedelta(seconds=50))
+        self.assertIn('refusé', email.derniere_erreur)
+        
+        for _ in range(2):
+            EmailSortant.objects.update(prochaine_tentative=timezone.now())
+            envoyer_file_attente(max_tentatives=3)
+        email.refresh_from_db()
+        self.assertEqual((email.statut, email.tentatives), ('echec', 3))
+    
+    @override_settings(EMAIL_BACKEND='evenements.tests.BackendDeconnexion')
+    def test_connexion_perdue_en_cours_de_lot(self):
+        """Une déconnexion arrête le lot et remet les messages restants en file sans compter d'essai"""
+        for i in range(3):
+            mettre_en_file(f'Sujet {i}', 'Texte', '', f'dest{i}@test.com')
+        BackendDeconnexion.envois = 1
+        with self.assertRaises(smtplib.SMTPServerDisconnected):
+            envoyer_file_attente(delai_base=0)
+        
+        self.assertEqual([m.subject for m in mail.outbox], ['Sujet 0'])
+        restants = EmailSortant.objects.exclude(statut='envoye')
+        self.assertEqual(sorted(restants.values_list('statut', 'tentatives')), [('en_attente', 0)] * 2)
+    
+    def test_plus_anciens_envoyes_en_premier(self):
+        """Le lot part dans l'ordre de prochaine_tentative, pas du plus récent au plus ancien"""
+        for i in range(3):
+            mettre_en_file(f'Sujet {i}', 'Texte', '', f'dest{i}@test.com')
+        # Un nouvel essai dû depuis plus longtemps passe avant les autres
+        EmailSortant.objects.filter(sujet='Sujet 2').update(prochaine_tentative=timezone.now() - timedelta(hours=1))
+        
+        self.assertEqual(envoyer_file_attente(), (3, 0))
+        self.assertEqual([m.subject for m in mail.outbox], ['Sujet 2', 'Sujet 0', 'Sujet 1'])
+    
+    @override_settings(EMAIL_BACKEND='evenements.tests.BackendRelaisIntermittent')
+    def test_boucle_survit_a_une_panne_du_relais(self):
+        """En mode --boucle, une panne du relais SMTP n'arrête pas le worker"""
+        mettre_en_file('Sujet', 'Texte', '', 'dest@test.com')
+        BackendRelaisIntermittent.pannes = 1
+        erreurs = StringIO()
+        # Deuxième pause (file vide) : arrêt du worker comme par Ctrl+C
+        with mock.patch('time.sleep', side_effect=[None, KeyboardInterrupt]) as pause:
+            call_command('envoyer_emails', boucle=True, delai_base=0, stdout=StringIO(), stderr=erreurs)
+        
+        self.assertIn('Relais SMTP indisponible', erreurs.getvalue())
+        self.assertEqual(pause.call_count, 2)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(EmailSortant.objects.get().statut, 'envoye')
+    
+    @override_settings(EMAIL_BACKEND='evenements.tests.BackendRelaisIntermittent')
+    def test_panne_du_relais_sans_boucle(self):
+        mettre_en_file('Sujet', 'Texte', '', 'dest@test.com')
+        BackendRelaisIntermittent.pannes = 1
+        with self.assertRaises(ConnectionRefusedError):
+            call_command('envoyer_emails', stdout=StringIO())
+        self.assertEqual(EmailSortant.objects.get().statut, 'en_attente')
+
+
+class RappelsTest(TestCase):
+    """Tests de l'envoi des rappels 24h avant les événements"""
+    
+    def setUp(self):
+        self.organisateur = Utilisateur.objects.create_user(username='organisateur', password='test123')
+        self.participants = [
+            Utilisateur(username=f'p{i}', email=f'p{i}@test.com', password='!') for i in range(12)
+        ]
+        Utilisateur.objects.bulk_create(self.participants)
+        
+        def creer(titre, dans, statut='valide'):
+            return Evenement.objects.create(
+                titre=titre,
+                description='Test',
+                date_debut=timezone.now() + dans,
+                date_fin=timezone.now() + dans + timedelta(hours=2),
+                lieu='Amphi A',
+                categorie='conference',
+                organisateur=self.organisateur,
+                statut=statut
+            )
+        self.demain = creer('Demain', timedelta(hours=20))
+        self.plus_tard = creer('Plus tard', timedelta(days=3))
+        self.non_valide = creer('Non validé', timedelta(hours=5), statut='en_attente')
+        
+        participants = Utilisateur.objects.filter(username__startswith='p')
+        for evenement in (self.demain, self.plus_tard, self.non_valide):
+            Inscription.objects.bulk_create([
+                Inscription(evenement=evenement, participant=p) for p in participants
+            ])
+        Inscription.objects.filter(evenement=self.demain, participant__username='p0').update(statut='annulee')
+    
+    def test_rappels_sans_double_envoi(self):
+        """Seuls les confirmés des événements validés des 24h reçoivent un rappel, une seule fois"""
+        sortie = StringIO()
+        call_command('envoyer_rappels', connexions=3, lot=5, stdout=sortie)
+        
+        self.assertEqual(len(mail.outbox), 11)
+        self.assertTrue(all('Demain' in m.subject for m in mail.outbox))
+        self.assertIn('messages/s', sortie.getvalue())
+        self.assertFalse(
+            Inscription.objects.filter(evenement=self.demain, statut='confirmee', date_rappel__isnull=True).exists()
+        )
+        
+        call_command('envoyer_rappels', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 11)
+    
+    @override_settings(EMAIL_BACKEND='evenements.tests.BackendConnexions')
+    def test_une_connexion_par_thread(self):
+        """Chaque thread du pool ouvre sa connexion une fois pour tous ses rappels"""
+        BackendConnexions.ouvertures = 0
+        evenements = Evenement.objects.filter(pk=self.demain.pk)
+        self.assertEqual(envoyer_rappels(evenements, nb_connexions=2, taille_lot=5), (11, 0))
+        self.assertEqual(len(mail.outbox), 11)
+        self.assertLessEqual(BackendConnexions.ouvertures, 2)
+    
+    @override_settings(EMAIL_BACKEND='evenements.tests.BackendEnPanne')
+    def test_echec_permet_un_nouvel_essai(self):
+        """Un rappel non envoyé n'est pas marqué"""
+        self.assertEqual(envoyer_rappels(Evenement.objects.filter(pk=self.demain.pk)), (0, 11))
+        self.assertFalse(Inscription.objects.filter(date_rappel__isnull=False).exists())
+
+
+class GabaritsEmailsTest(TestCase):
+    """Tests du rendu des emails par templates"""
+    
+    def setUp(self):
+        self.organisateur = Utilisateur.objects.create_user(
+            username='organisateur', password='test123', first_name='Orga', last_name='Nisateur'
+        )
+        self.participant = Utilisateur.objects.create_user(
+            username='participant', password='test123', first_name='<b>Jean</b>', last_name='Test',
+            email='jean@test.com'
+        )
+        self.evenement = Evenement.objects.create(
+            titre='<script>alert(1)</script> Conférence',
+            description='Ligne 1\nLigne 2 & fin',
+            date_debut=timezone.now() + timedelta(hours=20),
+            date_fin=timezone.now() + timedelta(hours=22),
+            lieu='Amphi A',
+            categorie='conference',
+            organisateur=self.organisateur,
+            statut='valide'
+        )
+        self.inscription = Inscription.objects.create(evenement=self.evenement, participant=self.participant)
+    
+    def test_champs_utilisateur_echappes(self):
+        """Le titre et la description sont échappés en HTML, pas dans le texte"""
+        email = envoyer_email_inscription(self.inscription)
+        self.assertIn('&lt;script&gt;', email.message_html)
+        self.assertNotIn('<script>', email.message_html)
+        self.assertIn('Ligne 1<br>Ligne 2 &amp; fin', email.message_html)
+        self.assertIn('<script>alert(1)</script> Conférence', email.message_texte)
+    
+    def test_rappel_pre_rendu_par_evenement(self):
+        """Le rappel est rendu une fois par événement et personnalisé par participant"""
+        rappel = preparer_rappel(self.evenement)
+        email = construire_email_rappel(self.inscription, rappel)
+        html = email.alternatives[0][0]
+        
+        self.assertIn('&lt;b&gt;Jean&lt;/b&gt; Test', html)
+        self.assertIn('Bonjour <b>Jean</b> Test,', email.body)
+        self.assertIn('Orga Nisateur', email.body)
+        self.assertNotIn(MARQUEUR_NOM, html + email.body)
+
+
+class RechercheTest(TestCase):
+    """Tests de la recherche plein texte des événements"""
+    
+    def setUp(self):
+        self.organisateur = Utilisateur.objects.create_user(username='organisateur', password='test123')
+        self.client = Client()
+        self.client.login(username='organisateur', password='test123')
+        self.dans_titre = self.creer_evenement('Conférence sur le climat', 'Présentation annuelle')
+        self.dans_description = self.creer_evenement('Rencontre étudiante', 'Suivie d\'une conférence')
+        self.hors_sujet = self.creer_evenement('Tournoi de football', 'Match amical')
+    
+    def creer_evenement(self, titre, description, lieu='Amphi A'):
+        return Evenement.objects.create(
+            titre=titre,
+            description=description,
+            date_debut=timezone.now() + timedelta(days=5),
+            date_fin=timezone.now() + timedelta(days=5, hours=2),
+            lieu=lieu,
+            categorie='conference',
+            organisateur=self.organisateur,
+            statut='valide'
+        )
+    
+    def rechercher(self, texte):
+        return list(rechercher_evenements(Evenement.objects.all(), texte).order_by('-pertinence', 'pk'))
+    
+    def test_index_fts_disponible(self):
+        """La migration crée la table FTS5 sur SQLite"""
+        if connection.vendor == 'sqlite':
+            self.assertTrue(fts_disponible())
+    
+    def test_recherche_sans_accents(self):
+        """« conference » trouve « Conférence »"""
+        resultats = self.rechercher('conference')
+        self.assertIn(self.dans_titre, resultats)
+        self.assertIn(self.dans_description, resultats)
+        self.assertNotIn(self.hors_sujet, resultats)
+    
+    def test_recherche_sans_fts_ignore_les_accents(self):
+        """Sans FTS5, « evenement » trouve aussi « événement » et chaque mot est exigé"""
+        evenement = self.creer_evenement('Présentation de l\'Événement', 'Salle des fêtes', lieu='Théâtre')
+        for fts in (True, False):
+            with self.subTest(fts=fts), mock.patch('evenements.recherche.fts_disponible', return_value=fts):
+                self.assertEqual(self.rechercher('evenement'), [evenement])
+                self.assertEqual(self.rechercher('EVENEMENT theatre'), [evenement])
+                self.assertEqual(self.rechercher('evenement football'), [])
+                self.assertEqual(self.rechercher('!!'), [])
+    
+    def test_titre_plus_pertinent_que_description(self):
+        """Un mot du titre classe l'événement avant un mot de la description"""
+        self.assertEqual(self.rechercher('conférence')[:2], [self.dans_titre, self.dans_description])
+    
+    def test_index_suit_modifications(self):
+        """L'index est mis à jour à la modification et à la suppression"""
+        self.hors_sujet.titre = 'Séminaire de robotique'
+        self.hors_sujet.save()
+        self.assertEqual(self.rechercher('seminaire'), [self.hors_sujet])
+        self.assertEqual(self.rechercher('football'), [])
+        
+        self.hors_sujet.delete()
+        self.assertEqual(self.rechercher('seminaire'), [])
+    
+    def test_syntaxe_fts_neutralisee(self):
+        """Les caractères spéciaux de la saisie ne provoquent pas d'erreur"""
+        self.assertEqual(self.rechercher('"climat" -* ('), [self.dans_titre])
+        self.assertEqual(self.rechercher('!!!'), [])
+    
+    def test_vue_liste_tri_par_pertinence(self):
+        """La liste des événements est triée par pertinence lors d'une recherche"""
+        response = self.client.get(reverse('liste_evenements'), {'recherche': 'conference'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['evenements_a_venir']), [self.dans_titre, self.dans_description])
+    
+    def test_commande_reindexer(self):
+        """La commande reconstruit l'index après une modification hors ORM"""
+        Evenement.objects.filter(pk=self.hors_sujet.pk).update(titre='Atelier photo')
+        self.assertEqual(self.rechercher('photo'), [])
+        
+        sortie = StringIO()
+        call_command('reindexer_recherche', stdout=sortie)
+        self.assertEqual(self.rechercher('photo'), [self.hors_sujet])
+
+
+class PaginationTest(TestCase):
+    """Tests de la pagination par curseur des listes"""
+    
+    def setUp(self):
+        self.admin = Utilisateur.objects.create_user(username='admin', password='test123', role='admin')
+        self.client = Client()
+        self.client.login(username='admin', password='test123')
+        # Beaucoup d'événements à la même date pour vérifier le départage par id
+        date_commune = timezone.now() + timedelta(days=3)
+        Evenement.objects.bulk_create([
+            Evenement(
+                titre=f'Atelier {i}',
+                description='Atelier pratique',
+                date_debut=date_commune if i % 2 else date_commune + timedelta(hours=i),
+                date_fin=date_commune + timedelta(days=1),
+                lieu='Salle 1',
+                categorie='atelier' if i % 3 else 'conference',
+                organisateur=self.admin,
+                statut='valide'
+            )
+            for i in range(40)
+        ])
+    
+    def parcourir(self, url, parametres, cle_contexte):
+        """Suit les liens « suivants » et retourne les pages rencontrées"""
+        pages = []
+        response = self.client.get(url, parametres)
+        while True:
+            page = response.context[cle_contexte]
+            pages.append(page)
+            if not page.lien_suivant:
+                return pages
+            response = self.client.get(url + page.lien_suivant)
+    
+    def test_parcours_complet_sans_doublon(self):
+        """Toutes les pages réunies donnent la liste triée, sans doublon ni trou"""
+        pages = self.parcourir(reverse('liste_evenements'), {}, 'evenements_a_venir')
+        
+        attendus = list(Evenement.objects.order_by('date_debut', 'id'))
+        self.assertEqual([e for page in pages for e in page], attendus)
+        self.assertEqual(len(pages), 4)
+        self.assertIsNone(pages[0].lien_precedent)
+    
+    def test_filtres_conserves(self):
+        """Le filtre de catégorie reste appliqué sur les pages suivantes"""
+        pages = self.parcourir(reverse('liste_evenements'), {'categorie': 'atelier'}, 'evenements_a_venir')
+        
+        self.assertIn('categorie=atelier', pages[0].lien_suivant)
+        evenements = [e for page in pages for e in page]
+        self.assertEqual(len(evenements), Evenement.objects.filter(categorie='atelier').count())
+        self.assertTrue(all(e.categorie == 'atelier' for e in evenements))
+    
+    def test_page_precedente(self):
+        """Le lien « précédents » ramène exactement à la page d'avant"""
+        pages = self.parcourir(reverse('liste_evenements'), {}, 'evenements_a_venir')
+        
+        response = self.client.get(reverse('liste_evenements') + pages[2].lien_precedent)
+        self.assertEqual(list(response.context['evenements_a_venir']), list(pages[1]))
+    
+    def test_pagination_par_pertinence(self):
+        """Avec une recherche, la clé de pagination inclut la pertinence"""
+        Evenement.objects.filter(titre__in=['Atelier 5', 'Atelier 12']).update(titre='Atelier atelier')
+        call_command('reindexer_recherche', stdout=StringIO())
+        
+        pages = self.parcourir(reverse('liste_evenements'), {'recherche': 'atelier'}, 'evenements_a_venir')
+        evenements = [e for page in pages for e in page]
+        self.assertEqual(len(set(evenements)), 40)
+        self.assertEqual({e.titre for e in evenements[:2]}, {'Atelier atelier'})
+    
+    def test_curseur_invalide(self):
+        """Un curseur illisible affiche la première page"""
+        response = self.client.get(reverse('liste_evenements'), {'a_venir': 'pas-un-curseur'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['evenements_a_venir'].lien_precedent)
+    
+    def test_annuaire_utilisateurs(self):
+        """L'annuaire est paginé sur (date_joined, id) avec le filtre de rôle"""
+        inscription = timezone.now() - timedelta(days=1)
+        Utilisateur.objects.bulk_create([
+            Utilisateur(username=f'etudiant{i}', role='etudiant', date_joined=inscription)
+            for i in range(60)
+        ])
+        pages = self.parcourir(reverse('gestion_utilisateurs'), {'role': 'etudiant'}, 'utilisateurs')
+        
+        utilisateurs = [u for page in pages for u in page]
+        self.assertEqual(utilisateurs, list(Utilisateur.objects.filter(role='etudiant').order_by('-date_joined', '-id')))
+        self.assertEqual(len(pages), 3)
+    
+    def test_page_profonde_sans_offset(self):
+        """Une page profonde est filtrée par la clé, sans OFFSET ni COUNT"""
+        premiere = paginer(Evenement.objects.all(), ('date_debut', 'id'), taille=10)
+        with self.assertNumQueries(1) as requetes:
+            paginer(Evenement.objects.all(), ('date_debut', 'id'), premiere.curseur_suivant, taille=10)
+        sql = requetes.captured_queries[0]['sql']
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT', sql)
+
+
+class GenererDonneesTest(TestCase):
+    """Tests de la commande de génération de données de charge"""
+    
+    def generer(self, prefixe, graine=7):
+        call_command(
+            'generer_donnees', utilisateurs=120, evenements=60, graine=graine, prefixe=prefixe,
+            stdout=StringIO()
+        )
+        return Evenement.objects.filter(organisateur__username__startswith=f'{prefixe}_').order_by('pk')
+    
+    def test_volumes_et_compteurs(self):
+        """Les volumes demandés sont créés et les compteurs sont cohérents"""
+        evenements = self.generer('a')
+        
+        self.assertEqual(Utilisateur.objects.filter(username__startswith='a_').count(), 120)
+        self.assertEqual(evenements.count(), 60)
+        self.assertGreater(Inscription.objects.count(), 0)
+        
+        sortie = StringIO()
+        call_command('recalculer_inscrits', dry_run=True, stdout=sortie)
+        self.assertIn('Tous les compteurs sont à jour', sortie.getvalue())
+        for evenement in evenements.filter(nb_en_attente__gt=0):
+            self.assertEqual(evenement.nb_inscrits, evenement.capacite_max)
+    
+    def test_toutes_les_valeurs_de_choix(self):
+        """Toutes les catégories et tous les statuts sont représentés"""
+        evenements = self.generer('a')
+        
+        self.assertEqual(
+            set(evenements.values_list('categorie', flat=True)),
+            {code for code, _ in Evenement.CATEGORIE_CHOICES}
+        )
+        self.assertEqual(
+            set(evenements.values_list('statut', flat=True)),
+            {code for code, _ in Evenement.STATUT_CHOICES}
+        )
+    
+    def test_graine_reproductible(self):
+        """La même graine produit les mêmes données"""
+        def resume(evenements):
+            return [(e.titre, e.categorie, e.statut, e.capacite_max, e.nb_inscrits) for e in evenements]
+        
+        self.assertEqual(resume(self.generer('a')), resume(self.generer('b')))
+        self.assertNotEqual(resume(self.generer('c', graine=8)), resume(self.generer('d')))
+    
+    def test_mot_de_passe_utilisable(self):
+        """Les comptes générés partagent un mot de passe valide"""
+        self.generer('a')
+        self.assertIsNotNone(authenticate(username='a_0', password='motdepasse'))
+    
+    def test_prefixe_deja_utilise(self):
+        """La commande refuse d'écrire par-dessus une génération précédente"""
+        self.generer('a')
+        with self.assertRaises(CommandError):
+            self.generer('a')
+    
+    def test_volumes_nuls(self):
+        call_command('generer_donnees', utilisateurs=5, evenements=0, prefixe='a', stdout=StringIO())
+        self.assertEqual(Utilisateur.objects.filter(username__startswith='a_').count(), 5)
+        self.assertFalse(Evenement.objects.exists())
+        call_command('generer_donnees', utilisateurs=0, evenements=0, prefixe='b', stdout=StringIO())
+        
+        for options in ({'utilisateurs': 0, 'evenements': 3}, {'utilisateurs': -1}, {'lot': 0}):
+            with self.subTest(**options), self.assertRaises(CommandError):
+                call_command('generer_donnees', prefixe='c', stdout=StringIO(), **options)
+
+
+@override_settings(PROFILAGE_ECHANTILLONNAGE=1.0)
+class ProfilageTest(TestCase):
+    """Tests du middleware de profilage et de la page des requêtes lentes"""
+    
+    def setUp(self):
+        requetes_lentes.vider()
+        self.admin = Utilisateur.objects.create_user(username='admin', password='test123', role='admin')
+        self.etudiant = Utilisateur.objects.create_user(username='etudiant', password='test123')
+        self.evenement = Evenement.objects.create(
+            titre='Conférence',
+            description='Description',
+            date_debut=timezone.now() + timedelta(days=5),
+            date_fin=timezone.now() + timedelta(days=5, hours=2),
+            lieu='Amphi A',
+            categorie='conference',
+            organisateur=self.admin,
+            statut='valide'
+        )
+        self.client = Client()
+    
+    def metriques(self, response):
+        """Dictionnaire nom -> (durée, description) de l'en-tête Server-Timing"""
+        resultat = {}
+        for metrique in response['Server-Timing'].split(', '):
+            nom, *parametres = metrique.split(';')
+            valeurs = dict(parametre.split('=', 1) for parametre in parametres)
+            resultat[nom] = (float(valeurs['dur']), valeurs.get('desc', '').strip('"'))
+        return resultat
+    
+    def test_en_tete_server_timing(self):
+        self.client.force_login(self.etudiant)
+        response = self.client.get(reverse('detail_evenement', args=[self.evenement.pk]))
+        metriques = self.metriques(response)
+        
+        self.assertEqual(set(metriques), {'db', 'tpl', 'total'})
+        self.assertRegex(metriques['db'][1], r'^[1-9]\d* requetes SQL$')
+        self.assertGreater(metriques['tpl'][0], 0)
+        self.assertGreaterEqual(metriques['total'][0], metriques['tpl'][0])
+    
+    def test_segment_email(self):
+        """La mise en file des emails est mesurée à part"""
+        self.client.force_login(self.etudiant)
+        response = self.client.post(reverse('inscrire_evenement', args=[self.evenement.pk]))
+        self.assertIn('email', self.metriques(response))
+    
+    @override_settings(PROFILAGE_ECHANTILLONNAGE=0)
+    def test_echantillonnage(self):
+        response = self.client.get(reverse('accueil'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(requetes_lentes.lister(), [])
+    
+    def test_requetes_lentes_bornees(self):
+        """Seules les requêtes les plus lentes sont conservées, de la plus lente à la plus rapide"""
+        registre = RequetesLentes(capacite=3)
+        for total in [5, 1, 9, 3, 7, 2]:
+            registre.ajouter({'total': total})
+        self.assertEqual([enregistrement['total'] for enregistrement in registre.lister()], [9, 7, 5])
+    
+    def test_page_performances(self):
+        self.client.force_login(self.etudiant)
+        self.client.get(reverse('liste_evenements'))
+        
+        response = self.client.get(reverse('performances'))
+        self.assertRedirects(response, reverse('tableau_bord'))
+        
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('performances'))
+        self.assertContains(response, reverse('liste_evenements'))
+        enregistrement = next(r for r in response.context['requetes'] if r['vue'] == 'liste_evenements')
+        self.assertEqual(enregistrement['utilisateur'], 'etudiant')
+        self.assertGreater(enregistrement['nb_sql'], 0)
+        
+        self.client.post(reverse('performances'))
+        # Seule la redirection après effacement a été mesurée depuis
+        self.assertEqual([r['vue'] for r in requetes_lentes.lister()], ['performances'])
+
+
+class CacheAccueilTest(TestCase):
+    """Tests du bloc des prochains événements mis en cache sur l'accueil"""
+    
+    def setUp(self):
+        cache.clear()
+        self.admin = Utilisateur.objects.create_superuser(username='admin', password='test123', role='admin')
+        self.etudiant = Utilisateur.objects.create_user(username='etudiant', password='test123')
+        self.evenement = self.creer_evenement('Conférence climat', timedelta(days=2))
+    
+    def creer_evenement(self, titre, delai, statut='valide'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Evenement.objects.create(
+                titre=titre,
+                description='Description',
+                date_debut=timezone.now() + delai,
+                date_fin=timezone.now() + delai + timedelta(hours=2),
+                lieu='Amphi A',
+                categorie='conference',
+                capacite_max=30,
+                organisateur=self.admin,
+                statut=statut
+            )
+    
+    def test_bloc_servi_depuis_le_cache(self):
+        """Le bloc est commun aux visiteurs anonymes et connectés"""
+        self.assertContains(self.client.get(reverse('accueil')), 'Conférence climat')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('accueil'))
+        self.assertContains(response, 'Conférence climat')
+        self.assertNotContains(response, 'Voir tous les événements')
+        
+        self.client.force_login(self.etudiant)
+        with self.assertNumQueries(2):  # session et utilisateur seulement
+            response = self.client.get(reverse('accueil'))
+        self.assertContains(response, 'Conférence climat')
+        self.assertContains(response, 'Voir tous les événements')
+    
+    def test_invalidation_par_les_signaux(self):
+        self.client.get(reverse('accueil'))
+        self.creer_evenement('Atelier robotique', timedelta(days=1))
+        self.assertContains(self.client.get(reverse('accueil')), 'Atelier robotique')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evenement.delete()
+        self.assertNotContains(self.client.get(reverse('accueil')), 'Conférence climat')
+    
+    def test_invalidation_par_inscription(self):
+        """Le nombre d'inscrits affiché suit les inscriptions"""
+        self.client.get(reverse('accueil'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evenement.reserver_place(self.etudiant)
+        self.assertContains(self.client.get(reverse('accueil')), '1/30')
+    
+    def test_inscription_a_un_autre_evenement_garde_le_cache(self):
+        autre = self.creer_evenement('Événement lointain', timedelta(days=300))
+        for i in range(6):
+            self.creer_evenement(f'Proche {i}', timedelta(days=1, hours=i))
+        self.client.get(reverse('accueil'))
+        with self.captureOnCommitCallbacks(execute=True):
+            autre.reserver_place(self.etudiant)
+        self.assertIsNotNone(cache.get(cle_accueil()))
+    
+    def test_rendu_concurrent_d_un_etat_perime(self):
+        """Un bloc rendu avant une invalidation n'est plus servi après elle"""
+        rendu = caches.render_to_string
+        
+        def rendu_pendant_une_modification(*args, **kwargs):
+            html = rendu(*args, **kwargs)
+            # Modification validée pendant que la requête rend l'état précédent
+            with self.captureOnCommitCallbacks(execute=True):
+                self.evenement.titre = 'Conférence énergie'
+                self.evenement.save()
+            return html
+        
+        with mock.patch('evenements.caches.render_to_string', side_effect=rendu_pendant_une_modification):
+            self.assertContains(self.client.get(reverse('accueil')), 'Conférence climat')
+        self.assertContains(self.client.get(reverse('accueil')), 'Conférence énergie')
+    
+    def test_invalidation_par_action_admin(self):
+        """Les actions groupées de l'admin passent par update(), sans signal"""
+        en_attente = self.creer_evenement('Projection', timedelta(days=1), statut='en_attente')
+        self.assertNotContains(self.client.get(reverse('accueil')), 'Projection')
+        
+        client_admin = Client()
+        client_admin.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            client_admin.post(reverse('admin:evenements_evenement_changelist'), {
+                'action': 'valider_evenements',
+                '_selected_action': [en_attente.pk],
+            })
+        self.assertContains(self.client.get(reverse('accueil')), 'Projection')
+    
+    def test_expiration_au_debut_du_premier_evenement(self):
+        self.creer_evenement('Imminent', timedelta(minutes=2))
+        with mock.patch.object(cache, 'set', wraps=cache.set) as mise_en_cache:
+            self.client.get(reverse('accueil'))
+        duree = mise_en_cache.call_args.args[2]
+        self.assertLessEqual(duree, 120)
+        self.assertGreater(duree, 100)
+
+
+class FacettesUtilisateursTest(TestCase):
+    """Tests des statistiques et des facettes de l'annuaire des utilisateurs"""
+    
+    def setUp(self):
+        cache.clear()
+        self.admin = Utilisateur.objects.create_user(
+            username='admin', password='test123', role='admin', departement='Informatique'
+        )
+        Utilisateur.objects.bulk_create([
+            Utilisateur(username=f'u{i}', departement=['Informatique', 'Physique', ''][i % 3], password='!')
+            for i in range(9)
+        ])
+        self.client.force_login(self.admin)
+    
+    def test_statistiques_et_facettes(self):
+        response = self.client.get(reverse('gestion_utilisateurs'))
+        self.assertEqual(response.context['stats'], {
+            'total_utilisateurs': 10, 'total_etudiants': 9, 'total_admins': 1, 'nouveaux_7_jours': 10,
+        })
+        self.assertEqual(response.context['departements'], [('Informatique', 4), ('Physique', 3)])
+        self.assertContains(response, 'Physique (3)')
+        self.assertContains(response, 'Étudiant (9)')
+    
+    def test_facettes_en_cache(self):
+        """Page suivante : session, utilisateur, page et statistiques seulement"""
+        self.client.get(reverse('gestion_utilisateurs'))
+        with self.assertNumQueries(4):
+            self.client.get(reverse('gestion_utilisateurs'))
+    
+    def test_mise_a_jour_a_l_inscription(self):
+        facettes_utilisateurs()
+        client = Client()
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('inscription'), {
+                'username': 'nouveau', 'first_name': 'Nou', 'last_name': 'Veau', 'email': 'nouveau@test.com',
+                'departement': 'Chimie', 'telephone': '', 'password1': 'MotDePasse#2024', 'password2': 'MotDePasse#2024',
+            })
+        self.assertTrue(Utilisateur.objects.filter(username='nouveau').exists())
+        facettes = facettes_utilisateurs()
+        self.assertEqual(facettes['departements']['Chimie'], 1)
+        self.assertEqual(facettes['roles']['etudiant'], 10)
+    
+    def test_mise_a_jour_du_profil(self):
+        facettes_utilisateurs()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('profil'), {
+                'first_name': 'Ad', 'last_name': 'Min', 'email': 'admin@test.com', 'departement': 'Physique',
+            })
+        self.assertEqual(facettes_utilisateurs()['departements'], {'Informatique': 3, 'Physique': 4})
+    
+    def test_connexion_sans_invalidation(self):
+        """Une connexion (last_login seul) ou une sauvegarde sans changement garde les facettes"""
+        facettes_utilisateurs()
+        with self.captureOnCommitCallbacks(execute=True):
+            Client().login(username='admin', password='test123')
+            Utilisateur.objects.get(username='u1').save()
+        with self.assertNumQueries(0):
+            facettes_utilisateurs()
+    
+    def test_inscriptions_concurrentes(self):
+        """Deux inscriptions validées l'une après l'autre sont toutes deux comptées"""
+        facettes_utilisateurs()
+        with self.captureOnCommitCallbacks() as rappels:
+            Utilisateur.objects.create_user(username='v1', password='!', departement='Chimie')
+            Utilisateur.objects.create_user(username='v2', password='!', departement='Chimie')
+        for rappel in rappels:
+            rappel()
+        self.assertEqual(facettes_utilisateurs()['departements']['Chimie'], 2)
+    
+    def test_suppression(self):
+        facettes_utilisateurs()
+        with self.captureOnCommitCallbacks(execute=True):
+            Utilisateur.objects.get(username='u1').delete()
+        self.assertEqual(facettes_utilisateurs()['departements'], {'Informatique': 4, 'Physique': 2})
+        self.assertEqual(facettes_utilisateurs()['roles'], {'admin': 1, 'etudiant': 8})
+    
+    def test_action_admin(self):
+        """promouvoir_admin passe par update() : les facettes sont recalculées"""
+        superutilisateur = Utilisateur.objects.create_superuser(username='super', password='test123')
+        facettes_utilisateurs()
+        client = Client()
+        client.force_login(superutilisateur)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('admin:evenements_utilisateur_changelist'), {
+                'action': 'promouvoir_admin',
+                '_selected_action': [Utilisateur.objects.get(username='u0').pk],
+            })
+        self.assertEqual(facettes_utilisateurs()['roles'], {'admin': 2, 'etudiant': 9})
+
+
+class ComptesCategoriesTest(TestCase):
+    """Tests du nombre d'événements par catégorie de la liste des événements"""
+    
+    def setUp(self):
+        cache.clear()
+        self.organisateur = Utilisateur.objects.create_user(username='organisateur', password='test123')
+        self.creer_evenement('Conférence sur le climat', 'conference', timedelta(days=3))
+        self.creer_evenement('Conférence de rentrée', 'conference', timedelta(days=10))
+        self.creer_evenement('Atelier climat', 'atelier', timedelta(days=-3))
+        self.creer_evenement('Atelier à valider', 'atelier', timedelta(days=3), statut='en_attente')
+    
+    def creer_evenement(self, titre, categorie, delai, statut='valide'):
+        return Evenement.objects.create(
+            titre=titre,
+            description='Description',
+            date_debut=timezone.now() + delai,
+            date_fin=timezone.now() + delai + timedelta(hours=2),
+            lieu='Amphi A',
+            categorie=categorie,
+            organisateur=self.organisateur,
+            statut=statut
+        )
+    
+    def test_comptes_par_categorie(self):
+        self.assertEqual(comptes_categories(), {
+            'conference': {'a_venir': 2, 'passes': 0},
+            'atelier': {'a_venir': 0, 'passes': 1},
+        })
+    
+    def test_comptes_de_la_recherche(self):
+        self.assertEqual(comptes_categories('climat'), {
+            'conference': {'a_venir': 1, 'passes': 0},
+            'atelier': {'a_venir': 0, 'passes': 1},
+        })
+    
+    def test_cache_par_texte_recherche(self):
+        """Une seule requête GROUP BY, puis le cache, quelle que soit la casse ou la ponctuation"""
+        with self.assertNumQueries(1):
+            comptes_categories('Climat')
+        with self.assertNumQueries(0):
+            self.assertEqual(comptes_categories('  climat ! ')['conference']['a_venir'], 1)
+        with self.assertNumQueries(1):
+            comptes_categories('rentrée')
+    
+    def test_affichage_dans_le_filtre(self):
+        self.client.force_login(self.organisateur)
+        response = self.client.get(reverse('liste_evenements'), {'recherche': 'climat'})
+        self.assertContains(response, 'Conférence (1 à venir, 0 passés)')
+        self.assertContains(response, 'Atelier (0 à venir, 1 passé)')
+        self.assertContains(response, 'Soutenance (0 à venir, 0 passés)')
+        self.assertContains(response, 'Toutes les catégories (1 à venir, 1 passé)')
+
+
+class ApiTest(TestCase):
+    """Tests de l'API JSON en lecture seule"""
+    
+    def setUp(self):
+        self.organisateur = Utilisateur.objects.create_user(
+            username='organisateur', password='test123', first_name='Orga', last_name='Nisateur'
+        )
+        self.etudiant = Utilisateur.objects.create_user(username='etudiant', password='test123')
+        self.evenements = [
+            Evenement.objects.create(
+                titre=f'Événement {i}',
+                description='Description',
+                date_debut=timezone.now() + timedelta(days=i + 1),
+                date_fin=timezone.now() + timedelta(days=i + 1, hours=2),
+                lieu='Amphi A',
+                categorie='atelier' if i % 2 else 'conference',
+                capacite_max=2,
+                organisateur=self.organisateur,
+                statut='valide'
+            )
+            for i in range(5)
+        ]
+        self.a_valider = Evenement.objects.create(
+            titre='À valider', description='Description',
+            date_debut=timezone.now() + timedelta(days=1), date_fin=timezone.now() + timedelta(days=1, hours=2),
+            lieu='Amphi B', categorie='autre', organisateur=self.organisateur, statut='en_attente'
+        )
+    
+    def test_liste_paginee_par_curseur(self):
+        response = self.client.get(reverse('api_evenements'), {'taille': 2})
+        donnees = response.json()
+        self.assertEqual([e['titre'] for e in donnees['resultats']], ['Événement 0', 'Événement 1'])
+        self.assertIsNone(donnees['precedent'])
+        
+        titres = [e['titre'] for e in donnees['resultats']]
+        while donnees['suivant']:
+            donnees = self.client.get(donnees['suivant']).json()
+            titres += [e['titre'] for e in donnees['resultats']]
+        self.assertEqual(titres, [f'Événement {i}' for i in range(5)])
+    
+    def test_selection_des_champs(self):
+        response = self.client.get(reverse('api_evenements'), {'champs': 'titre,places_restantes,organisateur'})
+        self.assertEqual(response.json()['resultats'][0], {
+            'titre': 'Événement 0', 'places_restantes': 2, 'organisateur': 'Orga Nisateur',
+        })
+        
+        response = self.client.get(reverse('api_evenements'), {'champs': 'titre,mot_de_passe'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('mot_de_passe', response.json()['erreur'])
+    
+    def test_filtre_categorie(self):
+        response = self.client.get(reverse('api_evenements'), {'categorie': 'atelier', 'champs': 'titre'})
+        self.assertEqual(response.json()['resultats'], [{'titre': 'Événement 1'}, {'titre': 'Événement 3'}])
+    
+    def test_detail_evenement_valide_seulement(self):
+        response = self.client.get(reverse('api_evenement', args=[self.evenements[0].pk]))
+        self.assertEqual(response.json()['titre'], 'Événement 0')
+        
+        response = self.client.get(reverse('api_evenement', args=[self.a_valider.pk]))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_etag_et_304(self):
+        url = reverse('api_evenement', args=[self.evenements[0].pk])
+        etag = self.client.get(url)['ETag']
+        self.assertRegex(etag, r'^"[0-9a-f]{40}"$')
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        
+        # Une inscription change le nombre de places sans toucher à date_modification
+        self.evenements[0].reserver_place(self.etudiant)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['places_restantes'], 1)
+        
+        response = self.client.get(url + '?champs=titre', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+    
+    def test_liste_304_apres_modification(self):
+        url = reverse('api_evenements')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        
+        evenement = self.evenements[2]
+        evenement.titre = 'Nouveau titre'
+        evenement.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_mes_inscriptions(self):
+        self.assertEqual(self.client.get(reverse('api_mes_inscriptions')).status_code, 401)
+        
+        self.evenements[3].reserver_place(self.etudiant)
+        self.evenements[1].reserver_place(self.etudiant)
+        for participant in ('a', 'b'):
+            self.evenements[4].reserver_place(Utilisateur.objects.create_user(username=participant))
+        self.evenements[4].reserver_place(self.etudiant)
+        
+        self.client.force_login(self.etudiant)
+        response = self.client.get(reverse('api_mes_inscriptions'), {'champs': 'titre', 'taille': 2})
+        donnees = response.json()
+        self.assertEqual(
+            [(i['evenement']['titre'], i['statut']) for i in donnees['resultats']],
+            [('Événement 1', 'confirmee'), ('Événement 3', 'confirmee')]
+        )
+        self.assertIn('private', response['Cache-Control'])
+        
+        donnees = self.client.get(donnees['suivant']).json()
+        self.assertEqual(donnees['resultats'][0]['statut'], 'en_attente')
+        self.assertEqual(donnees['resultats'][0]['position_attente'], 1)
+        self.assertIsNone(donnees['suivant'])
+    
+    def test_lecture_seule(self):
+        response = self.client.post(reverse('api_evenements'))
+        self.assertEqual(response.status_code, 405)
+
+
+
+class PagesConditionnellesTest(TestCase):
+    """Tests des réponses 304 des pages de détail et de liste des événements"""
+    
+    def setUp(self):
+        cache.clear()
+        self.organisateur = Utilisateur.objects.create_user(username='organisateur', password='test123')
+        self.etudiant = Utilisateur.objects.create_user(username='etudiant', password='test123')
+        self.evenement = Evenement.objects.create(
+            titre='Conférence',
+            description='Description',
+            date_debut=timezone.now() + timedelta(days=1),
+            date_fin=timezone.now() + timedelta(days=1, hours=2),
+            lieu='Amphi A',
+            categorie='conference',
+            capacite_max=1,
+            organisateur=self.organisateur,
+            statut='valide'
+        )
+        self.client.force_login(self.etudiant)
+    
+    def test_detail_304_en_une_requete(self):
+        url = reverse('detail_evenement', args=[self.evenement.pk])
+        response = self.client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('Last-Modified'))
+        
+        # Session, utilisateur, puis l'événement avec l'inscription du visiteur
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+    
+    def test_detail_change_avec_les_places_et_l_inscription(self):
+        url = reverse('detail_evenement', args=[self.evenement.pk])
+        etag = self.client.get(url)['ETag']
+        
+        # Une inscription d'un autre utilisateur change les places restantes
+        self.evenement.reserver_place(Utilisateur.objects.create_user(username='autre'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        
+        # L'inscription du visiteur en liste d'attente change sa page
+        self.evenement.reserver_place(self.etudiant)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['position_attente'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_detail_change_apres_action_admin(self):
+        """Une action groupée de l'admin (update) change la page de détail"""
+        url = reverse('detail_evenement', args=[self.evenement.pk])
+        etag = self.client.get(url)['ETag']
+        
+        admin = Utilisateur.objects.create_superuser(username='admin', password='test123', email='a@univ.fr')
+        client_admin = Client()
+        client_admin.force_login(admin)
+        client_admin.post(reverse('admin:evenements_evenement_changelist'), {
+            'action': 'refuser_evenements', '_selected_action': [self.evenement.pk],
+        })
+        self.evenement.refresh_from_db()
+        self.assertEqual(self.evenement.statut, 'refuse')
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "pas encore validé")
+    
+    def test_detail_change_quand_l_evenement_est_passe(self):
+        url = reverse('detail_evenement', args=[self.evenement.pk])
+        etag = self.client.get(url)['ETag']
+        with mock.patch('django.utils.timezone.now', return_value=self.evenement.date_fin + timedelta(hours=1)):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Cet événement est terminé')
+    
+    def test_detail_rendu_quand_un_message_attend(self):
+        url = reverse('detail_evenement', args=[self.evenement.pk])
+        etag = self.client.get(url)['ETag']
+        
+        # Annulation refusée : l'événement ne change pas, mais un message attend
+        self.client.get(reverse('annuler_inscription', args=[self.evenement.pk]))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'pas inscrit à cet événement')
+        self.assertFalse(response.has_header('ETag'))
+        
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+    
+    def test_detail_organisateur_sans_304(self):
+        self.client.force_login(self.organisateur)
+        response = self.client.get(reverse('detail_evenement', args=[self.evenement.pk]))
+        self.assertFalse(response.has_header('ETag'))
+    
+    def test_liste_304_et_modification(self):
+        url = reverse('liste_evenements')
+        etag = self.client.get(url, {'categorie': 'conference'})['ETag']
+        
+        response = self.client.get(url, {'categorie': 'conference'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Autres filtres : autre page
+        response = self.client.get(url, {'categorie': 'atelier'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        
+        self.evenement.reserver_place(Utilisateur.objects.create_user(username='autre'))
+        response = self.client.get(url, {'categorie': 'conference'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        
+        self.evenement.titre = 'Nouveau titre'
+        self.evenement.save()
+        response = self.client.get(url, {'categorie': 'conference'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Nouveau titre')
+    
+    def test_if_modified_since_seul_sans_304(self):
+        """Sans Last-Modified, un client qui n'envoie qu'If-Modified-Since reçoit les places à jour"""
+        self.evenement.reserver_place(Utilisateur.objects.create_user(username='autre'))
+        depuis = http_date(time.time() + 3600)
+        for url in (reverse('liste_evenements'), reverse('detail_evenement', args=[self.evenement.pk])):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=depuis)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('Last-Modified'))
+
+
+class CalendrierTest(TestCase):
+    """Tests des flux iCalendar"""
+    
+    def setUp(self):
+        self.organisateur = Utilisateur.objects.create_user(username='organisateur', password='test123')
+        self.etudiant = Utilisateur.objects.create_user(username='etudiant', password='test123')
+        self.evenements = [
+            Evenement.objects.create(
+                titre=titre,
+                description='Ligne 1\nLigne 2 ; avec, ponctuation',
+                date_debut=timezone.now() + timedelta(days=i + 1),
+                date_fin=timezone.now() + timedelta(days=i + 1, hours=2),
+                lieu='Amphi A',
+                categorie=categorie,
+                capacite_max=1,
+                organisateur=self.organisateur,
+                statut='valide'
+            )
+            for i, (titre, categorie) in enumerate([('Conférence IA', 'conference'), ('Atelier Git', 'atelier')])
+        ]
+        Evenement.objects.create(
+            titre='À valider', description='Description',
+            date_debut=timezone.now() + timedelta(days=1), date_fin=timezone.now() + timedelta(days=1, hours=2),
+            lieu='Amphi B', categorie='autre', organisateur=self.organisateur, statut='en_attente'
+        )
+    
+    def lire(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_flux_public(self):
+        response = self.client.get(reverse('calendrier_evenements'))
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        contenu = self.lire(response)
+        self.assertTrue(contenu.startswith('BEGIN:VCALENDAR\r\nVERSION:2.0\r\n'))
+        self.assertTrue(contenu.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(contenu.count('BEGIN:VEVENT'), 2)
+        self.assertIn('SUMMARY:Conférence IA', contenu)
+        self.assertNotIn('À valider', contenu)
+        self.assertIn(r'DESCRIPTION:Ligne 1\nLigne 2 \; avec\, ponctuation', contenu)
+        
+        contenu = self.lire(self.client.get(reverse('calendrier_evenements'), {'categorie': 'atelier'}))
+        self.assertEqual(contenu.count('BEGIN:VEVENT'), 1)
+        self.assertIn('SUMMARY:Atelier Git', contenu)
+        
+        response = self.client.get(reverse('calendrier_evenements'), {'categorie': 'inconnue'})
+        self.assertEqual(response.status_code, 404)
+    
+    def test_pliage_des_lignes(self):
+        ligne = 'SUMMARY:' + 'é' * 100
+        plie = plier(ligne)
+        segments = plie.split('\r\n')[:-1]
+        self.assertTrue(all(len(segment.encode()) <= 75 for segment in segments))
+        self.assertEqual(segments[0] + ''.join(segment[1:] for segment in segments[1:]), ligne)
+    
+    def test_304_jusqu_a_modification(self):
+        url = reverse('calendrier_evenements')
+        etag = self.client.get(url)['ETag']
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        self.evenements[1].delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.lire(response).count('BEGIN:VEVENT'), 1)
+    
+    def test_flux_personnel(self):
+        self.evenements[0].reserver_place(self.etudiant)
+        self.evenements[1].reserver_place(self.organisateur)
+        self.evenements[1].reserver_place(self.etudiant)  # Liste d'attente
+        url = reverse('calendrier_inscriptions', args=[jeton_calendrier(self.etudiant)])
+        
+        response = self.client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        contenu = self.lire(response)
+        self.assertEqual(contenu.count('BEGIN:VEVENT'), 1)
+        self.assertIn('SUMMARY:Conférence IA', contenu)
+        
+        # Promotion depuis la liste d'attente : nouvelle version
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.evenements[1].inscriptions.get(participant=self.organisateur).annuler()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(self.lire(response).count('BEGIN:VEVENT'), 2)
+    
+    def test_jeton_invalide_ou_revoque(self):
+        jeton = jeton_calendrier(self.etudiant)
+        self.assertEqual(self.client.get(reverse('calendrier_inscriptions', args=[jeton + 'x'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('calendrier_inscriptions', args=['abc'])).status_code, 404)
+        
+        self.etudiant.set_password('nouveau123')
+        self.etudiant.save()
+        self.assertEqual(self.client.get(reverse('calendrier_inscriptions', args=[jeton])).status_code, 404)
+    
+    def test_adresse_sur_le_profil(self):
+        self.client.force_login(self.etudiant)
+        response = self.client.get(reverse('profil'))
+        self.assertContains(response, reverse('calendrier_inscriptions', args=[jeton_calendrier(self.etudiant)]))
+
+
+class ExportParticipantsTest(TestCase):
+    """Tests des exports CSV et XLSX des inscriptions"""
+    
+    def setUp(self):
+        self.organisateur = Utilisateur.objects.create_user(username='organisateur', password='test123')
+        self.etudiant = Utilisateur.objects.create_user(
+            username='etudiant', password='test123', first_name='Jean', last_name='Dupont', departement='Informatique'
+        )
+        self.evenement = Evenement.objects.create(
+            titre='Conférence IA',
+            description='Description',
+            date_debut=timezone.now() + timedelta(days=1),
+            date_fin=timezone.now() + timedelta(days=1, hours=2),
+            lieu='Amphi A',
+            categorie='conference',
+            capacite_max=1,
+            organisateur=self.organisateur,
+            statut='valide'
+        )
+        self.evenement.reserver_place(self.etudiant)
+        self.malin = Utilisateur.objects.create_user(username='malin', first_name='=1+1', last_name='<Nom & co>')
+        self.evenement.reserver_place(self.malin)
+        self.url = reverse('exporter_participants', args=[self.evenement.pk])
+    
+    def lire(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+    
+    def test_export_csv(self):
+        self.client.force_login(self.organisateur)
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('participants-conference-ia.csv', response['Content-Disposition'])
+        lignes = self.lire(response).decode('utf-8-sig').splitlines()
+        self.assertEqual(lignes[0].split(';')[:3], ['Nom', 'Prénom', "Nom d'utilisateur"])
+        self.assertTrue(lignes[1].startswith('Dupont;Jean;etudiant;'))
+        self.assertIn('Confirmée', lignes[1])
+        # Liste d'attente après les inscrits, formule neutralisée
+        self.assertTrue(lignes[2].startswith("<Nom & co>;'=1+1;malin;"))
+        self.assertIn(";1;", lignes[2])
+        self.assertEqual(len(lignes), 3)
+    
+    def test_export_xlsx(self):
+        self.client.force_login(self.organisateur)
+        response = self.client.get(self.url, {'format': 'xlsx'})
+        self.assertIn('.xlsx', response['Content-Disposition'])
+        with zipfile.ZipFile(BytesIO(self.lire(response))) as archive:
+            self.assertIn('[Content_Types].xml', archive.namelist())
+            feuille = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(feuille.count('<row>'), 3)
+        self.assertIn('<t xml:space="preserve">Dupont</t>', feuille)
+        self.assertIn('&lt;Nom &amp; co&gt;', feuille)
+    
+    def test_reserve_a_l_organisateur(self):
+        self.client.force_login(self.etudiant)
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse('detail_evenement', args=[self.evenement.pk]))
+    
+    def test_action_admin(self):
+        superutilisateur = Utilisateur.objects.create_superuser(username='super', password='test123')
+        self.client.force_login(superutilisateur)
+        response = self.client.post(reverse('admin:evenements_inscription_changelist') + '?statut=confirmee', {
+            'action': 'exporter_csv',
+            'select_across': '1',
+            '_selected_action': [self.evenement.inscriptions.first().pk],
+        })
+        lignes = self.lire(response).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lignes), 2)
+        self.assertTrue(lignes[1].startswith('Conférence IA;'))
+        self.assertIn('Dupont', lignes[1])
+
+
+class ImportDonneesTest(TestCase):
+    """Tests de la commande importer_donnees"""
+    
+    MOT_DE_PASSE = 'Semestre!2024'
+    
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dossier.cleanup)
+        self.organisateur = Utilisateur.objects.create_user(username='bde', password='test123')
+    
+    def fichier(self, nom, contenu):
+        chemin = os.path.join(self.dossier.name, nom)
+        with open(chemin, 'w', encoding='utf-8') as f:
+            f.write(contenu)
+        return chemin
+    
+    def importer(self, *args, **options):
+        sortie, erreurs = StringIO(), StringIO()
+        call_command('importer_donnees', *args, stdout=sortie, stderr=erreurs, **options)
+        return sortie.getvalue(), erreurs.getvalue()
+    
+    def test_import_utilisateurs_csv(self):
+        chemin = self.fichier('etudiants.csv', (
+            'username;first_name;last_name;email;departement;mot_de_passe\n'
+            f'alice;Alice;Martin;alice@exemple.com;Informatique;{self.MOT_DE_PASSE}\n'
+            f'bob;Bob;Durand;pas-un-email;Physique;{self.MOT_DE_PASSE}\n'
+            f'Alice;Alice;Bis;alice2@exemple.com;;{self.MOT_DE_PASSE}\n'
+            'chloe;Chloé;Petit;chloe@exemple.com;;123\n'
+            f'bde;Bureau;Étudiants;bde@exemple.com;;{self.MOT_DE_PASSE}\n'
+            f'david;David;Leroy;david@exemple.com;Droit;{self.MOT_DE_PASSE}\n'
+        ))
+        sortie, erreurs = self.importer('utilisateurs', chemin, processus=1, lot=2)
+        
+        self.assertIn('2 utilisateurs importé(s), 4 ligne(s) refusée(s)', sortie)
+        self.assertIn('Ligne 3 : email', erreurs)
+        self.assertIn('Ligne 4 : username', erreurs)
+        self.assertIn('Ligne 5 : mot_de_passe', erreurs)
+        self.assertIn('Ligne 6 : username', erreurs)
+        
+        alice = Utilisateur.objects.get(username='alice')
+        self.assertEqual((alice.role, alice.departement), ('etudiant', 'Informatique'))
+        self.assertTrue(alice.check_password(self.MOT_DE_PASSE))
+        self.assertTrue(Utilisateur.objects.filter(username='david').exists())
+    
+    def test_hachage_dans_un_pool_de_processus(self):
+        chemin = self.fichier('etudiants.json', json.dumps([
+            {'username': f'etudiant{i}', 'first_name': 'Prénom', 'last_name': 'Nom',
+             'email': f'etudiant{i}@exemple.com', 'mot_de_passe': f'{self.MOT_DE_PASSE}{i}'}
+            for i in range(3)
+        ]))
+        sortie, _ = self.importer('utilisateurs', chemin, processus=2, lot=2)
+        self.assertIn('3 utilisateurs importé(s)', sortie)
+        self.assertTrue(Utilisateur.objects.get(username='etudiant2').check_password(f'{self.MOT_DE_PASSE}2'))
+    
+    def test_rapport_et_simulation(self):
+        chemin = self.fichier('etudiants.csv', (
+            'username,first_name,last_name,email,mot_de_passe\n'
+            f'alice,Alice,Martin,alice@exemple.com,{self.MOT_DE_PASSE}\n'
+            f'bob,,Durand,bob@exemple.com,{self.MOT_DE_PASSE}\n'
+        ))
+        rapport = os.path.join(self.dossier.name, 'rapport.csv')
+        sortie, _ = self.importer('utilisateurs', chemin, simulation=True, rapport=rapport)
+        
+        self.assertIn('Simulation : 1 ligne(s) valide(s), 1 refusée(s)', sortie)
+        self.assertFalse(Utilisateur.objects.filter(username='alice').exists())
+        with open(rapport, encoding='utf-8') as f:
+            lignes = f.read().splitlines()
+        self.assertEqual(lignes[0], 'ligne;erreur')
+        self.assertTrue(lignes[1].startswith('3;first_name : '))
+    
+    def test_import_evenements(self):
+        Utilisateur.objects.create_user(username='labo')
+        chemin = self.fichier('evenements.csv', (
+            'titre;description;date_debut;date_fin;lieu;categorie;capacite_max;organisateur\n'
+            'Conférence IA;Intelligence artificielle;2030-03-01T14:00;2030-03-01T16:00;Amphi A;conference;100;\n'
+            'Séminaire;Description;2030-03-02T14:00;2030-03-02T16:00;Labo;conference;20;labo\n'
+            'Atelier;Description;2030-03-01T14:00;2030-03-01T12:00;Salle 1;atelier;10;\n'
+            'Concert;Description;2030-03-05T20:00;2030-03-05T22:00;Gymnase;culturel;50;inconnu\n'
+        ))
+        sortie, erreurs = self.importer('evenements', chemin, organisateur='bde')
+        
+        self.assertIn('2 evenements importé(s), 2 ligne(s) refusée(s)', sortie)
+        self.assertIn('Ligne 4 : ligne : La date de fin doit être postérieure', erreurs)
+        self.assertIn('Ligne 5 : organisateur : utilisateur « inconnu » introuvable.', erreurs)
+        evenement = Evenement.objects.get(titre='Conférence IA')
+        self.assertEqual((evenement.organisateur, evenement.statut), (self.organisateur, 'valide'))
+        self.assertEqual(Evenement.objects.get(titre='Séminaire').organisateur.username, 'labo')
+        # Index de recherche tenu à jour malgré bulk_create
+        self.assertEqual(list(rechercher_evenements(Evenement.objects.all(), 'intelligence')), [evenement])
+    
+    def test_lot_refuse_repris_ligne_a_ligne(self):
+        """Un doublon inséré entre la validation et l'insertion n'annule que sa ligne"""
+        resultat = ResultatImport()
+        inserer(Utilisateur, [
+            (2, Utilisateur(username='nouveau1')),
+            (3, Utilisateur(username='bde')),
+            (4, Utilisateur(username='nouveau2')),
+        ], 10, resultat)
+        self.assertEqual(resultat.crees, 2)
+        self.assertEqual([numero for numero, _ in resultat.erreurs], [3])
+        self.assertEqual(Utilisateur.objects.filter(username__startswith='nouveau').count(), 2)
+    
+    def test_fichier_invalide(self):
+        with self.assertRaisesMessage(CommandError, "liste d'objets"):
+            self.importer('utilisateurs', self.fichier('etudiants.json', '{"username": "alice"}'))
+        with self.assertRaisesMessage(CommandError, 'Format inconnu'):
+            self.importer('utilisateurs', self.fichier('etudiants.txt', ''))
+
+
+class SqliteProductionTest(TestCase):
+    """Tests du moteur SQLite de production (PRAGMA et BEGIN IMMEDIATE)"""
+    
+    def connexion(self, **options):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        reglages = {
+            **connections['default'].settings_dict,
+            'ENGINE': 'gestion_evenements.sqlite_production',
+            'NAME': os.path.join(dossier.name, 'production.sqlite3'),
+            'OPTIONS': options,
+        }
+        base = load_backend(reglages['ENGINE']).DatabaseWrapper(reglages, 'production')
+        connections['production'] = base
+        self.addCleanup(connections.__delitem__, 'production')
+        self.addCleanup(base.close)
+        return base
+    
+    def pragma(self, base, nom):
+        with base.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nom}')
+            return cursor.fetchone()[0]
+    
+    def test_pragmas_a_chaque_connexion(self):
+        base = self.connexion(pragmas={'cache_size': -1000})
+        self.assertEqual(self.pragma(base, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(base, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(base, 'cache_size'), -1000)
+        self.assertEqual(self.pragma(base, 'synchronous'), 1)
+        
+        base.close()
+        self.assertEqual(self.pragma(base, 'busy_timeout'), 5000)
+    
+    def test_begin_immediate(self):
+        base = self.connexion()
+        with CaptureQueriesContext(base) as requetes:
+            with transaction.atomic(using='production'):
+                pass
+        self.assertEqual(requetes.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+    
+    def test_mode_transaction(self):
+        base = self.connexion(mode_transaction='deferred')
+        with CaptureQueriesContext(base) as requetes:
+            with transaction.atomic(using='production'):
+                pass
+        self.assertEqual(requetes.captured_queries[0]['sql'], 'BEGIN DEFERRED')
+
+
+@override_settings(BASE_REPLIQUE='replique_test')
+class RepliqueLectureTest(TestCase):
+    """Tests du routage des pages en lecture vers une réplique (deux bases)"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Réplique : base fichier distincte, migrée une fois, avec ses propres
+        # données pour distinguer la base qui a répondu
+        dossier = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(dossier.cleanup)
+        reglages = {**connections['default'].settings_dict, 'NAME': os.path.join(dossier.name, 'replique.sqlite3')}
+        replique = load_backend(reglages['ENGINE']).DatabaseWrapper(reglages, 'replique_test')
+        connections['replique_test'] = replique
+        cls.addClassCleanup(connections.__delitem__, 'replique_test')
+        cls.addClassCleanup(replique.close)
+        call_command('migrate', database='replique_test', verbosity=0)
+        organisateur, = Utilisateur.objects.using('replique_test').bulk_create([Utilisateur(username='replique')])
+        cls.creer_evenement(Evenement.objects.using('replique_test'), 'Conférence de la réplique', organisateur)
+    
+    def setUp(self):
+        cache.clear()
+        self.etudiant = Utilisateur.objects.create_user(username='etudiant', password='test123')
+        self.evenement = self.creer_evenement(Evenement.objects, 'Conférence principale', self.etudiant)
+        self.client.login(username='etudiant', password='test123')
+    
+    @staticmethod
+    def creer_evenement(evenements, titre, organisateur):
+        # bulk_create : sans signal d'indexation sur la base principale
+        evenement, = evenements.bulk_create([Evenement(
+            titre=titre,
+            description='Description',
+            date_debut=timezone.now() + timedelta(days=3),
+            date_fin=timezone.now() + timedelta(days=3, hours=2),
+            lieu='Amphi A',
+            categorie='conference',
+            capacite_max=30,
+            organisateur=organisateur,
+            statut='valide',
+        )])
+        return evenement
+    
+    def test_pages_en_lecture_sur_la_replique(self):
+        response = self.client.get(reverse('liste_evenements'))
+        self.assertContains(response, 'Conférence de la réplique')
+        self.assertNotContains(response, 'Conférence principale')
+        
+        # Vue non décorée : base principale
+        response = self.client.get(reverse('tableau_bord'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(COOKIE_PRIMAIRE, response.cookies)
+    
+    def test_base_principale_apres_une_ecriture(self):
+        response = self.client.post(reverse('inscrire_evenement', args=[self.evenement.pk]))
+        self.assertEqual(response.cookies[COOKIE_PRIMAIRE]['max-age'], 10)
+        self.assertTrue(Inscription.objects.filter(evenement=self.evenement, participant=self.etudiant).exists())
+        
+        # Le cookie est renvoyé par le navigateur : l'inscription est visible
+        response = self.client.get(reverse('detail_evenement', args=[self.evenement.pk]))
+        self.assertEqual(response.context['est_inscrit'], True)
+        self.assertContains(self.client.get(reverse('liste_evenements')), 'Conférence principale')
+    
+    def test_ecritures_et_blocs_en_cache_sur_la_base_principale(self):
+        routeur = RouteurReplique()
+        with mock.patch('evenements.routeurs._lecture_replique', ContextVar('test', default=True)):
+            self.assertEqual(routeur.db_for_read(Evenement), 'replique_test')
+            self.assertEqual(routeur.db_for_write(Evenement), 'default')
+            with lecture_primaire():
+                self.assertIsNone(routeur.db_for_read(Evenement))
+        
+        # Le bloc de l'accueil, invalidé à chaque écriture, vient de la base principale
+        response = self.client.get(reverse('accueil'))
+        self.assertContains(response, 'Conférence principale')
+        self.assertNotContains(response, 'Conférence de la réplique')
+    
+    @override_settings(BASE_REPLIQUE=None)
+    def test_sans_replique(self):
+        self.assertContains(self.client.get(reverse('liste_evenements')), 'Conférence principale')
+        response = self.client.post(reverse('inscrire_evenement', args=[self.evenement.pk]))
+        self.assertNotIn(COOKIE_PRIMAIRE, response.cookies)
+
+
+class VuesAsyncTest(TestCase):
+    """Tests des versions async des pages (VUES_ASYNC, sous ASGI)"""
+    
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(self.charger_urls, settings.VUES_ASYNC)
+        self.charger_urls(True)
+        self.admin = Utilisateur.objects.create_user(username='admin', password='test123', role='admin')
+        self.etudiant = Utilisateur.objects.create_user(username='etudiant', password='test123')
+        self.evenement = Evenement.objects.create(
+            titre='Conférence async',
+            description='Description',
+            date_debut=timezone.now() + timedelta(days=1),
+            date_fin=timezone.now() + timedelta(days=1, hours=2),
+            lieu='Amphi A',
+            categorie='conference',
+            capacite_max=1,
+            organisateur=self.admin,
+            statut='valide'
+        )
+        Evenement.objects.create(
+            titre='Atelier à valider', description='Description',
+            date_debut=timezone.now() + timedelta(days=2), date_fin=timezone.now() + timedelta(days=2, hours=2),
+            lieu='Salle B', categorie='atelier', capacite_max=10, organisateur=self.etudiant,
+        )
+        Inscription.objects.create(evenement=self.evenement, participant=self.etudiant, statut='confirmee')
+    
+    def charger_urls(self, vues_async):
+        with self.settings(VUES_ASYNC=vues_async):
+            importlib.reload(urls)
+            importlib.reload(import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+    
+    def test_vues_async_sous_asgi(self):
+        for nom, args in (('accueil', []), ('tableau_bord', []), ('liste_evenements', []), ('detail_evenement', [1]),
+                          ('disponibilite_evenement', [1])):
+            self.assertTrue(iscoroutinefunction(resolve(reverse(nom, args=args)).func), nom)
+    
+    async def test_pages(self):
+        await self.async_client.aforce_login(self.etudiant)
+        self.assertContains(await self.async_client.get(reverse('accueil')), 'Conférence async')
+        
+        response = await self.async_client.get(reverse('tableau_bord'))
+        self.assertEqual(response.context['stats']['nb_inscriptions'], 1)
+        self.assertEqual(len(response.context['mes_evenements']), 1)
+        self.assertIsNone(response.context['evenements_en_attente'])
+        
+        response = await self.async_client.get(reverse('liste_evenements'), {'recherche': 'conference'})
+        self.assertContains(response, 'Conférence async')
+        self.assertNotContains(response, 'Atelier à valider')
+        
+        response = await self.async_client.get(reverse('detail_evenement', args=[self.evenement.pk]))
+        self.assertTrue(response.context['est_inscrit'])
+        self.assertEqual((await self.async_client.get(reverse('detail_evenement', args=[0]))).status_code, 404)
+    
+    async def test_connexion_requise(self):
+        response = await self.async_client.get(reverse('tableau_bord'))
+        self.assertRedirects(response, f"{reverse('connexion')}?next={reverse('tableau_bord')}", fetch_redirect_response=False)
+    
+    async def test_tableau_bord_admin(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('tableau_bord'))
+        self.assertEqual([e.titre for e in response.context['evenements_en_attente']], ['Atelier à valider'])
+        self.assertEqual(response.context['stats']['nb_participants_total'], 1)
+        # Organisateur : liste des inscrits chargée avant le rendu
+        response = await self.async_client.get(reverse('detail_evenement', args=[self.evenement.pk]))
+        self.assertEqual([i.participant for i in response.context['inscrits']], [self.etudiant])
+    
+    def test_memes_requetes_et_304(self):
+        """Même nombre de requêtes que la vue synchrone, et réponse 304"""
+        self.client.force_login(self.etudiant)
+        url = reverse('detail_evenement', args=[self.evenement.pk])
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        with self.assertNumQueries(3):
+            response = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+    
+    @override_settings(DISPONIBILITE_DUREE_FLUX=0)
+    async def test_flux_places(self):
+        """Sous ASGI, places poussées en flux SSE par un générateur async"""
+        await self.async_client.aforce_login(self.etudiant)
+        response = await self.async_client.get(reverse('disponibilite_evenement', args=[self.evenement.pk]))
+        self.assertTrue(response.is_async)
+        contenu = b''.join([morceau async for morceau in response.streaming_content]).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertIn('"inscrits": 1, "capacite": 1, "places_restantes": 0', contenu)
+        
+        response = await self.async_client.get(reverse('detail_evenement', args=[self.evenement.pk]))
+        self.assertContains(response, 'new EventSource(url)')
+        self.assertNotContains(response, 'setInterval(')
+    
+    @override_settings(PROFILAGE_ECHANTILLONNAGE=1.0)
+    async def test_profilage(self):
+        """Les requêtes SQL de l'ORM async sont comptées dans Server-Timing"""
+        await self.async_client.aforce_login(self.etudiant)
+        response = await self.async_client.get(reverse('liste_evenements'))
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* requetes SQL"')
+
+
+class DisponibiliteTest(TestCase):
+    """Tests des places disponibles en direct (flux SSE sous ASGI, sondage JSON sous WSGI)"""
+    
+    def setUp(self):
+        # Releveur propre au test, sans fil : les relèves sont lancées à la main
+        self.releveur = Releveur()
+        self.releveur.demarrer = mock.Mock()
+        patcher = mock.patch.object(disponibilite, 'releveur', self.releveur)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.organisateur = Utilisateur.objects.create_user(username='orga', password='test123', role='organisateur')
+        self.etudiant = Utilisateur.objects.create_user(username='etudiant', password='test123')
+        self.evenement = Evenement.objects.create(
+            titre='Conférence en direct',
+            description='Description',
+            date_debut=timezone.now() + timedelta(days=1),
+            date_fin=timezone.now() + timedelta(days=1, hours=2),
+            lieu='Amphi A',
+            categorie='conference',
+            capacite_max=2,
+            organisateur=self.organisateur,
+            statut='valide'
+        )
+        self.client.force_login(self.etudiant)
+    
+    def etat(self):
+        return etat_places(Evenement.objects.get(pk=self.evenement.pk))
+    
+    def test_diffuseur(self):
+        diffuseur = Diffuseur()
+        diffuseur.publier({'inscrits': 1})
+        diffuseur.publier({'inscrits': 1})
+        self.assertEqual(diffuseur.lire(), (1, {'inscrits': 1}))
+    
+    async def test_diffuseur_async(self):
+        diffuseur = Diffuseur()
+        diffuseur.publier({'inscrits': 1})
+        # Version déjà dépassée : pas d'attente ; sinon, délai écoulé sans changement
+        self.assertEqual(await diffuseur.aattendre(0, 5), (1, {'inscrits': 1}))
+        self.assertEqual(await diffuseur.aattendre(1, 0.01), (1, {'inscrits': 1}))
+        # Publication depuis un autre fil, comme celle du releveur
+        minuteur = threading.Timer(0.05, diffuseur.publier, [{'inscrits': 2}])
+        minuteur.start()
+        self.addCleanup(minuteur.join)
+        self.assertEqual(await diffuseur.aattendre(1, 5), (2, {'inscrits': 2}))
+        self.assertEqual(diffuseur._futurs, set())
+    
+    @override_settings(DISPONIBILITE_DUREE_FLUX=5)
+    async def test_flux_diffuse_les_changements(self):
+        etat = await sync_to_async(self.etat)()
+        flux = aflux_places(self.evenement.pk, etat, None)
+        self.assertTrue((await anext(flux)).startswith('retry: '))
+        self.assertEqual(
+            await anext(flux), f'id: {identifiant_etat(etat)}\nevent: places\ndata: {json.dumps(etat)}\n\n'
+        )
+        
+        await Inscription.objects.acreate(evenement=self.evenement, participant=self.etudiant, statut='confirmee')
+        await sync_to_async(self.releveur.relever)()
+        self.assertIn('"inscrits": 1, "capacite": 2, "places_restantes": 1', await anext(flux))
+        await flux.aclose()
+        # Fin du flux : l'événement n'est plus suivi
+        self.assertEqual(self.releveur._diffuseurs, {})
+        self.releveur.demarrer.assert_called_once()
+    
+    @override_settings(DISPONIBILITE_DUREE_FLUX=0)
+    async def test_flux_reconnexion_sans_changement(self):
+        etat = await sync_to_async(self.etat)()
+        messages = [message async for message in aflux_places(self.evenement.pk, etat, identifiant_etat(etat))]
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(messages[0].startswith('retry: '))
+    
+    def test_une_requete_pour_tous_les_abonnes(self):
+        autre = Evenement.objects.create(
+            titre='Atelier', description='Description',
+            date_debut=timezone.now() + timedelta(days=2), date_fin=timezone.now() + timedelta(days=2, hours=2),
+            lieu='Salle B', categorie='atelier', capacite_max=1, organisateur=self.organisateur, statut='valide',
+        )
+        diffuseurs = [
+            self.releveur.abonner(evenement.pk, None) for evenement in (self.evenement, self.evenement, autre, autre)
+        ]
+        self.assertIs(diffuseurs[0], diffuseurs[1])
+        Inscription.objects.create(evenement=autre, participant=self.etudiant, statut='confirmee')
+        
+        with self.assertNumQueries(1):
+            self.releveur.relever()
+        self.assertTrue(diffuseurs[2].etat['complet'])
+        self.assertEqual(diffuseurs[0].etat['places_restantes'], 2)
+        self.assertEqual(self.releveur.demarrer.call_count, 1)
+    
+    def test_signal_apres_validation(self):
+        """Une inscription validée réveille le releveur, seulement si l'événement est suivi"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Inscription.objects.create(evenement=self.evenement, participant=self.organisateur, statut='confirmee')
+        self.assertFalse(self.releveur._reveil.is_set())
+        
+        self.releveur.abonner(self.evenement.pk, None)
+        with self.captureOnCommitCallbacks(execute=False) as rappels:
+            Inscription.objects.create(evenement=self.evenement, participant=self.etudiant, statut='confirmee')
+        self.assertFalse(self.releveur._reveil.is_set())
+        for rappel in rappels:
+            rappel()
+        self.assertTrue(self.releveur._reveil.is_set())
+    
+    def test_sondage_json_sous_wsgi(self):
+        """Sous WSGI, pas de flux qui occupe un fil : l'état en JSON, 304 s'il n'a pas changé"""
+        url = reverse('disponibilite_evenement', args=[self.evenement.pk])
+        response = self.client.get(url)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.json(), {
+            'inscrits': 0, 'capacite': 2, 'places_restantes': 2, 'en_attente': 0,
+            'complet': False, 'statut': 'valide',
+        })
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        
+        Inscription.objects.create(evenement=self.evenement, participant=self.organisateur, statut='confirmee')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.json()['places_restantes'], 1)
+        # Aucun abonné au diffuseur, aucun fil démarré
+        self.assertEqual(self.releveur._diffuseurs, {})
+        self.releveur.demarrer.assert_not_called()
+        
+        self.assertEqual(self.client.get(reverse('disponibilite_evenement', args=[0])).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+    
+    @override_settings(DISPONIBILITE_SONDAGE=20)
+    def test_page_detail_sous_wsgi(self):
+        Inscription.objects.create(evenement=self.evenement, participant=self.organisateur, statut='confirmee')
+        response = self.client.get(reverse('detail_evenement', args=[self.evenement.pk]))
+        self.assertContains(response, 'id="places-progression"')
+        self.assertContains(response, 'style="width: 50%;"')
+        self.assertContains(response, '<span>1</span> places')
+        self.assertContains(response, reverse('disponibilite_evenement', args=[self.evenement.pk]))
+        self.assertContains(response, '}, 20 * 1000);')
+        self.assertNotContains(response, 'EventSource(')
@@ -1,28 +1,45 @@
+from django.conf import settings
 from django.urls import path
-from . import views  # ← CETTE LIGNE EST ESSENTIELLE
+from . import api, calendrier, views  # ← CETTE LIGNE EST ESSENTIELLE
+from . import vues_async
+
+# Sous ASGI (VUES_ASYNC), versions async des pages les plus consultées
+pages = vues_async if settings.VUES_ASYNC else views
 
 urlpatterns = [
     # Pages publiques
-    path('', views.accueil, name='accueil'),
+    path('', pages.accueil, name='accueil'),
     path('inscription/', views.inscription_utilisateur, name='inscription'),
     path('connexion/', views.connexion, name='connexion'),
     path('deconnexion/', views.deconnexion, name='deconnexion'),
     
     # Tableau de bord
-    path('tableau-bord/', views.tableau_bord, name='tableau_bord'),
+    path('tableau-bord/', pages.tableau_bord, name='tableau_bord'),
     path('profil/', views.profil, name='profil'),
     path('gestion-utilisateurs/', views.gestion_utilisateurs, name='gestion_utilisateurs'),
+    path('performances/', views.performances, name='performances'),
     
     # Événements
-    path('evenements/', views.liste_evenements, name='liste_evenements'),
-    path('evenements/<int:pk>/', views.detail_evenement, name='detail_evenement'),
+    path('evenements/', pages.liste_evenements, name='liste_evenements'),
+    path('evenements/<int:pk>/', pages.detail_evenement, name='detail_evenement'),
+    path('evenements/<int:pk>/disponibilite/', pages.disponibilite_evenement, name='disponibilite_evenement'),
     path('evenements/creer/', views.creer_evenement, name='creer_evenement'),
     path('evenements/<int:pk>/modifier/', views.modifier_evenement, name='modifier_evenement'),
     path('evenements/<int:pk>/supprimer/', views.supprimer_evenement, name='supprimer_evenement'),
     path('evenements/<int:pk>/valider/', views.valider_evenement, name='valider_evenement'),
+    path('evenements/<int:pk>/participants/', views.exporter_participants, name='exporter_participants'),
     
     # Inscriptions
     path('evenements/<int:pk>/inscrire/', views.inscrire_evenement, name='inscrire_evenement'),
     path('evenements/<int:pk>/annuler-inscription/', views.annuler_inscription, name='annuler_inscription'),
     
+    # API JSON en lecture seule
+    path('api/evenements/', api.api_liste_evenements, name='api_evenements'),
+    path('api/evenements/<int:pk>/', api.api_detail_evenement, name='api_evenement'),
+    path('api/mes-inscriptions/', api.api_mes_inscriptions, name='api_mes_inscriptions'),
+    
+    # Flux iCalendar pour les agendas
+    path('calendrier/evenements.ics', calendrier.calendrier_evenements, name='calendrier_evenements'),
+    path('calendrier/<str:jeton>.ics', calendrier.calendrier_inscriptions, name='calendrier_inscriptions'),
+    
 ]
\ No newline at end of file
@@ -1,27 +1,44 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.urls import reverse
 from django.utils import timezone
 from .models import Utilisateur, Evenement, Inscription
 from .forms import InscriptionForm, ConnexionForm, EvenementForm, UtilisateurForm, ProfilForm
+from .caches import bloc_evenements_accueil, comptes_categories, facettes_utilisateurs
+from .calendrier import jeton_calendrier
+from .conditionnel import ajouter_validateurs, etag_fort, etag_page, reponse_non_modifiee, version_evenement
+from .disponibilite import CHAMPS_ETAT, etat_places, identifiant_etat
+from .exports import CHAMPS_PARTICIPANT, COLONNES_PARTICIPANTS, FORMATS, reponse_export
+from .pagination import paginer_requete
+from .profilage import requetes_lentes
+from .recherche import rechercher_evenements
+from .routeurs import lecture_replique
 from .emails import (
     envoyer_email_inscription, 
     envoyer_email_annulation, 
+    envoyer_email_promotion,
     envoyer_email_validation_evenement
 )
 
+EVENEMENTS_PAR_PAGE = 12
+UTILISATEURS_PAR_PAGE = 25
 
+
+@lecture_replique
 def accueil(request):
     """Page d'accueil avec liste des événements validés"""
-    evenements_a_venir = Evenement.objects.filter(
-        statut='valide',
-        date_debut__gte=timezone.now()
-    ).order_by('date_debut')[:6]
+    bloc_evenements, nb_evenements = bloc_evenements_accueil()
     
     context = {
-        'evenements': evenements_a_venir,
+        'bloc_evenements': bloc_evenements,
+        'nb_evenements': nb_evenements,
     }
     return render(request, 'evenements/accueil.html', context)
 
@@ -92,15 +109,22 @@ def tableau_bord(request):
     # Événements en attente de validation (pour admin)
     evenements_en_attente = None
     if utilisateur.est_admin():
-        evenements_en_attente = Evenement.objects.filter(statut='en_attente')
+        evenements_en_attente = list(
+            Evenement.objects.filter(statut='en_attente').select_related('organisateur')
+        )
     
-    # Statistiques
+    # Statistiques : nombre d'événements et de participants en une requête
+    totaux = mes_evenements.aggregate(nb=Count('id'), participants=Sum('nb_inscrits'))
     stats = {
-        'nb_evenements_organises': mes_evenements.count(),
+        'nb_evenements_organises': totaux['nb'],
         'nb_inscriptions': mes_inscriptions.count(),
-        'nb_participants_total': sum([e.nombre_inscrits() for e in mes_evenements]),
+        'nb_participants_total': totaux['participants'] or 0,
     }
     
+    # Seuls les 5 premiers sont affichés, les totaux viennent des statistiques
+    mes_evenements = mes_evenements[:5]
+    mes_inscriptions = mes_inscriptions[:5]
+    
     context = {
         'mes_evenements': mes_evenements,
         'mes_inscriptions': mes_inscriptions,
@@ -112,6 +136,7 @@ def tableau_bord(request):
 
 
 @login_required
+@lecture_replique
 def liste_evenements(request):
     """Liste de tous les événements avec filtres"""
     evenements = Evenement.objects.filter(statut='valide')
@@ -123,51 +148,157 @@ def liste_evenements(request):
     if categorie:
         evenements = evenements.filter(categorie=categorie)
     
+    # Tri par pertinence d'abord quand une recherche est saisie
+    tri_pertinence = ()
     if recherche:
-        evenements = evenements.filter(
-            Q(titre__icontains=recherche) |
-            Q(description__icontains=recherche) |
-            Q(lieu__icontains=recherche)
-        )
-    
-    # Séparer les événements à venir et passés
+        evenements = rechercher_evenements(evenements, recherche)
+        tri_pertinence = ('-pertinence',)
+    
+    # Nombre d'événements par catégorie pour la recherche en cours (en cache)
+    comptes = comptes_categories(recherche)
+    categories = [
+        (code, nom, comptes.get(code, {'a_venir': 0, 'passes': 0}))
+        for code, nom in Evenement.CATEGORIE_CHOICES
+    ]
+    
+    # Version de l'ensemble filtré en une requête, avant de charger les pages :
+    # dernière modification, nombre d'événements (suppressions), bascule des
+    # événements commencés vers les passés et places (non couvertes par
+    # date_modification, pondérées par l'id pour distinguer les échanges)
     maintenant = timezone.now()
-    evenements_a_venir = evenements.filter(date_debut__gte=maintenant).order_by('date_debut')
-    evenements_passes = evenements.filter(date_debut__lt=maintenant).order_by('-date_debut')
+    version = evenements.order_by().aggregate(
+        nb=Count('id'),
+        a_venir=Count('id', filter=Q(date_debut__gte=maintenant)),
+        derniere_modification=Max('date_modification'),
+        places=Sum('nb_inscrits'),
+        places_par_evenement=Sum(F('nb_inscrits') * F('id')),
+    )
+    etag = etag_page(request, 'liste', request.GET.urlencode(), version, comptes)
+    reponse = etag and reponse_non_modifiee(request, etag, prive=True)
+    if reponse:
+        return reponse
+    
+    # Séparer les événements à venir et passés, chaque liste paginée par curseur
+    evenements = evenements.select_related('organisateur')
+    evenements_a_venir = paginer_requete(
+        request, 'a_venir', evenements.filter(date_debut__gte=maintenant),
+        (*tri_pertinence, 'date_debut', 'id'), taille=EVENEMENTS_PAR_PAGE
+    )
+    evenements_passes = paginer_requete(
+        request, 'passes', evenements.filter(date_debut__lt=maintenant),
+        (*tri_pertinence, '-date_debut', '-id'), taille=EVENEMENTS_PAR_PAGE
+    )
     
     context = {
         'evenements_a_venir': evenements_a_venir,
         'evenements_passes': evenements_passes,
-        'categories': Evenement.CATEGORIE_CHOICES,
+        'categories': categories,
+        'total_categories': {
+            'a_venir': sum(nb['a_venir'] for _, _, nb in categories),
+            'passes': sum(nb['passes'] for _, _, nb in categories),
+        },
         'categorie_selectionnee': categorie,
         'recherche': recherche,
     }
-    return render(request, 'evenements/liste_evenements.html', context)
+    response = render(request, 'evenements/liste_evenements.html', context)
+    if etag:
+        ajouter_validateurs(response, etag, prive=True)
+    return response
 
 
 @login_required
+@lecture_replique
 def detail_evenement(request, pk):
     """Détail d'un événement"""
-    evenement = get_object_or_404(Evenement, pk=pk)
-    
-    # Vérifier si l'utilisateur est déjà inscrit
-    est_inscrit = Inscription.objects.filter(
-        evenement=evenement,
+    # Inscription de l'utilisateur (confirmée ou en liste d'attente), lue
+    # dans la même requête que l'événement
+    mon_inscription = Inscription.objects.filter(
+        evenement=OuterRef('pk'),
         participant=request.user,
-        statut='confirmee'
-    ).exists()
+        statut__in=['confirmee', 'en_attente']
+    )
+    evenement = get_object_or_404(
+        Evenement.objects.select_related('organisateur').annotate(
+            mon_statut=Subquery(mon_inscription.values('statut')[:1]),
+            mon_ticket=Subquery(mon_inscription.values('ticket_attente')[:1]),
+        ),
+        pk=pk
+    )
     
     # Liste des inscrits (visible par l'organisateur et admin)
+    peut_modifier = evenement.peut_modifier(request.user)
+    
+    # Rafraîchissement sans changement : réponse 304 sans autre requête ni
+    # rendu. La liste des inscrits n'a pas de version : pas de 304 pour
+    # l'organisateur et les admins.
+    etag = None
+    if not peut_modifier:
+        etag = etag_page(request, 'detail', version_evenement(evenement), evenement.mon_statut, evenement.mon_ticket)
+        reponse = etag and reponse_non_modifiee(request, etag, prive=True)
+        if reponse:
+            return reponse
+    
+    position_attente = None
+    if evenement.mon_statut is not None:
+        position_attente = Inscription(
+            evenement=evenement, statut=evenement.mon_statut, ticket_attente=evenement.mon_ticket
+        ).position_attente()
+    est_inscrit = evenement.mon_statut == 'confirmee'
+    
     inscrits = None
-    if evenement.peut_modifier(request.user):
-        inscrits = evenement.inscriptions.filter(statut='confirmee').select_related('participant')
+    if peut_modifier:
+        inscrits = list(evenement.inscriptions.filter(statut='confirmee').select_related('participant'))
     
     context = {
         'evenement': evenement,
         'est_inscrit': est_inscrit,
+        'position_attente': position_attente,
         'inscrits': inscrits,
+        # Sous WSGI, places redemandées périodiquement plutôt qu'en flux
+        'sondage_places': getattr(settings, 'DISPONIBILITE_SONDAGE', 15),
     }
-    return render(request, 'evenements/detail_evenement.html', context)
+    response = render(request, 'evenements/detail_evenement.html', context)
+    if etag:
+        ajouter_validateurs(response, etag, prive=True)
+    return response
+
+
+@login_required
+def disponibilite_evenement(request, pk):
+    """
+    Places disponibles en JSON, redemandées périodiquement par la page de
+    détail. Sous WSGI, pas de flux SSE : il occuperait un fil du serveur par
+    page ouverte (voir vues_async.disponibilite_evenement).
+    """
+    evenement = get_object_or_404(Evenement.objects.only(*CHAMPS_ETAT), pk=pk)
+    etat = etat_places(evenement)
+    etag = etag_fort('places', identifiant_etat(etat))
+    reponse = reponse_non_modifiee(request, etag, prive=True)
+    if reponse:
+        return reponse
+    return ajouter_validateurs(JsonResponse(etat), etag, prive=True)
+
+
+@login_required
+def exporter_participants(request, pk):
+    """Export CSV (par défaut) ou XLSX (?format=xlsx) des participants d'un événement"""
+    evenement = get_object_or_404(Evenement, pk=pk)
+    
+    if not evenement.peut_modifier(request.user):
+        messages.error(request, "Vous n'avez pas la permission d'exporter les participants de cet événement.")
+        return redirect('detail_evenement', pk=pk)
+    
+    format_ = request.GET.get('format', 'csv')
+    if format_ not in FORMATS:
+        format_ = 'csv'
+    
+    # Inscrits puis liste d'attente dans l'ordre de promotion
+    inscriptions = evenement.inscriptions.filter(
+        statut__in=['confirmee', 'en_attente']
+    ).select_related('participant', 'evenement').only(*CHAMPS_PARTICIPANT).order_by(
+        'statut', 'ticket_attente', 'date_inscription', 'id'
+    )
+    return reponse_export(inscriptions, COLONNES_PARTICIPANTS, format_, f'participants {evenement.titre}')
 
 
 @login_required
@@ -199,7 +330,11 @@ def modifier_evenement(request, pk):
     if request.method == 'POST':
         form = EvenementForm(request.POST, instance=evenement)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
+                # Une augmentation de capacité profite à la liste d'attente
+                for promue in evenement.promouvoir_liste_attente():
+                    envoyer_email_promotion(promue)
             messages.success(request, 'Événement modifié avec succès !')
             return redirect('detail_evenement', pk=pk)
     else:
@@ -236,10 +371,12 @@ def valider_evenement(request, pk):
     action = request.POST.get('action')
     
     if action == 'valider':
-        evenement.statut = 'valide'
-        evenement.save()
-        # Envoyer email à l'organisateur
-        envoyer_email_validation_evenement(evenement)
+        # L'email est mis en file dans la même transaction que la validation
+        with transaction.atomic():
+            evenement.statut = 'valide'
+            evenement.save()
+            # Envoyer email à l'organisateur
+            envoyer_email_validation_evenement(evenement)
         messages.success(request, f'Événement "{evenement.titre}" validé avec succès.')
     elif action == 'refuser':
         evenement.statut = 'refuse'
@@ -252,40 +389,40 @@ def valider_evenement(request, pk):
 @login_required
 def inscrire_evenement(request, pk):
     """S'inscrire à un événement"""
-    evenement = get_object_or_404(Evenement, pk=pk)
+    evenement = get_object_or_404(Evenement.objects.select_related('organisateur'), pk=pk)
     
     # Vérifications
     if evenement.statut != 'valide':
         messages.error(request, "Cet événement n'est pas encore validé.")
         return redirect('detail_evenement', pk=pk)
     
-    if evenement.est_complet():
-        messages.error(request, "Cet événement est complet.")
-        return redirect('detail_evenement', pk=pk)
-    
     if evenement.est_passe():
         messages.error(request, "Cet événement est déjà passé.")
         return redirect('detail_evenement', pk=pk)
     
-    # Créer ou récupérer l'inscription
-    inscription, created = Inscription.objects.get_or_create(
-        evenement=evenement,
-        participant=request.user,
-        defaults={'statut': 'confirmee'}
-    )
+    with transaction.atomic():
+        # Vérification de capacité et prise de place en une seule opération atomique
+        inscription, resultat = evenement.reserver_place(request.user)
+        if resultat in ('creee', 'reactivee'):
+            # Email de confirmation mis en file avec l'inscription
+            envoyer_email_inscription(inscription)
     
-    if created:
-        # Envoyer email de confirmation
-        envoyer_email_inscription(inscription)
+    if resultat == 'creee':
         messages.success(request, 'Inscription confirmée ! Un email de confirmation vous a été envoyé.')
+    elif resultat == 'reactivee':
+        messages.success(request, 'Inscription réactivée ! Un email de confirmation vous a été envoyé.')
+    elif resultat == 'en_attente':
+        messages.info(
+            request,
+            f"Cet événement est complet : vous êtes en liste d'attente (position {inscription.position_attente()}). "
+            "Vous serez inscrit automatiquement si une place se libère."
+        )
+    elif resultat == 'deja_en_attente':
+        messages.info(request, f"Vous êtes déjà en liste d'attente (position {inscription.position_attente()}).")
+    elif resultat == 'complet':
+        messages.error(request, "Cet événement est complet.")
     else:
-        if inscription.statut == 'annulee':
-            inscription.statut = 'confirmee'
-            inscription.save()
-            envoyer_email_inscription(inscription)
-            messages.success(request, 'Inscription réactivée ! Un email de confirmation vous a été envoyé.')
-        else:
-            messages.info(request, 'Vous êtes déjà inscrit à cet événement.')
+        messages.info(request, 'Vous êtes déjà inscrit à cet événement.')
     
     return redirect('detail_evenement', pk=pk)
 
@@ -293,21 +430,32 @@ def inscrire_evenement(request, pk):
 @login_required
 def annuler_inscription(request, pk):
     """Annuler son inscription à un événement"""
-    evenement = get_object_or_404(Evenement, pk=pk)
-    
-    try:
-        inscription = Inscription.objects.get(
+    with transaction.atomic():
+        # Lus une seule fois, sous verrou : réutilisés par annuler() et les emails
+        evenement = get_object_or_404(Evenement.objects.select_for_update(), pk=pk)
+        inscription = Inscription.objects.select_for_update().filter(
             evenement=evenement,
             participant=request.user,
-            statut='confirmee'
-        )
-        inscription.statut = 'annulee'
-        inscription.save()
-        # Envoyer email d'annulation
-        envoyer_email_annulation(inscription)
+            statut__in=['confirmee', 'en_attente']
+        ).first()
+        if inscription is None:
+            messages.error(request, "Vous n'êtes pas inscrit à cet événement.")
+            return redirect('detail_evenement', pk=pk)
+        inscription.evenement = evenement
+        inscription.participant = request.user
+        
+        etait_en_attente = inscription.statut == 'en_attente'
+        # La place libérée est attribuée à la tête de la liste d'attente
+        for promue in inscription.annuler(deja_verrouillee=True):
+            envoyer_email_promotion(promue)
+        if not etait_en_attente:
+            # Envoyer email d'annulation
+            envoyer_email_annulation(inscription)
+    
+    if etait_en_attente:
+        messages.success(request, "Vous avez quitté la liste d'attente.")
+    else:
         messages.success(request, 'Inscription annulée. Un email de confirmation vous a été envoyé.')
-    except Inscription.DoesNotExist:
-        messages.error(request, "Vous n'êtes pas inscrit à cet événement.")
     
     return redirect('detail_evenement', pk=pk)
 
@@ -325,10 +473,18 @@ def profil(request):
     else:
         form = ProfilForm(instance=request.user)
     
-    return render(request, 'evenements/profil.html', {'form': form})
+    context = {
+        'form': form,
+        'url_calendrier': request.build_absolute_uri(
+            reverse('calendrier_inscriptions', args=[jeton_calendrier(request.user)])
+        ),
+        'url_calendrier_evenements': request.build_absolute_uri(reverse('calendrier_evenements')),
+    }
+    return render(request, 'evenements/profil.html', context)
 
 
 @login_required
+@lecture_replique
 def gestion_utilisateurs(request):
     """
     Liste de tous les utilisateurs inscrits (accessible uniquement aux admins)
@@ -338,7 +494,7 @@ def gestion_utilisateurs(request):
         return redirect('tableau_bord')
     
     # Récupérer tous les utilisateurs
-    utilisateurs = Utilisateur.objects.all().order_by('-date_joined')
+    utilisateurs = Utilisateur.objects.all()
     
     # Filtres
     role_filtre = request.GET.get('role')
@@ -357,30 +513,69 @@ def gestion_utilisateurs(request):
         )
     
     if departement_filtre:
-        utilisateurs = utilisateurs.filter(departement__icontains=departement_filtre)
+        # Valeur exacte choisie dans la liste des départements : utilise l'index
+        utilisateurs = utilisateurs.filter(departement=departement_filtre)
+    
+    # Activité de chaque utilisateur : sous-requêtes comptées sur la page seulement
+    utilisateurs = utilisateurs.annotate(
+        nb_evenements_organises=Coalesce(Subquery(
+            Evenement.objects.filter(organisateur=OuterRef('pk')).order_by().values('organisateur')
+            .annotate(nb=Count('pk')).values('nb')
+        ), 0),
+        nb_inscriptions=Coalesce(Subquery(
+            Inscription.objects.filter(participant=OuterRef('pk')).order_by().values('participant')
+            .annotate(nb=Count('pk')).values('nb')
+        ), 0),
+    )
     
-    # Statistiques
-    stats = {
-        'total_utilisateurs': Utilisateur.objects.count(),
-        'total_etudiants': Utilisateur.objects.filter(role='etudiant').count(),
-        'total_admins': Utilisateur.objects.filter(role='admin').count(),
-        'nouveaux_7_jours': Utilisateur.objects.filter(
-            date_joined__gte=timezone.now() - timezone.timedelta(days=7)
-        ).count(),
-    }
+    # Les plus récents d'abord, paginés par curseur
+    utilisateurs = paginer_requete(
+        request, 'page', utilisateurs, ('-date_joined', '-id'), taille=UTILISATEURS_PAR_PAGE
+    )
+    
+    # Statistiques en une seule requête d'agrégation conditionnelle
+    stats = Utilisateur.objects.aggregate(
+        total_utilisateurs=Count('id'),
+        total_etudiants=Count('id', filter=Q(role='etudiant')),
+        total_admins=Count('id', filter=Q(role='admin')),
+        nouveaux_7_jours=Count('id', filter=Q(date_joined__gte=timezone.now() - timezone.timedelta(days=7))),
+    )
     
-    # Départements uniques pour le filtre
-    departements = Utilisateur.objects.exclude(
-        departement=''
-    ).values_list('departement', flat=True).distinct()
+    # Effectifs par rôle et par département pour les filtres (en cache)
+    facettes = facettes_utilisateurs()
     
     context = {
         'utilisateurs': utilisateurs,
         'stats': stats,
-        'departements': departements,
+        'departements': sorted(facettes['departements'].items()),
+        'roles': facettes['roles'],
         'role_filtre': role_filtre,
         'recherche': recherche,
         'departement_filtre': departement_filtre,
     }
     
-    return render(request, 'evenements/gestion_utilisateurs.html', context)
\ No newline at end of file
+    return render(request, 'evenements/gestion_utilisateurs.html', context)
+
+
+@login_required
+def performances(request):
+    """
+    Requêtes les plus lentes mesurées par le profilage (accessible uniquement
+    aux admins). Les mesures sont propres au processus qui répond.
+    """
+    if not request.user.est_admin():
+        messages.error(request, "Vous n'avez pas accès à cette page.")
+        return redirect('tableau_bord')
+    
+    if request.method == 'POST':
+        requetes_lentes.vider()
+        messages.success(request, "Les mesures ont été effacées.")
+        return redirect('performances')
+    
+    context = {
+        'requetes': requetes_lentes.lister(),
+        'echantillonnage': getattr(settings, 'PROFILAGE_ECHANTILLONNAGE', 0.0) * 100,
+        'capacite': requetes_lentes.capacite,
+    }
+    
+    return render(request, 'evenements/performances.html', context)
@@ -0,0 +1,232 @@
+"""
+Versions async des pages les plus consultées, servies sous ASGI (VUES_ASYNC).
+
+Accueil, liste et détail des événements, tableau de bord et flux des
+places disponibles : mêmes requêtes, mêmes templates et mêmes réponses que
+les vues de views.py. Les fonctions synchrones partagées avec views.py
+(caches, recherche, pagination) passent par sync_to_async.
+
+Pas de requêtes SQL simultanées dans une page : avec Django 5.0, l'ORM
+async (comme sync_to_async, thread_sensitive) exécute toutes les requêtes
+d'une même requête HTTP l'une après l'autre, dans le fil qui tient sa
+connexion. Elles sont donc attendues l'une après l'autre : asyncio.gather
+n'en ferait chevaucher aucune. Le gain est ailleurs : un flux de places
+ouvert est une coroutine en attente, et non un fil du serveur.
+
+Tout ce que les templates affichent est chargé avant le rendu : dans une
+vue async, un queryset paresseux évalué par le template lèverait
+SynchronousOnlyOperation.
+"""
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.shortcuts import aget_object_or_404, render
+from django.utils import timezone
+from .caches import bloc_evenements_accueil, comptes_categories
+from .conditionnel import ajouter_validateurs, etag_page, reponse_non_modifiee, version_evenement
+from .disponibilite import CHAMPS_ETAT, aflux_places, etat_places, reponse_flux
+from .models import Evenement, Inscription
+from .pagination import paginer_requete
+from .recherche import rechercher_evenements
+from .routeurs import lecture_replique
+from .views import EVENEMENTS_PAR_PAGE
+
+
+async def charger_utilisateur(request):
+    """
+    Charge l'utilisateur hors de la boucle et le place dans request.user :
+    la barre de navigation des templates n'a plus de requête à faire.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+def connexion_requise(vue):
+    """login_required pour une vue async (pris en charge par Django à partir de 5.1)"""
+    @wraps(vue)
+    async def envelopper(request, *args, **kwargs):
+        utilisateur = await charger_utilisateur(request)
+        if not utilisateur.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await vue(request, *args, **kwargs)
+
+    return envelopper
+
+
+async def en_liste(queryset):
+    return [element async for element in queryset]
+
+
+@lecture_replique
+async def accueil(request):
+    """Page d'accueil avec liste des événements validés"""
+    await charger_utilisateur(request)
+    bloc_evenements, nb_evenements = await sync_to_async(bloc_evenements_accueil)()
+
+    context = {
+        'bloc_evenements': bloc_evenements,
+        'nb_evenements': nb_evenements,
+    }
+    return render(request, 'evenements/accueil.html', context)
+
+
+@connexion_requise
+async def tableau_bord(request):
+    """Tableau de bord personnalisé selon le rôle"""
+    utilisateur = request.user
+
+    mes_evenements = Evenement.objects.filter(organisateur=utilisateur)
+    mes_inscriptions = Inscription.objects.filter(
+        participant=utilisateur,
+        statut='confirmee'
+    ).select_related('evenement')
+    evenements_en_attente = None
+    if utilisateur.est_admin():
+        evenements_en_attente = await en_liste(
+            Evenement.objects.filter(statut='en_attente').select_related('organisateur')
+        )
+
+    # Statistiques et cinq premiers éléments de chaque liste
+    totaux = await mes_evenements.aaggregate(nb=Count('id'), participants=Sum('nb_inscrits'))
+    nb_inscriptions = await mes_inscriptions.acount()
+    premiers_evenements = await en_liste(mes_evenements[:5])
+    premieres_inscriptions = await en_liste(mes_inscriptions[:5])
+    stats = {
+        'nb_evenements_organises': totaux['nb'],
+        'nb_inscriptions': nb_inscriptions,
+        'nb_participants_total': totaux['participants'] or 0,
+    }
+
+    context = {
+        'mes_evenements': premiers_evenements,
+        'mes_inscriptions': premieres_inscriptions,
+        'evenements_en_attente': evenements_en_attente,
+        'stats': stats,
+        'now': timezone.now(),
+    }
+    return render(request, 'evenements/tableau_bord.html', context)
+
+
+@connexion_requise
+@lecture_replique
+async def liste_evenements(request):
+    """Liste de tous les événements avec filtres"""
+    evenements = Evenement.objects.filter(statut='valide')
+
+    categorie = request.GET.get('categorie')
+    recherche = request.GET.get('recherche')
+
+    if categorie:
+        evenements = evenements.filter(categorie=categorie)
+
+    tri_pertinence = ()
+    if recherche:
+        evenements = await sync_to_async(rechercher_evenements)(evenements, recherche)
+        tri_pertinence = ('-pertinence',)
+
+    # Nombres par catégorie (en cache) et version de l'ensemble filtré (voir
+    # views.liste_evenements)
+    maintenant = timezone.now()
+    comptes = await sync_to_async(comptes_categories)(recherche)
+    version = await evenements.order_by().aaggregate(
+        nb=Count('id'),
+        a_venir=Count('id', filter=Q(date_debut__gte=maintenant)),
+        derniere_modification=Max('date_modification'),
+        places=Sum('nb_inscrits'),
+        places_par_evenement=Sum(F('nb_inscrits') * F('id')),
+    )
+    categories = [
+        (code, nom, comptes.get(code, {'a_venir': 0, 'passes': 0}))
+        for code, nom in Evenement.CATEGORIE_CHOICES
+    ]
+    etag = etag_page(request, 'liste', request.GET.urlencode(), version, comptes)
+    reponse = etag and reponse_non_modifiee(request, etag, prive=True)
+    if reponse:
+        return reponse
+
+    evenements = evenements.select_related('organisateur')
+    paginer = sync_to_async(paginer_requete)
+    evenements_a_venir = await paginer(
+        request, 'a_venir', evenements.filter(date_debut__gte=maintenant),
+        (*tri_pertinence, 'date_debut', 'id'), taille=EVENEMENTS_PAR_PAGE
+    )
+    evenements_passes = await paginer(
+        request, 'passes', evenements.filter(date_debut__lt=maintenant),
+        (*tri_pertinence, '-date_debut', '-id'), taille=EVENEMENTS_PAR_PAGE
+    )
+
+    context = {
+        'evenements_a_venir': evenements_a_venir,
+        'evenements_passes': evenements_passes,
+        'categories': categories,
+        'total_categories': {
+            'a_venir': sum(nb['a_venir'] for _, _, nb in categories),
+            'passes': sum(nb['passes'] for _, _, nb in categories),
+        },
+        'categorie_selectionnee': categorie,
+        'recherche': recherche,
+    }
+    response = render(request, 'evenements/liste_evenements.html', context)
+    if etag:
+        ajouter_validateurs(response, etag, prive=True)
+    return response
+
+
+@connexion_requise
+@lecture_replique
+async def detail_evenement(request, pk):
+    """Détail d'un événement"""
+    mon_inscription = Inscription.objects.filter(
+        evenement=OuterRef('pk'),
+        participant=request.user,
+        statut__in=['confirmee', 'en_attente']
+    )
+    evenement = await aget_object_or_404(
+        Evenement.objects.select_related('organisateur').annotate(
+            mon_statut=Subquery(mon_inscription.values('statut')[:1]),
+            mon_ticket=Subquery(mon_inscription.values('ticket_attente')[:1]),
+        ),
+        pk=pk
+    )
+
+    peut_modifier = evenement.peut_modifier(request.user)
+
+    etag = None
+    if not peut_modifier:
+        etag = etag_page(request, 'detail', version_evenement(evenement), evenement.mon_statut, evenement.mon_ticket)
+        reponse = etag and reponse_non_modifiee(request, etag, prive=True)
+        if reponse:
+            return reponse
+
+    position_attente = None
+    if evenement.mon_statut is not None:
+        position_attente = Inscription(
+            evenement=evenement, statut=evenement.mon_statut, ticket_attente=evenement.mon_ticket
+        ).position_attente()
+
+    inscrits = None
+    if peut_modifier:
+        inscrits = await en_liste(evenement.inscriptions.filter(statut='confirmee').select_related('participant'))
+
+    context = {
+        'evenement': evenement,
+        'est_inscrit': evenement.mon_statut == 'confirmee',
+        'position_attente': position_attente,
+        'inscrits': inscrits,
+        # Places poussées par le flux SSE de disponibilite_evenement
+        'sondage_places': None,
+    }
+    response = render(request, 'evenements/detail_evenement.html', context)
+    if etag:
+        ajouter_validateurs(response, etag, prive=True)
+    return response
+
+
+@connexion_requise
+async def disponibilite_evenement(request, pk):
+    """Flux SSE des places disponibles : une coroutine, et non un fil, par page ouverte"""
+    evenement = await aget_object_or_404(Evenement.objects.only(*CHAMPS_ETAT), pk=pk)
+    return reponse_flux(
+        aflux_places(evenement.pk, etat_places(evenement), request.headers.get('Last-Event-ID'))
+    )
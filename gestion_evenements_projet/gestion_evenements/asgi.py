@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_evenements.settings')
+# Versions async des pages les plus consultées (evenements/vues_async.py)
+os.environ.setdefault('VUES_ASYNC', '1')
 
 application = get_asgi_application()
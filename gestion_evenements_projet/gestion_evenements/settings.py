@@ -42,12 +42,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'evenements.profilage.ProfilageMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'evenements.routeurs.PrimaireApresEcritureMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -55,7 +57,8 @@ ROOT_URLCONF = 'gestion_evenements.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates avec mesure du temps de rendu (voir evenements/profilage.py)
+        'BACKEND': 'evenements.profilage.DjangoTemplatesProfiles',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -70,6 +73,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'gestion_evenements.wsgi.application'
 
+# Versions async de l'accueil, de la liste et du détail des événements et du
+# tableau de bord (evenements/vues_async.py). Activé par asgi.py : sous WSGI,
+# chaque vue async ferait tourner une boucle d'événements par requête.
+VUES_ASYNC = os.environ.get('VUES_ASYNC') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -77,9 +85,63 @@ WSGI_APPLICATION = 'gestion_evenements.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('SQLITE_CHEMIN', BASE_DIR / 'db.sqlite3'),
+    }
+}
+
+# Profil de production (SQLITE_PRODUCTION=1) : journal WAL, busy_timeout et
+# caches appliqués à chaque connexion, transactions en BEGIN IMMEDIATE (voir
+# gestion_evenements/sqlite_production) et connexions gardées ouvertes d'une
+# requête à l'autre. Les PRAGMA peuvent être ajustés dans OPTIONS['pragmas'].
+if os.environ.get('SQLITE_PRODUCTION') == '1':
+    DATABASES['default'].update({
+        'ENGINE': 'gestion_evenements.sqlite_production',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'mode_transaction': 'IMMEDIATE', 'pragmas': {}},
+    })
+
+# Réplique en lecture (SQLITE_REPLIQUE=chemin, copie tenue à jour de la base
+# par réplication) : les pages en lecture seule y lisent, voir
+# evenements/routeurs.py. Après une écriture, un navigateur lit sur la base
+# principale pendant REPLIQUE_DELAI_PRIMAIRE secondes.
+DATABASE_ROUTERS = ['evenements.routeurs.RouteurReplique']
+BASE_REPLIQUE = None
+REPLIQUE_DELAI_PRIMAIRE = 10
+if os.environ.get('SQLITE_REPLIQUE'):
+    DATABASES['replique'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['SQLITE_REPLIQUE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    BASE_REPLIQUE = 'replique'
+
+# Places disponibles en direct sur la page de détail (evenements/disponibilite.py).
+# Sous ASGI, flux SSE : chaque processus relit les événements suivis en une
+# requête toutes les DISPONIBILITE_INTERVALLE secondes, et un flux est fermé
+# après DISPONIBILITE_DUREE_FLUX secondes (le navigateur se reconnecte).
+# Sous WSGI, la page redemande les places toutes les DISPONIBILITE_SONDAGE secondes.
+DISPONIBILITE_INTERVALLE = 1
+DISPONIBILITE_DUREE_FLUX = 60
+DISPONIBILITE_SONDAGE = 15
+
+
+# Cache
+# Cache mémoire propre à chaque processus : avec plusieurs workers, utiliser un
+# cache partagé (Redis, Memcached) pour que les invalidations touchent tous
+# les processus. CACHE_ACCUEIL_DUREE borne l'ancienneté du bloc de l'accueil,
+# CACHE_FACETTES_DUREE celle des facettes de l'annuaire des utilisateurs,
+# CACHE_CATEGORIES_DUREE celle des nombres d'événements par catégorie de la
+# liste des événements.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+CACHE_ACCUEIL_DUREE = 300
+CACHE_FACETTES_DUREE = 3600
+CACHE_CATEGORIES_DUREE = 60
 
 
 # Password validation
@@ -145,3 +207,10 @@ MESSAGE_TAGS = {
     messages.WARNING: 'warning',
     messages.ERROR: 'danger',
 }
+
+
+# Profilage des requêtes (en-tête Server-Timing et page « Performances »)
+# Part des requêtes mesurées : 0 désactive, 1 mesure tout
+PROFILAGE_ECHANTILLONNAGE = 0.1
+# Nombre de requêtes les plus lentes conservées en mémoire par processus
+PROFILAGE_NB_REQUETES_LENTES = 50
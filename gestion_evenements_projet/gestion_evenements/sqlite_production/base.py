@@ -0,0 +1,51 @@
+"""
+Moteur SQLite pour la production (ENGINE 'gestion_evenements.sqlite_production').
+
+- Les PRAGMA de PRAGMAS (complétés ou remplacés par OPTIONS['pragmas']) sont
+  appliqués à chaque nouvelle connexion. Avec le journal WAL, les lecteurs ne
+  sont plus bloqués par l'écriture en cours et busy_timeout fait patienter
+  les écrivains au lieu de lever « database is locked ».
+- Les transactions commencent par BEGIN IMMEDIATE (OPTIONS['mode_transaction']) :
+  le verrou d'écriture est pris dès l'ouverture, là où busy_timeout
+  s'applique. Avec un BEGIN différé, une transaction qui lit puis écrit
+  (reserver_place) échoue aussitôt si un autre écrivain a pris le verrou
+  entre-temps, sans attendre.
+
+Django 5.1 propose directement OPTIONS['init_command'] et
+OPTIONS['transaction_mode'] ; ce moteur fait la même chose en 5.0.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Sûr avec WAL : synchronisation disque aux checkpoints seulement
+    'synchronous': 'NORMAL',
+    # Millisecondes d'attente du verrou d'écriture
+    'busy_timeout': 5000,
+    # Cache de pages de 64 Mo par connexion (valeur négative : en Kio)
+    'cache_size': -64000,
+    # Lecture de la base par mmap, jusqu'à 256 Mo
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+MODES_TRANSACTION = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        self.mode_transaction = params.pop('mode_transaction', 'IMMEDIATE').upper()
+        if self.mode_transaction not in MODES_TRANSACTION:
+            raise ValueError(f"mode_transaction doit valoir {', '.join(MODES_TRANSACTION)}.")
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for nom, valeur in self.pragmas.items():
+            conn.execute(f'PRAGMA {nom} = {valeur}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.mode_transaction}')